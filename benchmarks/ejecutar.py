@@ -0,0 +1,169 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import eda_insights as E
+from generador import generar_logs
+from pipeline import Pipeline, primer_intento
+from snapshot import generar_snapshot
+
+# Benchmarks de eda_insights sobre datos sintéticos. Ejemplos:
+#   python benchmarks/ejecutar.py --escalas 1 10
+#   python benchmarks/ejecutar.py --escenarios detectar_errores_funnel pipeline_completo
+#   python benchmarks/ejecutar.py --comparar resultados/antes.json resultados/despues.json
+
+RUTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def preparar_entradas(escala, semilla=0):
+    """Datos sintéticos de una escala y las salidas intermedias que usan los escenarios."""
+    df_web, df_exp_cli, df_final_demo = generar_logs(escala=escala, semilla=semilla)
+    df_web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    df_web_diff = E.calcular_diferencia_tiempo(df_web_v)
+    df_web_sorted = E.detectar_errores_funnel(df_web_diff)
+    clientes = E.limpiar_df_clientes(df_final_demo)
+    return {
+        'df_web': df_web,
+        'df_exp_cli': df_exp_cli,
+        'df_final_demo': df_final_demo,
+        'df_web_v': df_web_v,
+        'df_web_diff': df_web_diff,
+        'df_web_sorted': df_web_sorted,
+        'clientes': clientes,
+    }
+
+
+# Cada escenario recibe las entradas y ejecuta una única llamada
+ESCENARIOS = {
+    'preparar_datos_web': lambda d: E.preparar_datos_web(d['df_web'].copy(), None, d['df_exp_cli'], d['df_final_demo']),
+    'limpiar_df_clientes': lambda d: E.limpiar_df_clientes(d['df_final_demo']),
+    'compactar_tipos': lambda d: E.compactar_tipos(d['df_web_v'], E.ESQUEMA_WEB),
+    'filtrar_principales_clientes': lambda d: E.filtrar_principales_clientes(d['clientes']),
+    'calcular_diferencia_tiempo': lambda d: E.calcular_diferencia_tiempo(d['df_web_v']),
+    'detectar_errores_funnel': lambda d: E.detectar_errores_funnel(d['df_web_diff']),
+    'filter_outliers_iqr': lambda d: E.filter_outliers_iqr(d['df_web_sorted'], 'time_diff_sec', lower=False),
+    'calcular_tasa': lambda d: E.calcular_tasa(d['df_web_sorted'], 'es_error', 'Variation', 'process_step'),
+    'calcular_tasa_finalizacion': lambda d: E.calcular_tasa_finalizacion(d['df_web_v']),
+    'calcular_kpis_iqr': lambda d: E.calcular_kpis_iqr(d['df_web_sorted'], ['Variation', 'process_step'], 'time_diff_sec'),
+    'calcular_kpis_iqr_aproximado': lambda d: E.calcular_kpis_iqr(
+        d['df_web_sorted'], ['Variation', 'process_step'], 'time_diff_sec', aproximado=True),
+    'obtener_primera': lambda d: E.obtener_primera(d['df_web_sorted'], d['df_exp_cli']),
+    'primer_intento_perezoso': lambda d: primer_intento(
+        Pipeline.desde_df(d['df_web_v']).diferencia_tiempo().errores()).ejecutar(),
+    'calcular_tiempo_total_por_cliente': lambda d: E.calcular_tiempo_total_por_cliente(d['df_web_sorted']),
+    'pipeline_completo': lambda d: generar_snapshot(
+        E.preparar_datos_web(d['df_web'].copy(), None, d['df_exp_cli'], d['df_final_demo'])[0],
+        d['df_exp_cli'], ruta_salida=None),
+}
+
+
+def medir(funcion, entradas, repeticiones=3):
+    """
+    Tiempo de 'repeticiones' ejecuciones y pico de memoria de una ejecución aparte
+    (tracemalloc ralentiza, así que no se mezcla con la medida de tiempo).
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion(entradas)
+        tiempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    funcion(entradas)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'tiempos_s': tiempos,
+        'mediana_s': statistics.median(tiempos),
+        'min_s': min(tiempos),
+        'pico_memoria_mb': pico / 1024 ** 2,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(escalas=(1, 10), escenarios=None, repeticiones=3, semilla=0):
+    """
+    Ejecuta los escenarios en cada escala.
+
+    Devuelve:
+    - Diccionario con metadatos (versión, entorno) y una lista de resultados por
+      escenario y escala, listo para guardar como JSON.
+    """
+    escenarios = escenarios or list(ESCENARIOS)
+    resultados = []
+    for escala in escalas:
+        entradas = preparar_entradas(escala, semilla)
+        n_eventos = len(entradas['df_web'])
+        for nombre in escenarios:
+            medida = medir(ESCENARIOS[nombre], entradas, repeticiones)
+            resultados.append({'escenario': nombre, 'escala': escala, 'n_eventos': n_eventos, **medida})
+            print(f"{nombre:<36} x{escala:<4} {medida['mediana_s']:9.3f} s {medida['pico_memoria_mb']:9.1f} MB")
+        del entradas
+    return {
+        'metadatos': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'repeticiones': repeticiones,
+            'semilla': semilla,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(ruta_base, ruta_nueva):
+    """Ratio de tiempo y memoria (nuevo / base) por escenario y escala de dos ficheros de resultados."""
+    with open(ruta_base, encoding='utf-8') as f:
+        base = pd.DataFrame(json.load(f)['resultados'])
+    with open(ruta_nueva, encoding='utf-8') as f:
+        nueva = pd.DataFrame(json.load(f)['resultados'])
+    tabla = base.merge(nueva, on=['escenario', 'escala'], suffixes=('_base', '_nueva'))
+    tabla['ratio_tiempo'] = tabla['mediana_s_nueva'] / tabla['mediana_s_base']
+    tabla['ratio_memoria'] = tabla['pico_memoria_mb_nueva'] / tabla['pico_memoria_mb_base']
+    return tabla[['escenario', 'escala', 'mediana_s_base', 'mediana_s_nueva', 'ratio_tiempo', 'ratio_memoria']].round(3)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks de eda_insights con datos sintéticos')
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--escenarios', nargs='+', choices=list(ESCENARIOS))
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help='fichero JSON (por defecto resultados/<fecha>.json)')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NUEVO'))
+    args = parser.parse_args()
+
+    if args.comparar:
+        print(comparar(*args.comparar).to_string(index=False))
+    else:
+        informe = ejecutar(args.escalas, args.escenarios, args.repeticiones, args.semilla)
+        salida = args.salida or os.path.join(
+            RUTA_RESULTADOS, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=1)
+        print(f"Resultados guardados en {salida}")
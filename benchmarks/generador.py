@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Generador de logs web sintéticos con la misma forma que los ficheros originales
+# (df_final_web_data, df_final_experiment_clients, df_final_demo).
+
+PASOS = ['start', 'step_1', 'step_2', 'step_3', 'confirm']
+
+# Clientes de la muestra original (df_final_demo): escala 1x
+CLIENTES_MUESTRA = 70_609
+
+# Probabilidad de pasar de cada paso (filas) a cada paso o a abandonar la visita
+# (columnas: start, step_1, step_2, step_3, confirm, fin)
+TRANSICIONES = np.array([
+    [0.05, 0.75, 0.02, 0.01, 0.00, 0.17],
+    [0.08, 0.05, 0.70, 0.02, 0.01, 0.14],
+    [0.03, 0.08, 0.04, 0.72, 0.01, 0.12],
+    [0.02, 0.03, 0.07, 0.05, 0.75, 0.08],
+    [0.02, 0.00, 0.00, 0.02, 0.06, 0.90],
+])
+
+
+def generar_logs(n_clientes=CLIENTES_MUESTRA, escala=1, visitas_media=2.5, transiciones=TRANSICIONES,
+                 prob_error=0.05, prob_duplicado=0.01, reparto=(0.45, 0.45), max_pasos=30,
+                 como_texto=True, semilla=0):
+    """
+    Genera logs web, asignación al experimento y datos demográficos sintéticos.
+
+    Las visitas siguen una cadena de Markov sobre los pasos del funnel; cada evento
+    tiene una duración log-normal salvo los errores, que se registran con diferencia
+    de tiempo cero (como los que detecta detectar_errores_funnel).
+
+    Parámetros:
+    - n_clientes: clientes a escala 1.
+    - escala: multiplicador del número de clientes (1, 10, 100...).
+    - visitas_media: media de visitas por cliente (1 + Poisson).
+    - transiciones: matriz 5x6 de probabilidades paso -> paso / fin.
+    - prob_error: probabilidad de que un evento se registre con tiempo cero.
+    - prob_duplicado: probabilidad de que una fila se repita tal cual en el log.
+    - reparto: proporción de clientes en (Control, Test); el resto queda sin Variation.
+    - max_pasos: longitud máxima de una visita.
+    - como_texto: si es True, date_time se devuelve como texto, igual que en los .txt.
+    - semilla: semilla del generador aleatorio.
+
+    Devuelve:
+    - (df_web, df_exp_cli, df_final_demo)
+    """
+    rng = np.random.default_rng(semilla)
+    n = int(n_clientes * escala)
+    clientes = rng.choice(np.arange(1000, max(10_000_000, 2 * n + 1000)), n, replace=False)
+
+    # Visitas: cada una con su cliente y su instante de inicio
+    visitas_por_cliente = 1 + rng.poisson(max(visitas_media - 1, 0), n)
+    cliente_visita = np.repeat(clientes, visitas_por_cliente)
+    n_visitas = len(cliente_visita)
+    inicio = pd.Timestamp('2017-03-15').value + rng.integers(0, 90 * 86400, n_visitas) * 10**9
+
+    # Cadena de Markov avanzando todas las visitas activas a la vez
+    acumuladas = np.cumsum(transiciones, axis=1)
+    estado = np.zeros(n_visitas, dtype=np.int8)
+    activas = np.arange(n_visitas)
+    ev_visita, ev_paso = [], []
+    for _ in range(max_pasos):
+        ev_visita.append(activas)
+        ev_paso.append(estado[activas])
+        u = rng.random(len(activas))
+        siguiente = (u[:, None] > acumuladas[estado[activas]]).sum(axis=1)
+        continua = siguiente < len(PASOS)
+        activas = activas[continua]
+        estado[activas] = siguiente[continua]
+        if len(activas) == 0:
+            break
+    ev_visita = np.concatenate(ev_visita)
+    ev_paso = np.concatenate(ev_paso)
+
+    # Tiempos: la emisión por rondas ya deja los eventos de cada visita en orden
+    orden = np.argsort(ev_visita, kind='stable')
+    ev_visita, ev_paso = ev_visita[orden], ev_paso[orden]
+    duracion = np.round(rng.lognormal(4.5, 1.0, len(ev_visita))).astype(np.int64)
+    duracion[rng.random(len(ev_visita)) < prob_error] = 0
+    primero = np.ones(len(ev_visita), dtype=bool)
+    primero[1:] = ev_visita[1:] != ev_visita[:-1]
+    acumulado = np.cumsum(duracion) - duracion
+    desfase = acumulado - np.maximum.accumulate(np.where(primero, acumulado, 0))
+    date_time = inicio[ev_visita] + desfase * 10**9
+
+    visit_id = np.char.add(np.char.add(cliente_visita.astype(str), '_'), np.arange(n_visitas).astype(str))
+    visitor_id = np.char.add(cliente_visita.astype(str), '_v')
+    df_web = pd.DataFrame({
+        'client_id': cliente_visita[ev_visita],
+        'visitor_id': visitor_id[ev_visita],
+        'visit_id': visit_id[ev_visita],
+        'process_step': np.asarray(PASOS)[ev_paso],
+        'date_time': pd.to_datetime(date_time),
+    })
+    duplicados = df_web[rng.random(len(df_web)) < prob_duplicado]
+    df_web = pd.concat([df_web, duplicados]).sample(frac=1, random_state=semilla).reset_index(drop=True)
+    if como_texto:
+        df_web['date_time'] = df_web['date_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    p_control, p_test = reparto
+    variacion = rng.choice(np.array(['Control', 'Test', None], dtype=object), n,
+                           p=[p_control, p_test, 1 - p_control - p_test])
+    df_exp_cli = pd.DataFrame({'client_id': clientes, 'Variation': variacion})
+
+    tenure_yr = rng.integers(2, 55, n)
+    df_final_demo = pd.DataFrame({
+        'client_id': clientes,
+        'clnt_tenure_yr': tenure_yr.astype(float),
+        'clnt_tenure_mnth': (tenure_yr * 12 + rng.integers(0, 12, n)).astype(float),
+        'clnt_age': np.round(rng.uniform(18, 95, n) * 2) / 2,
+        'gendr': rng.choice(['M', 'F', 'U', 'X'], n, p=[0.34, 0.32, 0.33, 0.01]),
+        'num_accts': rng.integers(1, 8, n).astype(float),
+        'bal': np.round(rng.lognormal(11, 1.1, n), 2),
+        'calls_6_mnth': rng.integers(0, 7, n).astype(float),
+        'logons_6_mnth': rng.integers(3, 10, n).astype(float),
+    })
+    return df_web, df_exp_cli, df_final_demo
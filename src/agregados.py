@@ -0,0 +1,158 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from funnel import detectar_errores_mascara
+from sketches import SketchCuantiles, cubeta_log
+
+CLAVES_PASO = ['Variation', 'process_step', 'fecha']
+
+
+class AlmacenAgregados:
+    """
+    Almacén persistente de estadísticos suficientes por Variation, process_step y día.
+
+    Cada día se guarda como una partición Parquet independiente, así que actualizar
+    con días nuevos solo escribe esas particiones. Se guardan tres tablas:
+    - estadisticos: registros, errores y suma / suma de cuadrados de time_diff_sec.
+    - cuantiles: histograma logarítmico de time_diff_sec (se suma entre días).
+    - clientes: por cliente y día, Variation, si llegó a confirm y tiempo total.
+
+    Las visitas que cruzan la medianoche pierden la diferencia de tiempo de su
+    último evento del día, igual que si se procesara cada día por separado.
+    """
+
+    TABLAS = ('estadisticos', 'cuantiles', 'clientes')
+
+    def __init__(self, ruta, error_relativo=0.01, step_objetivo='confirm'):
+        self.ruta = ruta
+        self.error_relativo = error_relativo
+        self.gamma = (1 + error_relativo) / (1 - error_relativo)
+        self.step_objetivo = step_objetivo
+        os.makedirs(ruta, exist_ok=True)
+
+    def dias_procesados(self):
+        ruta_tabla = os.path.join(self.ruta, 'estadisticos')
+        if not os.path.exists(ruta_tabla):
+            return set()
+        return {nombre.split('=', 1)[1] for nombre in os.listdir(ruta_tabla) if nombre.startswith('fecha=')}
+
+    def actualizar(self, df, sobrescribir=False):
+        """
+        Añade al almacén los días contenidos en df.
+
+        Parámetros:
+        - df: eventos ya pasados por calcular_diferencia_tiempo (si no tiene 'es_error',
+          se calcula con detectar_errores_mascara).
+        - sobrescribir: si es False y algún día ya está en el almacén, se lanza ValueError.
+
+        Devuelve:
+        - Lista de días escritos.
+        """
+        es_error = df['es_error'].to_numpy() if 'es_error' in df.columns else detectar_errores_mascara(df) != 0
+        fecha = df['date_time'].dt.strftime('%Y-%m-%d')
+        dias = sorted(fecha.dropna().unique())
+
+        repetidos = self.dias_procesados().intersection(dias)
+        if repetidos and not sobrescribir:
+            raise ValueError(f"Días ya presentes en el almacén: {sorted(repetidos)}")
+
+        tiempo = df['time_diff_sec']
+        eventos = pd.DataFrame({
+            'Variation': df['Variation'].astype(str),
+            'process_step': df['process_step'].astype(str),
+            'fecha': fecha,
+            'n_registros': 1,
+            'n_errores': es_error,
+            'n_tiempo': tiempo.notna(),
+            'suma_tiempo': tiempo.fillna(0),
+            'suma_cuadrados': tiempo.fillna(0) ** 2,
+        }).dropna(subset=['fecha'])
+        estadisticos = eventos.groupby(CLAVES_PASO, as_index=False).sum()
+
+        con_tiempo = eventos[eventos['n_tiempo']]
+        cuantiles = (
+            con_tiempo[CLAVES_PASO]
+            .assign(cubeta=cubeta_log(con_tiempo['suma_tiempo'], self.gamma))
+            .groupby(CLAVES_PASO + ['cubeta'], as_index=False)
+            .size()
+            .rename(columns={'size': 'conteo'})
+        )
+
+        clientes = pd.DataFrame({
+            'client_id': df['client_id'],
+            'fecha': fecha,
+            'Variation': df['Variation'].astype(str),
+            'completado': (df['process_step'] == self.step_objetivo).to_numpy(),
+            'total_time_sec': tiempo.fillna(0),
+        }).dropna(subset=['fecha']).groupby(['client_id', 'fecha'], as_index=False).agg(
+            {'Variation': 'first', 'completado': 'max', 'total_time_sec': 'sum'})
+
+        for nombre, tabla in zip(self.TABLAS, (estadisticos, cuantiles, clientes)):
+            ruta_tabla = os.path.join(self.ruta, nombre)
+            for dia in dias:
+                shutil.rmtree(os.path.join(ruta_tabla, f'fecha={dia}'), ignore_errors=True)
+            tabla.to_parquet(ruta_tabla, partition_cols=['fecha'], index=False)
+        return dias
+
+    def _leer(self, nombre, dias=None):
+        dataset = ds.dataset(os.path.join(self.ruta, nombre), format='parquet', partitioning='hive')
+        filtro = ds.field('fecha').isin(list(dias)) if dias is not None else None
+        df = dataset.to_table(filter=filtro).to_pandas()
+        df['fecha'] = df['fecha'].astype(str)
+        return df
+
+    def tasa_finalizacion(self, dias=None):
+        """Mismo formato que calcular_tasa_finalizacion, sobre los días indicados (todos por defecto)."""
+        clientes = self._leer('clientes', dias).groupby('client_id').agg(
+            Variation=('Variation', 'first'), completado=('completado', 'max'))
+        resumen = clientes.groupby('Variation').agg(
+            clientes_completados=('completado', 'sum'),
+            total_clientes=('completado', 'size'),
+        )
+        # Grupos sin clientes completados: NaN y al final, como calcular_tasa_finalizacion
+        completados = resumen['clientes_completados']
+        if (completados == 0).any():
+            resumen['clientes_completados'] = completados.where(completados > 0)
+            resumen = pd.concat([resumen[completados > 0], resumen[completados == 0]])
+        resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
+        return resumen.round(2).reset_index()
+
+    def tiempo_total_por_cliente(self, dias=None):
+        """Mismo formato que calcular_tiempo_total_por_cliente."""
+        return self._leer('clientes', dias).groupby(['client_id', 'Variation'], as_index=False)['total_time_sec'].sum()
+
+    def tasa_errores(self, dias=None, por_dia=False):
+        """Mismo formato que calcular_tasa(df, 'es_error', 'Variation', 'process_step')."""
+        claves = CLAVES_PASO if por_dia else CLAVES_PASO[:2]
+        tasa = self._leer('estadisticos', dias).groupby(claves)[['n_registros', 'n_errores']].sum()
+        tasa.columns = ['total_registros', 'n_eventos']
+        tasa['tasa_%'] = (tasa['n_eventos'] / tasa['total_registros']) * 100
+        return tasa.reset_index().sort_values(claves)
+
+    def kpis_tiempo(self, dias=None):
+        """
+        KPIs de time_diff_sec por Variation y paso: media y desviación exactas (a partir de
+        sumas) y median, mode e IQR aproximados con el histograma logarítmico.
+        """
+        claves = CLAVES_PASO[:2]
+        est = self._leer('estadisticos', dias).groupby(claves)[['n_tiempo', 'suma_tiempo', 'suma_cuadrados']].sum()
+        n = est['n_tiempo']
+        media = est['suma_tiempo'] / n
+        varianza = (est['suma_cuadrados'] - n * media ** 2) / (n - 1)
+
+        hist = self._leer('cuantiles', dias).drop(columns='fecha')
+        sketch = SketchCuantiles(hist, claves, self.error_relativo).fusionar()
+        cuartiles = sketch.cuantiles((0.25, 0.5, 0.75))
+
+        return pd.DataFrame({
+            'n': n,
+            'media': media,
+            'desviacion': np.sqrt(varianza.clip(lower=0)),
+            'median': cuartiles[0.5],
+            'mode': sketch.moda(),
+            'IQR': cuartiles[0.75] - cuartiles[0.25],
+        }).reset_index()
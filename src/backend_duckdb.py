@@ -0,0 +1,399 @@
+import glob
+import os
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from funnel import ORDEN_PASOS
+from indice_clientes import COLUMNAS_EVENTO
+from ingesta import FORMATO_FECHA, RUTA_PARQUET, RUTA_RAW
+
+# Backend alternativo: las funciones principales de eda_insights como SQL sobre una
+# base DuckDB embebida en fichero. Cada paso deja su resultado en una tabla de la base
+# (web_v, clientes, web_diff, web_sorted), así que el pipeline completo se ejecuta
+# multihilo y fuera de memoria; los resultados se devuelven como los DataFrame del
+# camino pandas (mismas filas, orden, columnas y tipos).
+#
+# Uso:
+#   bd = BackendDuckDB()                      # data/vanguard.duckdb
+#   bd.registrar_parquet()                    # o bd.registrar_raw()
+#   df_web_v, df = bd.preparar_datos_web()
+#   df_web_diff = bd.calcular_diferencia_tiempo()
+#   df_web_sorted = bd.detectar_errores_funnel()
+#   bd.calcular_tasa_finalizacion(), bd.calcular_tiempo_total_por_cliente()
+
+RUTA_DB = os.path.join(os.path.dirname(__file__), '..', 'data', 'vanguard.duckdb')
+
+# Tipos con los que los loaders de ingesta devuelven cada columna desde Parquet
+TIPOS_PARQUET = {
+    'visitor_id': 'string',
+    'visit_id': 'string',
+    'process_step': 'category',
+    'prev_step': 'category',
+    'Variation': 'category',
+    'gendr': 'category',
+}
+
+# Columna interna con la posición de cada fila (el orden del DataFrame equivalente)
+FILA = '_fila'
+
+# Textos que pd.read_csv lee como nulos por defecto (na_values); el experimento marca
+# los clientes sin Variation con 'NA'
+NULOS_CSV = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def _ident(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _lista(columnas, prefijo=''):
+    return ', '.join(prefijo + _ident(c) for c in columnas)
+
+
+def _literal(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+class BackendDuckDB:
+    """
+    Ejecuta preparar_datos_web, calcular_diferencia_tiempo, detectar_errores_funnel,
+    calcular_tasa_finalizacion y calcular_tiempo_total_por_cliente en DuckDB.
+
+    Parámetros:
+    - ruta_db: fichero de la base (':memory:' para no escribir a disco).
+    - hilos: número de hilos de DuckDB (por defecto, todos los núcleos).
+    - memoria_max: límite de memoria, p. ej. '4GB'; por encima DuckDB usa disco.
+    - dir_temporal: carpeta para los datos que no caben en memoria.
+    """
+
+    def __init__(self, ruta_db=RUTA_DB, hilos=None, memoria_max=None, dir_temporal=None):
+        if ruta_db != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(ruta_db)), exist_ok=True)
+        self.con = duckdb.connect(ruta_db)
+        # El orden de inserción define el orden de las filas leídas de texto
+        self.con.execute("SET preserve_insertion_order = true")
+        if hilos:
+            self.con.execute(f"SET threads = {int(hilos)}")
+        if memoria_max:
+            self.con.execute(f"SET memory_limit = {_literal(memoria_max)}")
+        if dir_temporal:
+            self.con.execute(f"SET temp_directory = {_literal(dir_temporal)}")
+        self.tipos = {}
+
+    def cerrar(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    # Orígenes
+
+    def registrar_raw(self, ruta_raw=RUTA_RAW):
+        """
+        Carga los .txt originales en la base (web_origen, experimento, demo). Los logs se
+        leen con los mismos tipos y nulos que pd.read_csv y date_time como texto, que se
+        convierte en preparar_datos_web.
+        """
+        nulos = '[' + ', '.join(_literal(n) for n in NULOS_CSV) + ']'
+        ficheros_web = sorted(glob.glob(os.path.join(ruta_raw, 'df_final_web_data_pt_*.txt')))
+        if not ficheros_web:
+            raise FileNotFoundError(f"No se encontraron logs web en {ruta_raw}")
+        lista = '[' + ', '.join(_literal(f) for f in ficheros_web) + ']'
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE _web_raw AS
+            SELECT * FROM read_csv({lista}, header = true, all_varchar = true, nullstr = {nulos})
+        """)
+        self.con.execute("ALTER TABLE _web_raw ALTER client_id TYPE BIGINT")
+        for tabla, fichero in (('experimento', 'df_final_experiment_clients.txt'), ('demo', 'df_final_demo.txt')):
+            self.con.execute(f"""
+                CREATE OR REPLACE TABLE _{tabla}_raw AS
+                SELECT * FROM read_csv({_literal(os.path.join(ruta_raw, fichero))}, header = true,
+                                        nullstr = {nulos})
+            """)
+        for tabla in ('web', 'experimento', 'demo'):
+            nombre = 'web_origen' if tabla == 'web' else tabla
+            self.con.execute(f"CREATE OR REPLACE VIEW {nombre} AS SELECT *, rowid AS {FILA} FROM _{tabla}_raw")
+        self.tipos = {}
+        return self
+
+    def registrar_parquet(self, ruta_parquet=RUTA_PARQUET):
+        """
+        Registra como vistas los ficheros generados por convertir_raw_a_parquet, que se leen
+        directamente en cada consulta (sin la partición 'fecha', como cargar_web).
+        """
+        web = _literal(os.path.join(ruta_parquet, 'web', '**', '*.parquet'))
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW web_origen AS
+            SELECT * EXCLUDE (fecha, filename, file_row_number),
+                   row_number() OVER (ORDER BY filename, file_row_number) - 1 AS {FILA}
+            FROM read_parquet({web}, hive_partitioning = true, filename = true, file_row_number = true)
+        """)
+        for tabla, fichero in (('experimento', 'experiment_clients.parquet'), ('demo', 'demo.parquet')):
+            ruta = _literal(os.path.join(ruta_parquet, fichero))
+            self.con.execute(f"""
+                CREATE OR REPLACE VIEW {tabla} AS
+                SELECT * EXCLUDE (file_row_number), file_row_number AS {FILA}
+                FROM read_parquet({ruta}, file_row_number = true)
+            """)
+        self.tipos = TIPOS_PARQUET
+        return self
+
+    def registrar_df(self, nombre, df):
+        """Registra un DataFrame como tabla de entrada (p. ej. web_origen) conservando su orden."""
+        self.con.register('_entrada', df.reset_index(drop=True).assign(**{FILA: np.arange(len(df))}))
+        self.con.execute(f"CREATE OR REPLACE TABLE {_ident(nombre)} AS SELECT * FROM _entrada")
+        self.con.unregister('_entrada')
+        return self
+
+    # Utilidades
+
+    def _columnas(self, tabla):
+        return [c for c in self.con.execute(f"SELECT * FROM {_ident(tabla)} LIMIT 0").df().columns if c != FILA]
+
+    def _tipo(self, tabla, columna):
+        fila = self.con.execute(
+            f"SELECT column_type FROM (DESCRIBE {_ident(tabla)}) WHERE column_name = ?", [columna]).fetchone()
+        return fila[0]
+
+    def _a_pandas(self, consulta):
+        """Resultado de una consulta con los tipos del camino pandas."""
+        df = self.con.execute(consulta).df()
+        df = df.drop(columns=[FILA], errors='ignore')
+        for col in df.columns:
+            tipo = df[col].dtype
+            if isinstance(tipo, pd.Int64Dtype) or str(tipo) in ('Int8', 'Int16', 'Int32', 'Int64'):
+                # Enteros con nulos: float64 con NaN, como pandas tras un shift o un map
+                df[col] = df[col].astype(np.float64) if df[col].isna().any() else df[col].astype(np.int64)
+            elif col in self.tipos:
+                df[col] = df[col].astype(self.tipos[col])
+        return df
+
+    def tabla(self, nombre):
+        """Contenido de una tabla de la base como DataFrame, en el orden del camino pandas."""
+        return self._a_pandas(f"SELECT * FROM {_ident(nombre)} ORDER BY {FILA}")
+
+    # Pasos del pipeline
+
+    def preparar_datos_web(self, devolver=True):
+        """
+        Equivalente a preparar_datos_web: une los logs web con los clientes del experimento
+        (con Variation) eliminando eventos duplicados y une los datos demográficos.
+
+        Crea las tablas web_v y clientes. Devuelve (df_web_v, df) o, con devolver=False,
+        los nombres de las tablas.
+        """
+        web = self._columnas('web_origen')
+        exp = [c for c in self._columnas('experimento') if c != 'client_id']
+        demo = self._columnas('demo')
+
+        fecha = _ident('date_time')
+        if self._tipo('web_origen', 'date_time') in ('VARCHAR',):
+            fecha = f"try_strptime({fecha}, {_literal(FORMATO_FECHA)})"
+        columnas_web = ', '.join(
+            f"{fecha} AS {_ident(c)}" if c == 'date_time' else f"w.{_ident(c)}" for c in web)
+        dedup = [c for c in COLUMNAS_EVENTO if c in web]
+
+        self.con.execute(f"""
+            CREATE OR REPLACE TEMP VIEW _experimento_v AS
+            SELECT * FROM experimento WHERE "Variation" IS NOT NULL
+        """)
+        # Unión en el orden de los logs; de cada evento repetido se queda la primera fila
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE web_v AS
+            SELECT * EXCLUDE (_repeticion, _fila_web, _fila_exp),
+                   row_number() OVER (ORDER BY _fila_web, _fila_exp) - 1 AS {FILA}
+            FROM (
+                SELECT *, row_number() OVER (PARTITION BY {_lista(dedup)} ORDER BY _fila_web, _fila_exp) AS _repeticion
+                FROM (
+                    SELECT {columnas_web}, {_lista(exp, 'e.')}, w.{FILA} AS _fila_web, e.{FILA} AS _fila_exp
+                    FROM web_origen w JOIN _experimento_v e ON w.client_id = e.client_id
+                )
+            )
+            WHERE _repeticion = 1
+        """)
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE clientes AS
+            SELECT {_lista(demo, 'd.')}, {_lista(exp, 'e.')},
+                   row_number() OVER (ORDER BY d.{FILA}, e.{FILA}) - 1 AS {FILA}
+            FROM demo d JOIN _experimento_v e ON d.client_id = e.client_id
+        """)
+        if not devolver:
+            return 'web_v', 'clientes'
+        return self.tabla('web_v'), self.tabla('clientes')
+
+    def calcular_diferencia_tiempo(self, origen='web_v', destino='web_diff', devolver=True,
+                                   client_col='client_id', visit_col='visit_id', time_col='date_time'):
+        """
+        Equivalente a calcular_diferencia_tiempo: ordena por cliente, visita y fecha
+        (estable) y calcula con LEAD el tiempo hasta el siguiente evento de la visita.
+        Añade time_diff (intervalo) y time_diff_sec.
+        """
+        cliente, visita, fecha = _ident(client_col), _ident(visit_col), _ident(time_col)
+        columnas = self._columnas(origen)
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE {_ident(destino)} AS
+            SELECT {_lista(columnas)},
+                   siguiente - {fecha} AS time_diff,
+                   date_diff('microsecond', {fecha}, siguiente) / 1000000 AS time_diff_sec,
+                   row_number() OVER (ORDER BY {cliente} NULLS LAST, {visita} NULLS LAST,
+                                      {fecha} NULLS LAST, {FILA}) - 1 AS {FILA}
+            FROM (
+                SELECT *,
+                       CASE WHEN {cliente} IS NOT NULL AND {visita} IS NOT NULL
+                            THEN lead({fecha}) OVER (PARTITION BY {cliente}, {visita}
+                                                     ORDER BY {fecha} NULLS LAST, {FILA})
+                       END AS siguiente
+                FROM {_ident(origen)}
+            )
+        """)
+        return self.tabla(destino) if devolver else destino
+
+    def detectar_errores_funnel(self, origen='web_diff', destino='web_sorted', devolver=True,
+                                step_col='process_step', client_col='client_id', visit_col='visit_id',
+                                time_diff_col='time_diff_sec'):
+        """
+        Equivalente a detectar_errores_funnel: paso anterior de la visita con LAG (en el
+        orden de las filas) y las cuatro marcas de error más es_error.
+        """
+        paso, cliente, visita, diferencia = (_ident(c) for c in (step_col, client_col, visit_col, time_diff_col))
+        numero = ' '.join(f"WHEN {_literal(p)} THEN {i}" for i, p in enumerate(ORDEN_PASOS))
+        columnas = self._columnas(origen)
+        cero = f"{diferencia} = 0"
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE {_ident(destino)} AS
+            SELECT * EXCLUDE (m1, m2, m3, m4),
+                   m1 AS repetido_mismo_paso, m2 AS retroceso_cero,
+                   m3 AS salto_grande_atras, m4 AS salto_grande_adelante,
+                   m1 OR m2 OR m3 OR m4 AS es_error
+            FROM (
+                SELECT {_lista(columnas)}, step_num, prev_step_num, prev_step,
+                       coalesce({paso} = prev_step AND {cero}, false) AS m1,
+                       coalesce({cero} AND prev_step_num < step_num, false) AS m2,
+                       coalesce({cero} AND prev_step_num - step_num >= 2, false) AS m3,
+                       coalesce({cero} AND step_num - prev_step_num >= 2, false) AS m4,
+                       {FILA}
+                FROM (
+                    SELECT *,
+                           CASE WHEN {cliente} IS NOT NULL AND {visita} IS NOT NULL
+                                THEN lag(step_num) OVER visita END AS prev_step_num,
+                           CASE WHEN {cliente} IS NOT NULL AND {visita} IS NOT NULL
+                                THEN lag({paso}) OVER visita END AS prev_step
+                    FROM (
+                        SELECT *, CAST(CASE {paso} {numero} END AS BIGINT) AS step_num
+                        FROM {_ident(origen)}
+                    )
+                    WINDOW visita AS (PARTITION BY {cliente}, {visita} ORDER BY {FILA})
+                )
+            )
+        """)
+        return self.tabla(destino) if devolver else destino
+
+    def calcular_tasa_finalizacion(self, origen='web_v', step_col='process_step', step_objetivo='confirm',
+                                   cliente_col='client_id', grupo_col='Variation'):
+        """Equivalente a calcular_tasa_finalizacion: [grupo_col, clientes_completados, total_clientes, tasa_%]."""
+        paso, cliente, grupo = _ident(step_col), _ident(cliente_col), _ident(grupo_col)
+        resumen = self._a_pandas(f"""
+            SELECT {grupo},
+                   count(DISTINCT {cliente}) FILTER (WHERE {paso} = {_literal(step_objetivo)}) AS clientes_completados,
+                   count(DISTINCT {cliente}) AS total_clientes,
+                   bool_or({cliente} IS NULL) AS _cliente_nulo,
+                   bool_or({cliente} IS NULL AND {paso} = {_literal(step_objetivo)}) AS _completado_nulo
+            FROM {_ident(origen)}
+            WHERE {grupo} IS NOT NULL
+            GROUP BY {grupo}
+            -- Grupos sin finalizaciones al final, como al concatenar los dos conteos en pandas
+            ORDER BY clientes_completados > 0 OR _completado_nulo DESC, {grupo}
+        """)
+        # drop_duplicates cuenta el cliente nulo como uno más; count(DISTINCT) no
+        resumen['total_clientes'] += resumen.pop('_cliente_nulo').astype(np.int64)
+        resumen['clientes_completados'] += resumen.pop('_completado_nulo').astype(np.int64)
+        completados = resumen['clientes_completados']
+        if (completados == 0).any():
+            # Grupos sin finalizaciones: NaN, como al concatenar los dos conteos en pandas
+            resumen['clientes_completados'] = completados.where(completados > 0)
+        resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
+        return resumen.round(2)
+
+    def calcular_tiempo_total_por_cliente(self, origen='web_sorted', tiempo_col='time_diff_sec',
+                                          cliente_col='client_id', grupo_col='Variation'):
+        """Equivalente a calcular_tiempo_total_por_cliente: cliente, grupo, total_time_sec."""
+        cliente, grupo = _ident(cliente_col), _ident(grupo_col)
+        return self._a_pandas(f"""
+            SELECT {cliente}, {grupo}, coalesce(fsum({_ident(tiempo_col)}), 0) AS total_time_sec
+            FROM {_ident(origen)}
+            WHERE {cliente} IS NOT NULL AND {grupo} IS NOT NULL
+            GROUP BY {cliente}, {grupo}
+            ORDER BY {cliente}, {grupo}
+        """)
+
+
+def comparar_con_pandas(backend, df_web, df_exp_cli, df_final_demo):
+    """
+    Ejecuta los cinco pasos con el backend y con eda_insights sobre los mismos datos
+    (los DataFrame deben venir de los ficheros registrados en el backend) y comprueba
+    que los resultados son idénticos.
+
+    Devuelve:
+    - Diccionario {paso: None si coinciden, o el mensaje de la diferencia}.
+    """
+    import eda_insights as E
+
+    pandas_web_v, pandas_df = E.preparar_datos_web(df_web, None, df_exp_cli, df_final_demo)
+    pandas_diff = E.calcular_diferencia_tiempo(pandas_web_v)
+    pandas_sorted = E.detectar_errores_funnel(pandas_diff)
+    esperado = {
+        'web_v': pandas_web_v,
+        'clientes': pandas_df,
+        'web_diff': pandas_diff,
+        'web_sorted': pandas_sorted,
+        'tasa_finalizacion': E.calcular_tasa_finalizacion(pandas_web_v),
+        'tiempo_total': E.calcular_tiempo_total_por_cliente(pandas_sorted),
+    }
+    web_v, clientes = backend.preparar_datos_web()
+    obtenido = {
+        'web_v': web_v,
+        'clientes': clientes,
+        'web_diff': backend.calcular_diferencia_tiempo(),
+        'web_sorted': backend.detectar_errores_funnel(),
+        'tasa_finalizacion': backend.calcular_tasa_finalizacion(),
+        'tiempo_total': backend.calcular_tiempo_total_por_cliente(),
+    }
+    diferencias = {}
+    for paso, df in esperado.items():
+        try:
+            pd.testing.assert_frame_equal(obtenido[paso], df.reset_index(drop=True))
+            diferencias[paso] = None
+        except AssertionError as e:
+            diferencias[paso] = str(e)
+    return diferencias
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import ingesta
+
+    parser = argparse.ArgumentParser(description='Paridad del backend DuckDB con el camino pandas')
+    parser.add_argument('--raw', help='carpeta con los .txt originales')
+    parser.add_argument('--parquet', help='carpeta generada por convertir_raw_a_parquet')
+    parser.add_argument('--db', default=':memory:')
+    args = parser.parse_args()
+
+    with BackendDuckDB(args.db) as bd:
+        if args.raw:
+            bd.registrar_raw(args.raw)
+            entradas = [pd.read_csv(os.path.join(args.raw, f)) for f in (
+                'df_final_web_data_pt_1.txt', 'df_final_experiment_clients.txt', 'df_final_demo.txt')]
+            entradas[0] = pd.concat([entradas[0], pd.read_csv(os.path.join(args.raw, 'df_final_web_data_pt_2.txt'))])
+        else:
+            bd.registrar_parquet(args.parquet or RUTA_PARQUET)
+            entradas = ingesta.cargar_datos(args.parquet or RUTA_PARQUET)
+        for paso, diferencia in comparar_con_pandas(bd, *entradas).items():
+            print(f"{paso:<20} {'OK' if diferencia is None else 'DIFERENTE'}")
+            if diferencia:
+                print(diferencia)
@@ -0,0 +1,131 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Datos de cada proceso del pool (se envían una sola vez con el initializer)
+_DATOS = {}
+
+
+def _iniciar(datos):
+    _DATOS.clear()
+    _DATOS.update(datos)
+
+
+def _lote_bootstrap(tarea):
+    """Calcula 'tamano' réplicas del estimador de razón para cada grupo con una semilla propia."""
+    semilla, tamano, metodo = tarea
+    rng = np.random.default_rng(semilla)
+    replicas = {}
+    for grupo, (numerador, denominador) in _DATOS.items():
+        n = len(numerador)
+        if metodo == 'poisson':
+            # Pesos Poisson(1): cada cliente entra un número aleatorio de veces
+            pesos = rng.poisson(1.0, size=(tamano, n)).astype(np.float32)
+        else:
+            indices = rng.integers(0, n, size=(tamano, n))
+            pesos = np.zeros((tamano, n), dtype=np.float32)
+            np.add.at(pesos, (np.arange(tamano)[:, None], indices), 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            replicas[grupo] = (pesos @ numerador) / (pesos @ denominador)
+    return replicas
+
+
+def bootstrap_cluster(numerador, denominador, grupos, n_remuestreos=10_000, nivel=0.95,
+                      semilla=42, n_procesos=1, tam_lote=250, metodo='poisson'):
+    """
+    Intervalos de confianza bootstrap remuestreando clientes (clusters) dentro de cada grupo.
+
+    El estadístico es sum(numerador) / sum(denominador) de los clientes remuestreados,
+    así que sirve tanto para tasas por cliente (denominador = 1) como para tasas por
+    evento agregadas por cliente (errores / eventos), respetando la correlación
+    de los eventos de un mismo cliente.
+
+    Parámetros:
+    - numerador, denominador, grupos: arrays alineados, una fila por cliente.
+    - n_remuestreos: número de réplicas bootstrap.
+    - nivel: nivel de confianza del intervalo de percentiles.
+    - semilla: semilla base; el resultado no depende de n_procesos.
+    - n_procesos: procesos para repartir los lotes de réplicas.
+    - tam_lote: réplicas por lote (controla la memoria: tam_lote x clientes).
+    - metodo: 'poisson' (pesos Poisson(1)) o 'multinomial' (remuestreo clásico).
+
+    Devuelve:
+    - DataFrame con una fila por grupo y otra por diferencia respecto al primer grupo
+      (p. ej. 'Test - Control'): estimacion, ic_inf, ic_sup.
+    """
+    numerador = np.asarray(numerador, dtype=np.float64)
+    denominador = np.asarray(denominador, dtype=np.float64)
+    grupos = np.asarray(grupos)
+    nombres = sorted(pd.unique(grupos[pd.notna(grupos)]))
+    datos = {g: (numerador[grupos == g], denominador[grupos == g]) for g in nombres}
+
+    tamanos = [tam_lote] * (n_remuestreos // tam_lote)
+    if n_remuestreos % tam_lote:
+        tamanos.append(n_remuestreos % tam_lote)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [(s, t, metodo) for s, t in zip(semillas, tamanos)]
+
+    if n_procesos == 1:
+        _iniciar(datos)
+        lotes = [_lote_bootstrap(t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar, initargs=(datos,)) as pool:
+            lotes = list(pool.map(_lote_bootstrap, tareas))
+    replicas = {g: np.concatenate([lote[g] for lote in lotes]) for g in nombres}
+
+    alfa = (1 - nivel) / 2
+    filas = []
+    for g in nombres:
+        num, den = datos[g]
+        filas.append({'grupo': g, 'estimacion': num.sum() / den.sum(),
+                      'ic_inf': np.nanquantile(replicas[g], alfa), 'ic_sup': np.nanquantile(replicas[g], 1 - alfa)})
+    referencia = nombres[0]
+    for g in nombres[1:]:
+        diferencia = replicas[g] - replicas[referencia]
+        filas.append({'grupo': f'{g} - {referencia}',
+                      'estimacion': filas[nombres.index(g)]['estimacion'] - filas[0]['estimacion'],
+                      'ic_inf': np.nanquantile(diferencia, alfa), 'ic_sup': np.nanquantile(diferencia, 1 - alfa)})
+    return pd.DataFrame(filas)
+
+
+def tabla_clientes_kpi(df_web_sorted, df_merged=None, step_objetivo='confirm', cliente_col='client_id', grupo_col='Variation'):
+    """
+    Resume los eventos (salida de detectar_errores_funnel) en una fila por cliente:
+    completado, n_eventos, n_errores y total_time_sec; y first_attempt_success si se
+    pasa el df_merged de obtener_primera (NaN para los clientes no evaluados).
+    """
+    clientes = df_web_sorted.assign(
+        completado=df_web_sorted['process_step'] == step_objetivo,
+    ).groupby([cliente_col, grupo_col], observed=True).agg(
+        completado=('completado', 'max'),
+        n_eventos=('completado', 'size'),
+        n_errores=('es_error', 'sum'),
+        total_time_sec=('time_diff_sec', 'sum'),
+    ).reset_index()
+    if df_merged is not None:
+        clientes = clientes.merge(df_merged[[cliente_col, 'first_attempt_success']], on=cliente_col, how='left')
+    return clientes
+
+
+def ic_kpis(clientes, grupo_col='Variation', **kwargs):
+    """
+    Intervalos bootstrap por cliente para los KPIs del experimento a partir de tabla_clientes_kpi:
+    tasa de finalización, éxito al primer intento, tiempo total medio y tasa de error.
+    Los argumentos extra se pasan a bootstrap_cluster.
+    """
+    uno = np.ones(len(clientes))
+    kpis = {
+        'tasa_finalizacion': (clientes['completado'].astype(float), uno),
+        'tiempo_total_medio': (clientes['total_time_sec'], uno),
+        'tasa_error': (clientes['n_errores'], clientes['n_eventos']),
+    }
+    if 'first_attempt_success' in clientes.columns:
+        evaluado = clientes['first_attempt_success'].notna()
+        kpis['first_attempt_success'] = (clientes['first_attempt_success'].fillna(0).astype(float), evaluado.astype(float))
+
+    resultados = []
+    for nombre, (numerador, denominador) in kpis.items():
+        ic = bootstrap_cluster(numerador, denominador, clientes[grupo_col].astype(object), **kwargs)
+        resultados.append(ic.assign(kpi=nombre))
+    return pd.concat(resultados, ignore_index=True)[['kpi', 'grupo', 'estimacion', 'ic_inf', 'ic_sup']]
@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from indice_clientes import IndiceClientes
+
+# Cubo de KPIs: conteos y sumas de los eventos para todas las combinaciones de un
+# conjunto de dimensiones, en un array denso con una posición extra de "total" por
+# dimensión. Cualquier corte o tasa se responde indexando, sin volver a los eventos.
+
+TOTAL = 'Total'
+
+# Máximo de valores del array denso (celdas con totales por capas): 50M float64 son 400 MB
+MAX_VALORES = 50_000_000
+
+# Bandas por defecto para las dimensiones demográficas continuas
+BANDAS = {
+    'clnt_age': [0, 30, 45, 60, 75, 120],
+    'clnt_tenure_yr': [0, 5, 10, 20, 30, 100],
+    'clnt_tenure_mnth': [0, 60, 120, 240, 360, 1200],
+    'bal': [0, 25_000, 50_000, 100_000, 250_000, np.inf],
+}
+
+
+class CuboKPI:
+    """
+    Cubo denso de KPIs por combinación de dimensiones.
+
+    Para cada celda guarda 'n' (eventos) y, por cada medida, su suma y el número de
+    valores no nulos; la última posición de cada eje es el total de esa dimensión.
+    Se construye con CuboKPI.desde_eventos.
+
+    Parámetros:
+    - valores: array (k1 + 1, ..., kd + 1, n_valores).
+    - dimensiones: nombres de los ejes.
+    - etiquetas: dict {dimension: lista de valores} (sin el total).
+    - medidas: nombres de las medidas.
+    """
+
+    def __init__(self, valores, dimensiones, etiquetas, medidas):
+        self.valores = valores
+        self.dimensiones = list(dimensiones)
+        self.etiquetas = {d: list(etiquetas[d]) for d in self.dimensiones}
+        self.medidas = list(medidas)
+        self.columnas = ['n'] + [f'{m}_{s}' for m in self.medidas for s in ('suma', 'n')]
+        self._posicion = {d: {v: i for i, v in enumerate(self.etiquetas[d])} for d in self.dimensiones}
+
+    @classmethod
+    def desde_eventos(cls, df, dimensiones, medidas=('es_error',), bandas=None, demo=None,
+                      col_fecha='date_time', cliente_col='client_id', max_valores=MAX_VALORES):
+        """
+        Construye el cubo en una sola pasada sobre los eventos.
+
+        Parámetros:
+        - df: eventos (p. ej. salida de detectar_errores_funnel).
+        - dimensiones: columnas a cruzar. 'dia' se deriva de col_fecha si no existe.
+        - medidas: columnas booleanas o numéricas a sumar (los nulos no cuentan).
+        - bandas: dict {columna: límites} para discretizar columnas continuas; por defecto
+          BANDAS para las demográficas que estén en dimensiones.
+        - demo: tabla de clientes (df_final_demo limpio) para añadir las columnas
+          demográficas que falten; los eventos sin cliente en demo se descartan.
+        - col_fecha, cliente_col: columnas de fecha y cliente.
+        - max_valores: tamaño máximo del cubo; si se supera se lanza ValueError (hay que
+          quitar dimensiones o agruparlas en bandas).
+        """
+        dimensiones, medidas = list(dimensiones), list(medidas)
+        bandas = {**{d: BANDAS[d] for d in dimensiones if d in BANDAS}, **(bandas or {})}
+
+        faltan = [d for d in dimensiones if d not in df.columns and d != 'dia']
+        if faltan:
+            if demo is None:
+                raise ValueError(f"Faltan dimensiones en los eventos: {faltan} (pasa demo para añadirlas)")
+            df = IndiceClientes(demo, cliente_col).unir(df, columnas=faltan)
+
+        codigos, etiquetas = [], {}
+        for d in dimensiones:
+            if d == 'dia' and d not in df.columns:
+                serie = df[col_fecha].dt.floor('D')
+            else:
+                serie = df[d]
+            if d in bandas:
+                # include_lowest: el primer límite (p. ej. saldo 0) entra en la primera banda
+                cortes = pd.cut(serie, bandas[d], include_lowest=True)
+                codigo, unicos = cortes.cat.codes.to_numpy(), [str(c) for c in cortes.cat.categories]
+            else:
+                codigo, unicos = pd.factorize(serie, sort=True)
+            codigos.append(codigo)
+            etiquetas[d] = list(unicos)
+
+        # Tamaño con enteros de Python (sin desbordamiento): un total por eje y n + 2 por medida
+        tamano = math.prod(len(etiquetas[d]) + 1 for d in dimensiones) * (1 + 2 * len(medidas))
+        if tamano > max_valores:
+            cardinalidades = {d: len(etiquetas[d]) for d in dimensiones}
+            raise ValueError(f"El cubo tendría {tamano:,} valores (máximo {max_valores:,}); "
+                             f"cardinalidades: {cardinalidades}. Quita dimensiones o usa bandas.")
+
+        # Las filas con alguna dimensión nula se descartan, como en groupby
+        validas = np.logical_and.reduce([c >= 0 for c in codigos]) if codigos else np.ones(len(df), dtype=bool)
+        forma = tuple(len(etiquetas[d]) for d in dimensiones)
+        celda = np.ravel_multi_index([c[validas] for c in codigos], forma) if dimensiones else np.zeros(validas.sum(), dtype=np.int64)
+        n_celdas = int(np.prod(forma))
+
+        capas = [np.bincount(celda, minlength=n_celdas)]
+        for m in medidas:
+            valores = df[m].to_numpy(dtype=np.float64, na_value=np.nan)[validas]
+            no_nulo = ~np.isnan(valores)
+            capas.append(np.bincount(celda[no_nulo], weights=valores[no_nulo], minlength=n_celdas))
+            capas.append(np.bincount(celda[no_nulo], minlength=n_celdas))
+        valores = np.stack(capas, axis=-1).astype(np.float64).reshape(forma + (len(capas),))
+
+        # Rollups: se añade el total de cada eje al final; al hacerlo eje a eje quedan
+        # todas las combinaciones de totales
+        for eje in range(len(dimensiones)):
+            valores = np.concatenate([valores, valores.sum(axis=eje, keepdims=True)], axis=eje)
+        return cls(valores, dimensiones, etiquetas, medidas)
+
+    def _indices(self, dimension, filtro):
+        if filtro is None:
+            return [len(self.etiquetas[dimension])]
+        valores = filtro if isinstance(filtro, (list, tuple, set)) else [filtro]
+        try:
+            return [self._posicion[dimension][v] for v in valores]
+        except KeyError as e:
+            raise KeyError(f"Valor {e} no encontrado en la dimensión '{dimension}'") from None
+
+    def tabla(self, por=(), incluir_vacios=False, **filtros):
+        """
+        Corte del cubo: una fila por combinación de 'por' con n, suma y no nulos de cada
+        medida. Las dimensiones filtradas se restringen a los valores indicados (valor o
+        lista, que se suman) y el resto se toman como total.
+
+        Ejemplo: cubo.tabla(por=['Variation'], process_step='confirm', gendr=['M', 'F'])
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        desconocidas = set(por) | set(filtros)
+        desconocidas -= set(self.dimensiones)
+        if desconocidas:
+            raise KeyError(f"Dimensiones desconocidas: {sorted(desconocidas)}")
+
+        indices = []
+        for d in self.dimensiones:
+            if d in por:
+                indices.append(list(range(len(self.etiquetas[d]))))
+            else:
+                indices.append(self._indices(d, filtros.get(d)))
+        bloque = self.valores[np.ix_(*indices, np.arange(self.valores.shape[-1]))]
+        sumar = tuple(i for i, d in enumerate(self.dimensiones) if d not in por)
+        bloque = bloque.sum(axis=sumar)
+
+        # Los ejes que quedan siguen el orden de self.dimensiones; se reordenan según 'por'
+        restantes = [d for d in self.dimensiones if d in por]
+        bloque = np.moveaxis(bloque, [restantes.index(d) for d in por], range(len(por)))
+        if por:
+            indice = pd.MultiIndex.from_product([self.etiquetas[d] for d in por], names=por)
+            if len(por) == 1:
+                indice = indice.get_level_values(0)
+        else:
+            indice = pd.Index([TOTAL])
+        resultado = pd.DataFrame(bloque.reshape(-1, bloque.shape[-1]), index=indice, columns=self.columnas)
+        conteos = ['n'] + [f'{m}_n' for m in self.medidas]
+        resultado[conteos] = resultado[conteos].astype(np.int64)
+        if not incluir_vacios:
+            resultado = resultado[resultado['n'] > 0]
+        return resultado
+
+    def tasa(self, medida, por=(), **filtros):
+        """
+        Porcentaje medio de una medida (para booleanas, % de eventos con True), como
+        calcular_tasa, para cualquier corte.
+        """
+        t = self.tabla(por, **filtros)
+        return (t[f'{medida}_suma'] / t[f'{medida}_n'] * 100).rename('tasa_%')
+
+    def media(self, medida, por=(), **filtros):
+        """Media de una medida numérica (p. ej. time_diff_sec) para cualquier corte."""
+        t = self.tabla(por, **filtros)
+        return (t[f'{medida}_suma'] / t[f'{medida}_n']).rename(f'media_{medida}')
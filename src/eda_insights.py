@@ -1,8 +1,42 @@
+import numpy as np
 import pandas as pd
 
-def filter_outliers_iqr(df, column, lower=True, upper=True, multiplier=1.5):
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
+from funnel import diferencia_siguiente
+from indice_clientes import COLUMNAS_EVENTO, IndiceClientes
+from instrumentacion import instrumentar
+from pipeline import Pipeline, primer_intento
+from sketches import SketchCuantiles
+
+# Esquemas para compactar_tipos: 'category', 'entero' (el entero más pequeño que
+# admite los valores) o 'decimal' (float32 si no se pierden los dos decimales)
+ESQUEMA_WEB = {
+    'client_id': 'entero',
+    'visitor_id': 'category',
+    'visit_id': 'category',
+    'process_step': 'category',
+    'Variation': 'category',
+}
+ESQUEMA_CLIENTES = {
+    'client_id': 'entero',
+    'clnt_tenure_yr': 'entero',
+    'clnt_tenure_mnth': 'entero',
+    'clnt_age': 'decimal',
+    'gendr': 'category',
+    'num_accts': 'entero',
+    'bal': 'decimal',
+    'calls_6_mnth': 'entero',
+    'logons_6_mnth': 'entero',
+    'Variation': 'category',
+}
+
+@instrumentar
+def filter_outliers_iqr(df, column, lower=True, upper=True, multiplier=1.5, cuartiles=None):
+    # cuartiles=(Q1, Q3) permite reutilizar límites ya calculados, p. ej. con SketchCuantiles.cuartiles()
+    if cuartiles is None:
+        Q1 = df[column].quantile(0.25)
+        Q3 = df[column].quantile(0.75)
+    else:
+        Q1, Q3 = cuartiles
     IQR = Q3 - Q1
 
     lower_bound = Q1 - multiplier * IQR
@@ -19,24 +53,30 @@ def filter_outliers_iqr(df, column, lower=True, upper=True, multiplier=1.5):
 
     return filtered_df
 
+@instrumentar
 def calcular_tasa(df, evento_col, grupo_col=None, step_col=None):
     if grupo_col and step_col:
-        total = df.groupby([grupo_col, step_col]).size().reset_index(name='total_registros')
-        eventos = df[df[evento_col]].groupby([grupo_col, step_col]).size().reset_index(name='n_eventos')
+        total = df.groupby([grupo_col, step_col], observed=True).size().reset_index(name='total_registros')
+        eventos = df[df[evento_col]].groupby([grupo_col, step_col], observed=True).size().reset_index(name='n_eventos')
         merged = pd.merge(total, eventos, on=[grupo_col, step_col], how='left').fillna(0)
         merged['tasa_%'] = (merged['n_eventos'] / merged['total_registros']) * 100
         return merged.sort_values([grupo_col, step_col])
     elif grupo_col:
-        return df.groupby(grupo_col)[evento_col].mean() * 100
+        return df.groupby(grupo_col, observed=True)[evento_col].mean() * 100
     else:
         return df[evento_col].mean() * 100
     
 
+@instrumentar
 def detectar_errores_funnel(df, step_col='process_step', client_col='client_id', visit_col='visit_id', time_diff_col='time_diff_sec'):
     step_order = {'start': 0, 'step_1': 1, 'step_2': 2, 'step_3': 3, 'confirm': 4}
     df = df.copy()
     
-    df['step_num'] = df[step_col].map(step_order)
+    pasos = df[step_col]
+    if isinstance(pasos.dtype, pd.CategoricalDtype):
+        # Con categóricas, map devolvería otra categórica sin orden y no se podría comparar
+        pasos = pasos.astype(object)
+    df['step_num'] = pasos.map(step_order)
     df['prev_step_num'] = df.groupby([client_col, visit_col])['step_num'].shift(1)
     df['prev_step'] = df.groupby([client_col, visit_col])[step_col].shift(1)
     
@@ -70,42 +110,109 @@ def detectar_errores_funnel(df, step_col='process_step', client_col='client_id',
     
     return df
 
-def calcular_diferencia_tiempo(df, client_col='client_id', visit_col='visit_id', time_col='date_time'):
-    df = df.sort_values(by=[client_col, visit_col, time_col]).reset_index(drop=True)
-    df['time_diff'] = df.groupby([client_col, visit_col])[time_col].shift(-1) - df[time_col]
-    df['time_diff_sec'] = df['time_diff'].dt.total_seconds()
+@instrumentar
+def calcular_diferencia_tiempo(df, client_col='client_id', visit_col='visit_id', time_col='date_time',
+                               compacto=False, dwell_por_paso=False, step_col='process_step', grupo_col='Variation'):
+    """
+    Ordena por cliente, visita y fecha y calcula el tiempo hasta el siguiente evento de
+    la misma visita (NaN en el último).
+
+    Si los datos ya vienen ordenados (p. ej. salida de esta misma función) no se
+    reordenan. Las diferencias se calculan directamente sobre el array de fechas, con
+    los cambios de visita marcados a partir de las claves ordenadas.
+
+    Parámetros:
+    - df: DataFrame con los eventos.
+    - client_col, visit_col, time_col: columnas de cliente, visita y fecha.
+    - compacto: si es True, solo se añade time_diff_sec en float32 (sin la columna
+      timedelta time_diff); float32 es exacto para segundos enteros de hasta ~190 días.
+    - dwell_por_paso: si es True, devuelve además el tiempo por paso (ver _dwell_por_paso).
+    - step_col, grupo_col: columnas usadas para el tiempo por paso.
+
+    Devuelve:
+    - DataFrame ordenado con índice 0..n-1 y las columnas time_diff / time_diff_sec,
+      o (DataFrame, tiempo por paso) si dwell_por_paso=True.
+    """
+    df, diferencia = diferencia_siguiente(df, client_col, visit_col, time_col)
+    segundos = diferencia / np.timedelta64(1, 's')
+
+    if compacto:
+        # Un time_diff previo (p. ej. de una llamada anterior) quedaría desalineado
+        df = df.drop(columns='time_diff', errors='ignore')
+        df['time_diff_sec'] = segundos.astype(np.float32)
+    else:
+        df['time_diff'] = diferencia
+        df['time_diff_sec'] = segundos
+
+    if dwell_por_paso:
+        return df, _dwell_por_paso(df, segundos, step_col, grupo_col)
     return df
 
 
-def preparar_datos_web(df_web_1, df_web_2, df_exp_cli, df_final_demo):
-    # Concatenar datos web
-    df_web = pd.concat([df_web_1, df_web_2], axis=0)
+def _dwell_por_paso(df, segundos, step_col, grupo_col):
+    """
+    Tiempo hasta el siguiente evento agregado por grupo (si existe) y paso, calculado
+    sobre el array de segundos sin columnas intermedias: n_dwell, dwell_total_sec y
+    dwell_medio_sec.
+    """
+    claves = [c for c in (grupo_col, step_col) if c in df.columns]
+    validos = ~np.isnan(segundos)
+    cod_grupo, grupos = pd.factorize(pd.MultiIndex.from_frame(df[claves]) if len(claves) > 1 else df[claves[0]])
+    validos &= cod_grupo >= 0
+    n = np.bincount(cod_grupo[validos], minlength=len(grupos))
+    total = np.bincount(cod_grupo[validos], weights=segundos[validos], minlength=len(grupos))
+    if len(claves) > 1:
+        indice = pd.MultiIndex.from_tuples(list(grupos), names=claves)
+    else:
+        indice = pd.Index(grupos, name=claves[0])
+    tabla = pd.DataFrame({'n_dwell': n, 'dwell_total_sec': total}, index=indice)
+    tabla['dwell_medio_sec'] = tabla['dwell_total_sec'] / tabla['n_dwell']
+    return tabla.sort_index().reset_index()
+
+
+@instrumentar
+def preparar_datos_web(df_web_1, df_web_2, df_exp_cli, df_final_demo, compactar=False):
+    # Concatenar datos web (df_web_2 puede ser None si se carga desde Parquet)
+    df_web = pd.concat([d for d in (df_web_1, df_web_2) if d is not None], axis=0)
     
-    # Convertir date_time a datetime
-    df_web['date_time'] = pd.to_datetime(df_web['date_time'], errors='coerce')
+    # Convertir date_time a datetime (desde Parquet ya viene con tipo nativo)
+    if not pd.api.types.is_datetime64_any_dtype(df_web['date_time']):
+        df_web['date_time'] = pd.to_datetime(df_web['date_time'], errors='coerce')
     
     # Filtrar clientes con Variation no nulo
     df_exp_cli = df_exp_cli[df_exp_cli["Variation"].notna()]
     
-    # Unir web con experimentos
-    df_web_v = pd.merge(df_web, df_exp_cli, on='client_id', how='inner')
-    
-    # Eliminar duplicados
-    df_web_v = df_web_v.drop_duplicates()
+    try:
+        # Índice de clientes del experimento, construido una vez y usado en las dos uniones
+        indice = IndiceClientes(df_exp_cli)
+    except ValueError:
+        # ids no enteros o repetidos: se mantienen los merge originales
+        df_web_v = pd.merge(df_web, df_exp_cli, on='client_id', how='inner').drop_duplicates()
+        df = pd.merge(df_final_demo, df_exp_cli, on='client_id', how='inner')
+    else:
+        # Unir web con experimentos eliminando duplicados por las columnas del evento
+        df_web_v = indice.unir(df_web, dedup=[c for c in COLUMNAS_EVENTO if c in df_web.columns])
+        
+        # Unir con datos demográficos finales
+        df = indice.unir(df_final_demo)
     
-    # Unir con datos demográficos finales
-    df = pd.merge(df_final_demo, df_exp_cli, on='client_id', how='inner')
+    # Opcional: categóricas y enteros pequeños en lugar de strings e int64
+    if compactar:
+        df_web_v = compactar_tipos(df_web_v, ESQUEMA_WEB)
+        df = compactar_tipos(df, ESQUEMA_CLIENTES)
     
     return df_web_v, df
 
 
+@instrumentar
 def explorar_datos(df_dict):
     for nombre, df in df_dict.items():
         print(f"--- {nombre} ---")
         print("Shape:", df.shape)
         print(df.head(), "\n")
 
-def limpiar_df_clientes(df):
+@instrumentar
+def limpiar_df_clientes(df, compactar=False):
     df = df.copy()
     
     # Normalizar columnas a minúsculas
@@ -129,8 +236,94 @@ def limpiar_df_clientes(df):
     if 'num_accts' in df.columns:
         df.dropna(subset=['num_accts'], inplace=True)
     
+    # Opcional: los Int64 pasan al entero más pequeño posible y gendr a categórica
+    if compactar:
+        df = compactar_tipos(df, ESQUEMA_CLIENTES)
+    
     return df
 
+
+def _entero_minimo(serie):
+    valores = serie.dropna()
+    if len(valores) == 0 or not np.array_equal(valores.to_numpy(dtype=np.float64) % 1, np.zeros(len(valores))):
+        return serie
+    minimo, maximo = valores.min(), valores.max()
+    for tipo in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(tipo).min <= minimo and maximo <= np.iinfo(tipo).max:
+            break
+    # Con nulos se usa el entero nullable del mismo tamaño (Int8, Int16...)
+    if len(valores) < len(serie):
+        return serie.astype(np.dtype(tipo).name.capitalize())
+    return serie.astype(tipo)
+
+
+def _decimal(serie, decimales=2):
+    compacta = serie.astype(np.float32)
+    original = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    recuperada = compacta.to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.array_equal(np.round(original, decimales), np.round(recuperada, decimales), equal_nan=True):
+        return compacta
+    return serie
+
+
+@instrumentar
+def compactar_tipos(df, esquema, devolver_informe=False):
+    """
+    Reduce la memoria del DataFrame según un esquema de columnas.
+
+    Solo cambia el tipo si es seguro: los enteros se reducen al menor tamaño que admite
+    su mínimo y máximo, y los decimales pasan a float32 solo si conservan los dos decimales.
+
+    Parámetros:
+    - df: DataFrame original (no se modifica).
+    - esquema: dict {columna: 'category' | 'entero' | 'decimal'}, p. ej. ESQUEMA_WEB o
+      ESQUEMA_CLIENTES. Las columnas que no estén en df se ignoran.
+    - devolver_informe: si es True, devuelve también el informe de memoria antes/después
+      (ver informe_memoria).
+
+    Devuelve:
+    - DataFrame con los tipos compactados, o (DataFrame, informe) si devolver_informe=True.
+    """
+    compacto = df.copy()
+    for col, tipo in esquema.items():
+        if col not in compacto.columns:
+            continue
+        if tipo == 'category':
+            compacto[col] = compacto[col].astype('category')
+        elif tipo == 'entero':
+            compacto[col] = _entero_minimo(compacto[col])
+        elif tipo == 'decimal':
+            compacto[col] = _decimal(compacto[col])
+        else:
+            raise ValueError(f"Tipo de esquema desconocido para '{col}': {tipo}")
+
+    if devolver_informe:
+        return compacto, informe_memoria(df, compacto)
+    return compacto
+
+
+@instrumentar
+def informe_memoria(antes, despues):
+    """
+    Compara la memoria (deep) por columna de dos versiones de un DataFrame.
+
+    Devuelve:
+    - DataFrame con columnas: tipo_antes, tipo_despues, MB_antes, MB_despues, reduccion_%,
+      y una fila 'TOTAL'.
+    """
+    mb_antes = antes.memory_usage(deep=True, index=False) / 1024 ** 2
+    mb_despues = despues.memory_usage(deep=True, index=False) / 1024 ** 2
+    informe = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'tipo_despues': despues.dtypes.astype(str),
+        'MB_antes': mb_antes,
+        'MB_despues': mb_despues,
+    })
+    informe.loc['TOTAL'] = ['', '', mb_antes.sum(), mb_despues.sum()]
+    informe['reduccion_%'] = (1 - informe['MB_despues'] / informe['MB_antes']) * 100
+    return informe.round(2)
+
+@instrumentar
 def filtrar_principales_clientes(df, 
                                  edad_min=30, edad_max=60, 
                                  tenure_min=50, tenure_max=200, 
@@ -143,6 +336,7 @@ def filtrar_principales_clientes(df,
     return df[filtro]
 
 
+@instrumentar
 def calcular_tasa_finalizacion(df, step_col='process_step', step_objetivo='confirm', cliente_col='client_id', grupo_col='Variation'):
     """
     Calcula la tasa de finalización y cantidades absolutas por grupo.
@@ -157,64 +351,108 @@ def calcular_tasa_finalizacion(df, step_col='process_step', step_objetivo='confi
     Devuelve:
     - DataFrame con columnas: [grupo_col, clientes_completados, total_clientes, tasa_%]
     """
-    # Clientes que completaron el proceso
-    completed = df[df[step_col] == step_objetivo][[cliente_col, grupo_col]].drop_duplicates()
-    
-    # Total de clientes únicos por grupo
-    total_clients = df[[cliente_col, grupo_col]].drop_duplicates().groupby(grupo_col).size().rename('total_clientes')
+    # Conteos de clientes distintos (el nulo cuenta como uno, como drop_duplicates) en una
+    # sola pasada, sin tablas intermedias de clientes completados
+    resumen = (
+        Pipeline.desde_df(df)
+        .agregar(grupo_col,
+                 clientes_completados=(cliente_col, 'distintos', (step_col, '==', step_objetivo)),
+                 total_clientes=(cliente_col, 'distintos'))
+        .ejecutar()
+    )
     
-    # Clientes completados por grupo
-    completed_clients = completed.groupby(grupo_col).size().rename('clientes_completados')
+    # Grupos sin clientes completados: NaN y al final, como al combinar los dos conteos por separado
+    completados = resumen['clientes_completados']
+    if (completados == 0).any():
+        resumen['clientes_completados'] = completados.where(completados > 0)
+        resumen = pd.concat([resumen[completados > 0], resumen[completados == 0]])
     
-    # Combinar y calcular tasa
-    resumen = pd.concat([completed_clients, total_clients], axis=1)
+    # Calcular tasa
     resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
     resumen = resumen.round(2)
     
     return resumen.reset_index()
 
-def calcular_kpis_iqr(df, group_cols, target_col):
-    q1 = df.groupby(group_cols)[target_col].quantile(0.25)
-    q3 = df.groupby(group_cols)[target_col].quantile(0.75)
-    iqr = q3 - q1
+@instrumentar
+def calcular_kpis_iqr(df, group_cols, target_col, aproximado=False, error_relativo=0.01):
+    if aproximado:
+        # Una sola pasada con cuantiles aproximados (error relativo acotado, interpolados como
+        # pandas) para todos los grupos; target_col no puede tener valores negativos
+        sketch = SketchCuantiles.desde_datos(df, group_cols, target_col, error_relativo)
+        cuartiles = sketch.cuantiles((0.25, 0.5, 0.75))
+        kpis = pd.DataFrame({
+            'median': cuartiles[0.5],
+            'mode': sketch.moda(),
+            'IQR': cuartiles[0.75] - cuartiles[0.25]
+        })
+        return kpis.reset_index()
 
-    kpis = pd.DataFrame({
-        'median': df.groupby(group_cols)[target_col].median(),
-        'mode': df.groupby(group_cols)[target_col].agg(lambda x: x.mode().iloc[0]),
-        'IQR': iqr
-    })
+    kpis = estadisticos_por_grupo(df, group_cols, target_col)[['median', 'mode', 'IQR']]
 
     return kpis.reset_index()
 
+@instrumentar
+def estadisticos_por_grupo(df, group_cols, target_col, ancho_bin=None):
+    """
+    Calcula Q1, mediana, Q3, IQR y moda por grupo con un único groupby de cuantiles
+    y una moda vectorizada (sin lambdas por grupo).
+
+    Parámetros:
+    - df: DataFrame con los datos.
+    - group_cols: columna o lista de columnas de agrupación.
+    - target_col: columna numérica a resumir.
+    - ancho_bin: si se indica, la moda se calcula sobre intervalos de ese ancho
+      (útil para variables continuas como time_diff_sec); se devuelve el límite inferior del intervalo.
+
+    Devuelve:
+    - DataFrame indexado por grupo con columnas: Q1, median, Q3, IQR, mode.
+      En caso de empate, la moda es el menor valor (igual que Series.mode().iloc[0]).
+    """
+    claves = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+
+    # Sin datos el unstack no crea las columnas de los cuartiles
+    cuartiles = (df.groupby(group_cols, observed=True)[target_col].quantile([0.25, 0.5, 0.75])
+                 .unstack().reindex(columns=[0.25, 0.5, 0.75]))
+
+    # Moda: códigos de grupo y de valor combinados en un único entero y contados de una vez
+    datos = df[claves + [target_col]].dropna(subset=[target_col])
+    valores = datos[target_col]
+    if ancho_bin:
+        valores = np.floor(valores / ancho_bin) * ancho_bin
+    if len(claves) == 1:
+        indice_grupos = pd.Index(datos[claves[0]])
+    else:
+        indice_grupos = pd.MultiIndex.from_frame(datos[claves])
+    cod_grupo, grupos = pd.factorize(indice_grupos)
+    cod_valor, unicos = pd.factorize(valores, sort=True)
+    validos = cod_grupo >= 0
+    n_valores = max(len(unicos), 1)
+    combinados, conteos = np.unique(cod_grupo[validos].astype(np.int64) * n_valores + cod_valor[validos], return_counts=True)
+    g, v = combinados // n_valores, combinados % n_valores
+    # Por grupo: mayor conteo primero y, a igualdad, el menor valor
+    orden = np.lexsort((v, -conteos, g))
+    g, v = g[orden], v[orden]
+    primero = np.ones(len(g), dtype=bool)
+    primero[1:] = g[1:] != g[:-1]
+    moda = pd.Series(np.asarray(unicos)[v[primero]], index=grupos[g[primero]].set_names(claves))
+
+    return pd.DataFrame({
+        'Q1': cuartiles[0.25],
+        'median': cuartiles[0.5],
+        'Q3': cuartiles[0.75],
+        'IQR': cuartiles[0.75] - cuartiles[0.25],
+        'mode': moda
+    })
+
+@instrumentar
 def obtener_primera(df_web_sorted, df_exp_cli):
-    # Clientes que completaron confirm
-    completed = df_web_sorted[df_web_sorted['process_step'] == 'confirm']['client_id'].unique()
-    
-    # Filtramos solo registros de esos clientes
-    df_completed_clients = df_web_sorted[df_web_sorted['client_id'].isin(completed)]
-    
-    # Aplicamos filtros de error
-    df_valid = df_completed_clients[
-        (df_completed_clients['es_error'] == False) &
-        (df_completed_clients['repetido_mismo_paso'] == False) &
-        (df_completed_clients['retroceso_cero'] == False) &
-        (df_completed_clients['salto_grande_atras'] == False)
-    ]
-    
     # Secuencia ideal de pasos
     ruta_ideal = ['start', 'step_1', 'step_2', 'step_3', 'confirm']
     
-    # Agrupamos secuencias de pasos por cliente
-    step_sequences = df_valid.groupby('client_id')['process_step'].apply(list)
-    
-    # Verificamos si la secuencia coincide exactamente con la ideal
-    first_attempt_success = [seq == ruta_ideal for seq in step_sequences]
-    
-    # DataFrame con resultado por cliente
-    first_attempt_success_df = pd.DataFrame({
-        'client_id': list(step_sequences.index),
-        'first_attempt_success': first_attempt_success
-    })
+    # Clientes que completaron confirm, sin registros con error, y si su secuencia de
+    # pasos coincide exactamente con la ideal. Los filtros se funden en una sola máscara
+    # y solo se leen client_id, process_step y las marcas de error (sin copias del log)
+    first_attempt_success_df = primer_intento(Pipeline.desde_df(df_web_sorted), ruta_ideal).ejecutar()
     
     # Merge con df_exp_cli para tener info extra
     df_merged = first_attempt_success_df.merge(df_exp_cli, on='client_id', how='inner')
@@ -222,6 +460,7 @@ def obtener_primera(df_web_sorted, df_exp_cli):
     return first_attempt_success_df, df_merged
 
 
+@instrumentar
 def calcular_tiempo_total_por_cliente(df, tiempo_col='time_diff_sec', cliente_col='client_id', grupo_col='Variation'):
     """
     Agrupa por cliente y grupo, sumando el tiempo total en segundos.
@@ -235,6 +474,6 @@ def calcular_tiempo_total_por_cliente(df, tiempo_col='time_diff_sec', cliente_co
     Retorna:
     - DataFrame con columnas: cliente, grupo, total_time_sec
     """
-    tiempo_total = df.groupby([cliente_col, grupo_col])[tiempo_col].sum().reset_index()
+    tiempo_total = df.groupby([cliente_col, grupo_col], observed=True)[tiempo_col].sum().reset_index()
     tiempo_total.rename(columns={tiempo_col: 'total_time_sec'}, inplace=True)
     return tiempo_total
\ No newline at end of file
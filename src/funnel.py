@@ -0,0 +1,533 @@
+import numpy as np
+import pandas as pd
+
+ORDEN_PASOS = ['start', 'step_1', 'step_2', 'step_3', 'confirm']
+
+# Bits de la máscara de errores (uint8, un bit por tipo de error)
+ERROR_REPETIDO_MISMO_PASO = 1
+ERROR_RETROCESO_CERO = 2
+ERROR_SALTO_GRANDE_ATRAS = 4
+ERROR_SALTO_GRANDE_ADELANTE = 8
+
+BITS_ERROR = {
+    'repetido_mismo_paso': ERROR_REPETIDO_MISMO_PASO,
+    'retroceso_cero': ERROR_RETROCESO_CERO,
+    'salto_grande_atras': ERROR_SALTO_GRANDE_ATRAS,
+    'salto_grande_adelante': ERROR_SALTO_GRANDE_ADELANTE,
+}
+
+
+def codificar_pasos(pasos, orden=ORDEN_PASOS):
+    """
+    Codifica los pasos como enteros int8 según su posición en 'orden'.
+    Los pasos desconocidos o nulos quedan como -1.
+    """
+    # factorize es mucho más rápido que construir un Categorical sobre strings
+    codigos, valores = pd.factorize(pasos)
+    tabla = np.array([orden.index(v) if v in orden else -1 for v in valores] + [-1], dtype=np.int8)
+    return tabla[codigos]
+
+
+def inicio_sesion(*claves):
+    """
+    Marca la primera fila de cada sesión en datos ya ordenados por las claves.
+    Una fila abre sesión si cambia cualquiera de las claves respecto a la anterior.
+    """
+    claves = [np.asarray(c) for c in claves]
+    n = len(claves[0])
+    inicio = np.ones(n, dtype=bool)
+    if n > 1:
+        cambio = np.zeros(n - 1, dtype=bool)
+        for c in claves:
+            cambio |= c[1:] != c[:-1]
+        inicio[1:] = cambio
+    return inicio
+
+
+def _mascara_errores(codigos, inicio, time_diff, mismo_paso=None):
+    # Paso anterior dentro de la sesión (-1 si es la primera fila o es desconocido)
+    prev = np.empty_like(codigos)
+    prev[:1] = -1
+    prev[1:] = codigos[:-1]
+    prev[inicio] = -1
+
+    ambos_validos = (prev >= 0) & (codigos >= 0)
+    cero = time_diff == 0
+    salto = codigos.astype(np.int16) - prev.astype(np.int16)
+
+    if mismo_paso is None:
+        mismo_paso = ambos_validos & (salto == 0)
+
+    mascara = np.zeros(len(codigos), dtype=np.uint8)
+    mascara |= (cero & mismo_paso).astype(np.uint8) * ERROR_REPETIDO_MISMO_PASO
+    mascara |= (cero & ambos_validos & (salto > 0)).astype(np.uint8) * ERROR_RETROCESO_CERO
+    mascara |= (cero & ambos_validos & (salto <= -2)).astype(np.uint8) * ERROR_SALTO_GRANDE_ATRAS
+    mascara |= (cero & ambos_validos & (salto >= 2)).astype(np.uint8) * ERROR_SALTO_GRANDE_ADELANTE
+    return mascara
+
+
+def detectar_errores_mascara(df, step_col='process_step', client_col='client_id', visit_col='visit_id', time_diff_col='time_diff_sec'):
+    """
+    Versión vectorizada de detectar_errores_funnel en una sola pasada.
+
+    Requiere los datos ordenados como los deja calcular_diferencia_tiempo
+    (cliente, visita, fecha). No copia el DataFrame ni añade columnas.
+
+    Parámetros:
+    - df: DataFrame ordenado con los eventos.
+    - step_col, client_col, visit_col, time_diff_col: columnas usadas (mismos valores por defecto).
+
+    Devuelve:
+    - np.ndarray uint8 alineado con df; cada bit es un tipo de error (ver BITS_ERROR)
+      y mascara != 0 equivale a la columna 'es_error'.
+    """
+    inicio = inicio_sesion(df[client_col], df[visit_col])
+    codigos = codificar_pasos(df[step_col])
+    time_diff = df[time_diff_col].to_numpy(dtype=float, na_value=np.nan)
+
+    mismo_paso = None
+    if (codigos < 0).any():
+        # Con pasos fuera de ORDEN_PASOS se compara el texto, igual que la versión original
+        cod_texto = pd.factorize(df[step_col])[0]
+        mismo_paso = np.zeros(len(df), dtype=bool)
+        mismo_paso[1:] = (cod_texto[1:] == cod_texto[:-1]) & (cod_texto[1:] >= 0)
+        mismo_paso &= ~inicio
+
+    return _mascara_errores(codigos, inicio, time_diff, mismo_paso)
+
+
+def expandir_mascara_errores(mascara, index=None):
+    """
+    Convierte la máscara de bits en las columnas booleanas de detectar_errores_funnel.
+    Útil solo cuando se necesitan las columnas explícitas (por ejemplo, para obtener_primera).
+    """
+    columnas = {nombre: (mascara & bit) != 0 for nombre, bit in BITS_ERROR.items()}
+    columnas['es_error'] = mascara != 0
+    return pd.DataFrame(columnas, index=index)
+
+
+def coincide_ruta(df, ruta=ORDEN_PASOS, step_col='process_step', client_col='client_id', visit_col=None):
+    """
+    Comprueba, sin construir listas por cliente, si la secuencia de pasos de cada
+    cliente (o de cada cliente y visita) es exactamente 'ruta'.
+
+    Las filas se toman en el orden en que aparecen en df, como groupby(...).apply(list).
+
+    Parámetros:
+    - df: DataFrame con los eventos.
+    - ruta: secuencia objetivo; puede ser cualquier definición de funnel, con pasos repetidos.
+    - step_col, client_col: columnas de paso y cliente.
+    - visit_col: si se indica, la comprobación se hace por (cliente, visita).
+
+    Devuelve:
+    - (ids, coincide): claves ordenadas de cada grupo (array de clientes o MultiIndex
+      cliente-visita) y array booleano alineado con ellas.
+    """
+    if visit_col is None:
+        cod_grupo, ids = pd.factorize(df[client_col], sort=True)
+    else:
+        cod_grupo, ids = pd.factorize(pd.MultiIndex.from_frame(df[[client_col, visit_col]]), sort=True)
+    n_grupos = len(ids)
+
+    # Pasos como enteros pequeños según su primera aparición en la ruta (-1 si no están)
+    pasos_ruta = list(dict.fromkeys(ruta))
+    codigos = codificar_pasos(df[step_col], pasos_ruta)
+    objetivo = np.array([pasos_ruta.index(paso) for paso in ruta], dtype=np.int8)
+
+    validos = cod_grupo >= 0
+    cod_grupo, codigos = cod_grupo[validos], codigos[validos]
+    orden = np.argsort(cod_grupo, kind='stable')
+    cod_grupo, codigos = cod_grupo[orden], codigos[orden]
+
+    longitudes = np.bincount(cod_grupo, minlength=n_grupos)
+    inicios = np.concatenate(([0], np.cumsum(longitudes)[:-1]))
+    posicion = np.arange(len(cod_grupo)) - inicios[cod_grupo]
+
+    # Cada fila debe coincidir con el paso de la ruta en su misma posición
+    correcto = (posicion < len(objetivo)) & (codigos == objetivo[np.minimum(posicion, len(objetivo) - 1)])
+    fallos = np.bincount(cod_grupo, weights=~correcto, minlength=n_grupos)
+    coincide = (longitudes == len(objetivo)) & (fallos == 0)
+    return ids, coincide
+
+
+def esta_ordenado(*claves):
+    """True si las filas ya están en orden lexicográfico por las claves (arrays alineados)."""
+    decrece = np.zeros(max(len(claves[0]) - 1, 0), dtype=bool)
+    iguales = np.ones_like(decrece)
+    for c in claves:
+        decrece |= iguales & (c[1:] < c[:-1])
+        iguales &= c[1:] == c[:-1]
+    return not decrece.any()
+
+
+def _a_numpy(serie):
+    # Las fechas con zona horaria se pasan a datetime64 en UTC (to_numpy daría objetos)
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        serie = serie.dt.tz_convert(None)
+    return serie.to_numpy()
+
+
+def clave_orden(serie):
+    """Clave numérica que ordena como sort_values (nulos al final)."""
+    valores = _a_numpy(serie)
+    if np.issubdtype(valores.dtype, np.integer):
+        return valores
+    if np.issubdtype(valores.dtype, np.datetime64):
+        enteros = valores.view(np.int64).copy()
+        enteros[np.isnat(valores)] = np.iinfo(np.int64).max
+        return enteros
+    codigos, unicos = pd.factorize(serie, sort=True)
+    return np.where(codigos < 0, len(unicos), codigos)
+
+
+def ordenar_claves(*series):
+    """
+    Orden lexicográfico de los eventos por las columnas dadas (p. ej. cliente, visita,
+    fecha), igual que sort_values.
+
+    Devuelve:
+    - (orden, claves): permutación a aplicar (None si ya estaban ordenados) y las claves
+      numéricas ya ordenadas.
+    """
+    claves = [clave_orden(s) for s in series]
+    if esta_ordenado(*claves):
+        return None, claves
+    orden = np.lexsort(claves[::-1])
+    return orden, [c[orden] for c in claves]
+
+
+def diferencia_siguiente(df, client_col='client_id', visit_col='visit_id', time_col='date_time'):
+    """
+    Ordena los eventos por cliente, visita y fecha (sin reordenar si ya lo están) y
+    calcula el tiempo hasta el siguiente evento de la misma visita.
+
+    Devuelve:
+    - (df ordenado con índice 0..n-1, array timedelta64 alineado con él); NaT en el
+      último evento de cada visita y en las filas sin cliente o visita, como en groupby.
+      Las fechas con zona horaria se restan en UTC.
+    """
+    orden, claves = ordenar_claves(df[client_col], df[visit_col], df[time_col])
+    if orden is None:
+        df = df.reset_index(drop=True)
+    else:
+        df = df.take(orden).reset_index(drop=True)
+
+    fechas = _a_numpy(df[time_col])
+    diferencia = np.full(len(df), np.timedelta64('NaT'), dtype=f'm8[{np.datetime_data(fechas.dtype)[0]}]')
+    diferencia[:-1] = fechas[1:] - fechas[:-1]
+    ultimo = np.roll(inicio_sesion(claves[0], claves[1]), -1)
+    ultimo |= (df[client_col].isna() | df[visit_col].isna()).to_numpy()
+    diferencia[ultimo] = np.timedelta64('NaT')
+    return df, diferencia
+
+
+def sesionizar(df, inactividad='30min', client_col='client_id', visit_col=None, step_col='process_step',
+               time_col='date_time', grupo_col='Variation', orden=ORDEN_PASOS, step_objetivo='confirm'):
+    """
+    Divide los eventos en sesiones por inactividad y resume cada sesión en una fila.
+
+    Una sesión se corta al cambiar de cliente (o de visita, si se indica visit_col) o
+    cuando pasan más de 'inactividad' entre dos eventos seguidos; con visit_col, cada
+    evento sin visita es una sesión aparte. Los errores se detectan dentro de cada
+    sesión con las mismas reglas que detectar_errores_funnel. Los eventos sin fecha se
+    descartan.
+
+    Parámetros:
+    - df: DataFrame de eventos (no hace falta que esté ordenado).
+    - inactividad: hueco máximo dentro de una sesión (cualquier valor de pd.Timedelta).
+    - client_col, step_col, time_col: columnas de cliente, paso y fecha.
+    - visit_col: si se indica, además se respeta la visita (con una inactividad muy grande
+      las sesiones coinciden con las visitas).
+    - grupo_col: columna de grupo que se copia al resumen si existe.
+    - orden: pasos del funnel, de principio a fin.
+    - step_objetivo: paso que marca la sesión como completada.
+
+    Devuelve:
+    - DataFrame con una fila por sesión: cliente, grupo, session_id, inicio, fin, n_eventos,
+      paso_max (paso más avanzado), n_<paso> por paso, n_errores y un contador por tipo
+      de error, tiempo_total_sec, completado y ruta_exacta (la sesión es exactamente 'orden').
+    """
+    validos = np.flatnonzero(df[time_col].notna().to_numpy())
+    n = len(validos)
+    tiempos = _a_numpy(df[time_col]).astype('datetime64[ns]').view(np.int64)[validos]
+
+    # Orden (cliente, [visita,] fecha) como en calcular_diferencia_tiempo; si los datos
+    # ya vienen ordenados no se reordenan
+    claves = [df[client_col].to_numpy()[validos]]
+    if visit_col is not None:
+        claves.append(pd.factorize(df[visit_col], sort=True)[0][validos])
+    claves.append(tiempos)
+    if not esta_ordenado(*claves):
+        orden_local = np.lexsort(claves[::-1])
+        claves = [c[orden_local] for c in claves]
+        validos = validos[orden_local]
+    clientes, tiempos = claves[0], claves[-1]
+    claves = claves[:-1]
+    codigos = codificar_pasos(df[step_col], orden)[validos]
+
+    inicio = inicio_sesion(*claves)
+    if visit_col is not None:
+        # Eventos sin visita: cada uno es su propia sesión, como en paralelo
+        inicio |= claves[1] < 0
+    inicio[1:] |= np.diff(tiempos) > pd.Timedelta(inactividad).value
+    sesion = np.cumsum(inicio) - 1
+    inicios = np.flatnonzero(inicio)
+    finales = np.append(inicios[1:], n)[:len(inicios)] - 1
+    n_sesiones = len(inicios)
+
+    # Diferencia con el siguiente evento de la misma sesión (NaN en el último)
+    time_diff = np.full(n, np.nan)
+    time_diff[:-1] = np.diff(tiempos) / 1e9
+    time_diff[finales] = np.nan
+    mascara = _mascara_errores(codigos, inicio, time_diff)
+
+    k = len(orden)
+    conocidos = codigos >= 0
+    conteos = np.bincount(sesion[conocidos] * k + codigos[conocidos], minlength=n_sesiones * k).reshape(n_sesiones, k)
+    paso_max = np.maximum.reduceat(codigos, inicios) if n else codigos
+
+    # Ruta exacta: cada evento en la posición de su paso y tantos eventos como pasos
+    posicion = np.arange(n) - inicios[sesion] if n else np.zeros(0, dtype=np.int64)
+    correcto = (posicion < k) & (codigos == np.minimum(posicion, k - 1))
+    fallos = np.bincount(sesion, weights=~correcto, minlength=n_sesiones)
+    n_eventos = finales - inicios + 1
+
+    resumen = {client_col: clientes[inicios]}
+    if grupo_col in df.columns:
+        resumen[grupo_col] = df[grupo_col].take(validos[inicios]).to_numpy()
+    resumen.update({
+        'session_id': np.arange(n_sesiones),
+        'inicio': tiempos[inicios].view('datetime64[ns]'),
+        'fin': tiempos[finales].view('datetime64[ns]'),
+        'n_eventos': n_eventos.astype(np.int32),
+        'paso_max': pd.Categorical.from_codes(paso_max, categories=orden, ordered=True),
+    })
+    for i, paso in enumerate(orden):
+        resumen[f'n_{paso}'] = conteos[:, i].astype(np.int32)
+    resumen['n_errores'] = np.bincount(sesion, weights=mascara != 0, minlength=n_sesiones).astype(np.int32)
+    for nombre, bit in BITS_ERROR.items():
+        resumen[f'n_{nombre}'] = np.bincount(sesion, weights=(mascara & bit) != 0, minlength=n_sesiones).astype(np.int32)
+    resumen['tiempo_total_sec'] = (tiempos[finales] - tiempos[inicios]) / 1e9
+    resumen['completado'] = conteos[:, orden.index(step_objetivo)] > 0
+    resumen['ruta_exacta'] = (n_eventos == k) & (fallos == 0)
+    return pd.DataFrame(resumen)
+
+
+def calcular_tasa_finalizacion_sesiones(resumen, cliente_col='client_id', grupo_col='Variation'):
+    """
+    calcular_tasa_finalizacion a partir del resumen de sesionizar (mismas columnas:
+    grupo, clientes_completados, total_clientes, tasa_%).
+    """
+    clientes = resumen.groupby([grupo_col, cliente_col], observed=True)['completado'].max()
+    tabla = clientes.groupby(level=0, observed=True).agg(clientes_completados='sum', total_clientes='size')
+    # Grupos sin clientes completados: NaN y al final, como calcular_tasa_finalizacion
+    completados = tabla['clientes_completados']
+    if (completados == 0).any():
+        tabla['clientes_completados'] = completados.where(completados > 0)
+        tabla = pd.concat([tabla[completados > 0], tabla[completados == 0]])
+    tabla['tasa_%'] = tabla['clientes_completados'] / tabla['total_clientes'] * 100
+    return tabla.round(2).reset_index()
+
+
+def kpis_sesiones(resumen, cliente_col='client_id', grupo_col='Variation'):
+    """
+    KPIs por grupo leyendo solo el resumen de sesiones: sesiones, clientes, tasa de error
+    por evento, tasa de finalización por cliente y por sesión, tasa de ruta exacta y
+    tiempo por sesión.
+    """
+    tabla = resumen.groupby(grupo_col, observed=True).agg(
+        sesiones=('session_id', 'size'),
+        clientes=(cliente_col, 'nunique'),
+        eventos=('n_eventos', 'sum'),
+        errores=('n_errores', 'sum'),
+        sesiones_completadas=('completado', 'sum'),
+        sesiones_ruta_exacta=('ruta_exacta', 'sum'),
+        tiempo_medio_sesion_sec=('tiempo_total_sec', 'mean'),
+        tiempo_mediano_sesion_sec=('tiempo_total_sec', 'median'),
+    )
+    finalizacion = calcular_tasa_finalizacion_sesiones(resumen, cliente_col, grupo_col).set_index(grupo_col)
+    tabla['tasa_error_%'] = tabla['errores'] / tabla['eventos'] * 100
+    tabla['tasa_finalizacion_%'] = finalizacion['clientes_completados'] / finalizacion['total_clientes'] * 100
+    tabla['tasa_finalizacion_sesion_%'] = tabla['sesiones_completadas'] / tabla['sesiones'] * 100
+    tabla['tasa_ruta_exacta_%'] = tabla['sesiones_ruta_exacta'] / tabla['sesiones'] * 100
+    tabla['sesiones_por_cliente'] = tabla['sesiones'] / tabla['clientes']
+    return tabla.reset_index()
+
+
+# Estados extra de la matriz de transiciones
+INICIO_VISITA = 'inicio'
+FIN_VISITA = 'fin'
+
+# Base (impar) del hash polinómico de frecuencia_rutas
+BASE_HASH_RUTAS = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _eventos_por_visita(df, client_col, visit_col, time_col, step_col, grupo_col, orden):
+    # Eventos ordenados por visita con los pasos codificados; se descartan los pasos
+    # desconocidos. Devuelve códigos, inicio de visita, códigos de grupo y grupos.
+    permutacion, claves = ordenar_claves(df[client_col], df[visit_col], df[time_col])
+    posiciones = np.arange(len(df)) if permutacion is None else permutacion
+    codigos = codificar_pasos(df[step_col], orden)[posiciones]
+    if grupo_col is not None and grupo_col in df.columns:
+        cod_grupo, grupos = pd.factorize(df[grupo_col], sort=True)
+        cod_grupo = cod_grupo[posiciones]
+    else:
+        cod_grupo, grupos = np.zeros(len(df), dtype=np.int64), pd.Index([None])
+    inicio = inicio_sesion(claves[0], claves[1])
+    conocidos = (codigos >= 0) & (cod_grupo >= 0)
+    # Al quitar filas, la visita empieza en la primera fila que queda
+    sesion = np.cumsum(inicio)
+    codigos, cod_grupo, sesion = codigos[conocidos], cod_grupo[conocidos], sesion[conocidos]
+    inicio = inicio_sesion(sesion)
+    return codigos, inicio, cod_grupo, grupos
+
+
+def matriz_transiciones(df, grupo_col='Variation', step_col='process_step', client_col='client_id',
+                        visit_col='visit_id', time_col='date_time', orden=ORDEN_PASOS):
+    """
+    Transiciones paso -> paso dentro de cada visita, contadas con un único bincount sobre
+    los pares (anterior, siguiente). Incluye los estados INICIO_VISITA (entrada) y
+    FIN_VISITA (salida), así que la fila de cada paso suma todas sus salidas.
+
+    Parámetros:
+    - df: eventos (no hace falta que estén ordenados).
+    - grupo_col: columna de grupo (None para no separar).
+    - step_col, client_col, visit_col, time_col: columnas usadas.
+    - orden: pasos del funnel; los pasos fuera de él se descartan.
+
+    Devuelve:
+    - DataFrame largo con columnas: grupo, desde, hasta, n, probabilidad (n / salidas de 'desde').
+      Para la matriz: tabla.pivot(index='desde', columns='hasta', values='n').
+    """
+    codigos, inicio, cod_grupo, grupos = _eventos_por_visita(
+        df, client_col, visit_col, time_col, step_col, grupo_col, orden)
+    k = len(orden)
+    estados = list(orden) + [INICIO_VISITA, FIN_VISITA]
+    s = len(estados)
+
+    anterior = np.empty_like(codigos)
+    anterior[1:] = codigos[:-1]
+    anterior[inicio] = k
+    # Además de cada evento, la salida desde el último evento de la visita
+    ultimo = np.roll(inicio, -1)
+    desde = np.concatenate([anterior, codigos[ultimo]]).astype(np.int64)
+    hasta = np.concatenate([codigos, np.full(ultimo.sum(), k + 1, dtype=codigos.dtype)]).astype(np.int64)
+    grupo = np.concatenate([cod_grupo, cod_grupo[ultimo]]).astype(np.int64)
+
+    conteos = np.bincount((grupo * s + desde) * s + hasta, minlength=len(grupos) * s * s)
+    conteos = conteos.reshape(len(grupos), s, s)
+    salidas = conteos.sum(axis=2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probabilidad = np.where(salidas > 0, conteos / salidas, 0.0)
+
+    g, i, j = np.indices(conteos.shape).reshape(3, -1)
+    tabla = pd.DataFrame({
+        'desde': pd.Categorical.from_codes(i, estados),
+        'hasta': pd.Categorical.from_codes(j, estados),
+        'n': conteos.reshape(-1),
+        'probabilidad': probabilidad.reshape(-1),
+    })
+    if grupo_col is not None and grupo_col in df.columns:
+        tabla.insert(0, grupo_col, np.asarray(grupos)[g])
+    # Sin transiciones imposibles (hacia 'inicio' o desde 'fin')
+    posibles = (tabla['hasta'] != INICIO_VISITA) & (tabla['desde'] != FIN_VISITA)
+    return tabla[posibles].reset_index(drop=True)
+
+
+def resumen_transiciones(transiciones, grupo_col='Variation', orden=ORDEN_PASOS):
+    """
+    Abandono y bucles por paso a partir de matriz_transiciones: salidas de cada paso y %
+    hacia FIN_VISITA (abandono o cierre), al mismo paso (repetición), a pasos anteriores
+    (retroceso) y a pasos posteriores (avance).
+    """
+    t = transiciones[transiciones['desde'].isin(orden)].copy()
+    posicion = {paso: i for i, paso in enumerate(orden)}
+    desde = t['desde'].astype(object).map(posicion)
+    hasta = t['hasta'].astype(object).map(posicion)
+    t['tipo'] = np.select(
+        [t['hasta'] == FIN_VISITA, hasta == desde, hasta < desde, hasta > desde],
+        ['abandono', 'repeticion', 'retroceso', 'avance'], default='otro')
+    claves = [grupo_col, 'desde'] if grupo_col in t.columns else ['desde']
+    tabla = t.pivot_table(index=claves, columns='tipo', values='n', aggfunc='sum', fill_value=0, observed=True)
+    tabla = tabla.reindex(columns=['avance', 'repeticion', 'retroceso', 'abandono'], fill_value=0)
+    tabla.insert(0, 'salidas', tabla.sum(axis=1))
+    for col in ['avance', 'repeticion', 'retroceso', 'abandono']:
+        tabla[f'{col}_%'] = tabla[col] / tabla['salidas'] * 100
+    return tabla.reset_index().rename(columns={'desde': 'paso'}).rename_axis(columns=None)
+
+
+def frecuencia_rutas(df, grupo_col='Variation', step_col='process_step', client_col='client_id',
+                     visit_col='visit_id', time_col='date_time', orden=ORDEN_PASOS):
+    """
+    Frecuencia de cada ruta distinta de pasos por visita.
+
+    Cada visita se resume en un hash polinómico uint64 de sus códigos de paso (base impar
+    BASE_HASH_RUTAS) y las rutas se cuentan ordenando los hashes, sin listas por visita.
+    Las visitas que comparten hash se comparan paso a paso con la primera de su grupo, y
+    si alguna difiere (colisión) se separan por su secuencia real, así que los conteos son
+    exactos para cualquier longitud.
+
+    Devuelve:
+    - DataFrame con columnas: grupo, ruta ('start > step_1 > ...'), longitud, n_visitas,
+      visitas_% (dentro del grupo), completa (llega a orden[-1]) y es_ideal (ruta == orden),
+      ordenado de más a menos frecuente en cada grupo.
+    """
+    codigos, inicio, cod_grupo, grupos = _eventos_por_visita(
+        df, client_col, visit_col, time_col, step_col, grupo_col, orden)
+    n = len(codigos)
+    inicios = np.flatnonzero(inicio)
+    visita = np.cumsum(inicio) - 1
+    posicion = np.arange(n) - inicios[visita] if n else np.zeros(0, dtype=np.int64)
+    longitud = np.diff(np.append(inicios, n))
+
+    # Potencias de la base con aritmética uint64 (el desbordamiento envuelve módulo 2^64;
+    # con base impar ninguna potencia se anula)
+    potencias = np.ones(int(longitud.max()) if n else 0, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        if len(potencias) > 1:
+            potencias[1:] = BASE_HASH_RUTAS
+            potencias = np.multiply.accumulate(potencias)
+        terminos = (codigos.astype(np.uint64) + np.uint64(1)) * potencias[posicion]
+        hashes = np.add.reduceat(terminos, inicios) if n else np.zeros(0, dtype=np.uint64)
+    grupo_visita = cod_grupo[inicios].astype(np.int64)
+
+    # Rutas distintas por (grupo, longitud, hash), con una visita de ejemplo para la etiqueta
+    claves = (hashes, longitud, grupo_visita)
+    orden_rutas = np.lexsort(claves)
+    distinta = inicio_sesion(*(c[orden_rutas] for c in claves))
+
+    # Cada visita frente al ejemplo de su grupo: si algún paso difiere, hay colisión
+    ejemplo_visita = np.empty(len(inicios), dtype=np.int64)
+    ejemplo_visita[orden_rutas] = orden_rutas[np.flatnonzero(distinta)][np.cumsum(distinta) - 1]
+    difiere = codigos != codigos[inicios[ejemplo_visita[visita]] + posicion]
+    if difiere.any():
+        colisiones = np.isin(ejemplo_visita, ejemplo_visita[np.unique(visita[difiere])])
+        secuencia = np.zeros(len(inicios), dtype=np.int64)
+        secuencia[colisiones] = pd.factorize(np.array(
+            [codigos[inicios[v]:inicios[v] + longitud[v]].tobytes() for v in np.flatnonzero(colisiones)],
+            dtype=object))[0]
+        claves = (secuencia,) + claves
+        orden_rutas = np.lexsort(claves)
+        distinta = inicio_sesion(*(c[orden_rutas] for c in claves))
+
+    distinta = np.flatnonzero(distinta)
+    ejemplo = orden_rutas[distinta]
+    conteo = np.diff(np.append(distinta, len(orden_rutas)))
+    nombres = np.asarray(orden, dtype=object)
+    rutas = [' > '.join(nombres[codigos[inicios[v]:inicios[v] + longitud[v]]]) for v in ejemplo]
+
+    tabla = pd.DataFrame({
+        'ruta': rutas,
+        'longitud': longitud[ejemplo],
+        'n_visitas': conteo,
+    })
+    ultimo = len(orden) - 1
+    tabla['completa'] = [ultimo in set(codigos[inicios[v]:inicios[v] + longitud[v]]) for v in ejemplo]
+    tabla['es_ideal'] = tabla['ruta'] == ' > '.join(orden)
+    grupo = grupo_visita[ejemplo]
+    if grupo_col is not None and grupo_col in df.columns:
+        tabla.insert(0, grupo_col, np.asarray(grupos)[grupo])
+        tabla.insert(4, 'visitas_%', tabla['n_visitas'] / tabla.groupby(grupo_col)['n_visitas'].transform('sum') * 100)
+        return tabla.sort_values([grupo_col, 'n_visitas'], ascending=[True, False]).reset_index(drop=True)
+    tabla.insert(3, 'visitas_%', tabla['n_visitas'] / tabla['n_visitas'].sum() * 100)
+    return tabla.sort_values('n_visitas', ascending=False).reset_index(drop=True)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# Índice de clientes para sustituir los pd.merge por client_id: las posiciones de los
+# ids se calculan una vez y cada unión se resuelve con un lookup y un take de columnas.
+
+# Si el rango de ids no supera este múltiplo del número de clientes, el lookup es una
+# tabla directa id -> posición; si no, un índice hash
+DENSIDAD_MAXIMA = 16
+
+# Columnas que identifican un evento web (todas las del log original)
+COLUMNAS_EVENTO = ['client_id', 'visitor_id', 'visit_id', 'process_step', 'date_time']
+
+
+class IndiceClientes:
+    """
+    Índice ids de cliente -> posición de fila de una tabla con un cliente por fila
+    (df_exp_cli, df_final_demo...).
+
+    Parámetros:
+    - tabla: DataFrame a indexar.
+    - cliente_col: columna con el id de cliente (entera y sin nulos).
+
+    Lanza ValueError si la columna no es entera o tiene ids repetidos.
+    """
+
+    def __init__(self, tabla, cliente_col='client_id'):
+        if not pd.api.types.is_integer_dtype(tabla[cliente_col]):
+            raise ValueError(f"'{cliente_col}' debe ser una columna entera sin nulos")
+        ids = tabla[cliente_col].to_numpy(dtype=np.int64)
+        self.tabla = tabla
+        self.cliente_col = cliente_col
+        self.n = len(ids)
+
+        self._minimo = int(ids.min()) if self.n else 0
+        rango = int(ids.max()) - self._minimo + 1 if self.n else 0
+        if self.n and rango <= DENSIDAD_MAXIMA * self.n:
+            self._lookup = np.full(rango, -1, dtype=np.int64)
+            self._lookup[ids - self._minimo] = np.arange(self.n)
+            repetidos = (self._lookup >= 0).sum() < self.n
+            self._hash = None
+        else:
+            self._lookup = None
+            self._hash = pd.Index(ids)
+            repetidos = not self._hash.is_unique
+        if repetidos:
+            raise ValueError(f"'{cliente_col}' tiene ids repetidos")
+
+    def posiciones(self, ids):
+        """Posición en la tabla de cada id consultado (-1 si no está)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if self._hash is not None:
+            return self._hash.get_indexer(ids)
+        desplazados = ids - self._minimo
+        dentro = (desplazados >= 0) & (desplazados < len(self._lookup))
+        return np.where(dentro, self._lookup[np.where(dentro, desplazados, 0)], -1)
+
+    def unir(self, df, columnas=None, cliente_col=None, dedup=None):
+        """
+        Equivalente a pd.merge(df, tabla, on=cliente_col, how='inner') (mismo orden de
+        filas, columnas e índice 0..n-1), resuelto con el lookup de ids y take.
+
+        Parámetros:
+        - df: DataFrame al que se añaden las columnas.
+        - columnas: columnas de la tabla a añadir (por defecto todas menos el id).
+        - cliente_col: columna de df con el id (por defecto la de la tabla).
+        - dedup: si se indica, lista de columnas de df que identifican una fila; se eliminan
+          sus duplicados tras la unión conservando el índice, como drop_duplicates().
+
+        Devuelve:
+        - DataFrame unido.
+        """
+        cliente_col = cliente_col or self.cliente_col
+        if columnas is None:
+            columnas = [c for c in self.tabla.columns if c != self.cliente_col]
+
+        pos = self.posiciones(df[cliente_col].to_numpy())
+        encontrado = pos >= 0
+        resultado = df[encontrado].reset_index(drop=True)
+        pos = pos[encontrado]
+        if dedup is not None:
+            # Duplicados sobre las columnas de identidad, no sobre la fila entera unida
+            unico = ~resultado.duplicated(subset=dedup).to_numpy()
+            resultado, pos = resultado[unico], pos[unico]
+
+        for col in columnas:
+            resultado[col] = self.tabla[col].take(pos).set_axis(resultado.index)
+        return resultado
@@ -0,0 +1,133 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Rutas por defecto, relativas a la raíz del repositorio
+RUTA_RAW = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw')
+RUTA_PARQUET = os.path.join(os.path.dirname(__file__), '..', 'data', 'parquet')
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Tipos de lectura de los ficheros de texto originales
+TIPOS_WEB = {
+    'client_id': 'int64',
+    'visitor_id': 'string',
+    'visit_id': 'string',
+    'process_step': 'category',
+}
+TIPOS_EXPERIMENTO = {
+    'client_id': 'int64',
+    'Variation': 'category',
+}
+TIPOS_DEMO = {
+    'client_id': 'int64',
+    'gendr': 'category',
+}
+
+
+def _leer_web_txt(ruta):
+    df = pd.read_csv(ruta, dtype=TIPOS_WEB)
+    # Formato fijo: evita la inferencia fila a fila de pd.to_datetime
+    df['date_time'] = pd.to_datetime(df['date_time'], format=FORMATO_FECHA, errors='coerce')
+    return df
+
+
+def convertir_raw_a_parquet(ruta_raw=RUTA_RAW, ruta_parquet=RUTA_PARQUET, sobrescribir=False):
+    """
+    Convierte una única vez los ficheros .txt originales a Parquet tipado.
+
+    Los logs web se escriben como dataset particionado por día (columna 'fecha'),
+    de forma que los días nuevos se pueden añadir sin reescribir los anteriores.
+
+    Parámetros:
+    - ruta_raw: carpeta con df_final_web_data_pt_*.txt, df_final_experiment_clients.txt y df_final_demo.txt.
+    - ruta_parquet: carpeta de salida.
+    - sobrescribir: si es False, no se regenera lo que ya existe.
+
+    Devuelve:
+    - Diccionario con la ruta de cada tabla escrita: 'web', 'experimento' y 'demo'.
+    """
+    os.makedirs(ruta_parquet, exist_ok=True)
+    rutas = {
+        'web': os.path.join(ruta_parquet, 'web'),
+        'experimento': os.path.join(ruta_parquet, 'experiment_clients.parquet'),
+        'demo': os.path.join(ruta_parquet, 'demo.parquet'),
+    }
+
+    if sobrescribir or not os.path.exists(rutas['web']):
+        ficheros_web = sorted(glob.glob(os.path.join(ruta_raw, 'df_final_web_data_pt_*.txt')))
+        if not ficheros_web:
+            raise FileNotFoundError(f"No se encontraron logs web en {ruta_raw}")
+        # Se borra el dataset anterior para no dejar particiones obsoletas
+        shutil.rmtree(rutas['web'], ignore_errors=True)
+        for ruta in ficheros_web:
+            df_web = _leer_web_txt(ruta)
+            df_web['fecha'] = df_web['date_time'].dt.strftime('%Y-%m-%d').fillna('sin_fecha')
+            df_web.to_parquet(
+                rutas['web'],
+                partition_cols=['fecha'],
+                index=False,
+                basename_template=os.path.splitext(os.path.basename(ruta))[0] + '-{i}.parquet',
+            )
+
+    if sobrescribir or not os.path.exists(rutas['experimento']):
+        df_exp_cli = pd.read_csv(os.path.join(ruta_raw, 'df_final_experiment_clients.txt'), dtype=TIPOS_EXPERIMENTO)
+        df_exp_cli.to_parquet(rutas['experimento'], index=False)
+
+    if sobrescribir or not os.path.exists(rutas['demo']):
+        df_final_demo = pd.read_csv(os.path.join(ruta_raw, 'df_final_demo.txt'), dtype=TIPOS_DEMO)
+        df_final_demo.to_parquet(rutas['demo'], index=False)
+
+    return rutas
+
+
+def cargar_web(ruta_parquet=RUTA_PARQUET, columnas=None, fechas=None, filtro=None):
+    """
+    Lee los logs web desde Parquet, solo con las columnas, días y filas necesarios.
+
+    Parámetros:
+    - ruta_parquet: carpeta generada por convertir_raw_a_parquet.
+    - columnas: lista de columnas a leer (por defecto todas salvo la partición 'fecha').
+    - fechas: lista de días 'YYYY-MM-DD' a leer; las particiones restantes no se abren.
+    - filtro: expresión de pyarrow.dataset sobre las filas (p. ej. ds.field('process_step') == 'confirm'),
+      que se evalúa durante la lectura.
+
+    Devuelve:
+    - DataFrame con tipos nativos (timestamps, int64 y categóricas).
+    """
+    dataset = ds.dataset(os.path.join(ruta_parquet, 'web'), format='parquet', partitioning='hive')
+    if columnas is None:
+        columnas = [c for c in dataset.schema.names if c != 'fecha']
+    if fechas is not None:
+        por_fecha = ds.field('fecha').isin(list(fechas))
+        filtro = por_fecha if filtro is None else por_fecha & filtro
+    return dataset.to_table(columns=list(columnas), filter=filtro).to_pandas()
+
+
+def cargar_experimento(ruta_parquet=RUTA_PARQUET, columnas=None):
+    return pq.read_table(os.path.join(ruta_parquet, 'experiment_clients.parquet'), columns=columnas).to_pandas()
+
+
+def cargar_demo(ruta_parquet=RUTA_PARQUET, columnas=None):
+    return pq.read_table(os.path.join(ruta_parquet, 'demo.parquet'), columns=columnas).to_pandas()
+
+
+def cargar_datos(ruta_parquet=RUTA_PARQUET, columnas_web=None):
+    """
+    Atajo para el notebook: devuelve (df_web, df_exp_cli, df_final_demo) listos
+    para preparar_datos_web(df_web, None, df_exp_cli, df_final_demo).
+    """
+    return (
+        cargar_web(ruta_parquet, columnas=columnas_web),
+        cargar_experimento(ruta_parquet),
+        cargar_demo(ruta_parquet),
+    )
+
+
+if __name__ == '__main__':
+    for nombre, ruta in convertir_raw_a_parquet().items():
+        print(f"{nombre}: {ruta}")
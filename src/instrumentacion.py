@@ -0,0 +1,199 @@
+import datetime
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Instrumentación opcional del pipeline: cada etapa instrumentada emite un registro con
+# su duración, filas de entrada / salida y, si se pide, pico de memoria. Sin sumideros
+# activos, el decorador solo añade una comprobación por llamada.
+#
+# Uso:
+#   colector = Colector()
+#   with instrumentacion(colector, SumideroLogger(), memoria=True):
+#       df_web_v, df = preparar_datos_web(...)
+#   colector.tabla()
+#
+# La configuración es global al proceso pero solo se instrumenta el hilo que la activó:
+# tracemalloc mide la memoria de todo el proceso y la pila de etapas no está protegida,
+# así que las etapas que corren en otros hilos (p. ej. los trabajos en segundo plano de
+# la app) se ejecutan sin medir.
+
+_SUMIDEROS = []
+_CONFIG = {'memoria': False, 'hilo': None}
+# Picos de memoria de las etapas abiertas (las etapas pueden anidarse)
+_PILA = []
+
+
+class SumideroLogger:
+    """Escribe cada registro en un logger estándar."""
+
+    def __init__(self, logger=None, nivel=logging.INFO):
+        self.logger = logger or logging.getLogger('vanguard.pipeline')
+        self.nivel = nivel
+
+    def __call__(self, registro):
+        memoria = registro['pico_memoria_mb']
+        self.logger.log(
+            self.nivel, "%s: %.3f s, filas %s -> %s%s%s",
+            registro['etapa'], registro['duracion_s'], registro['filas_entrada'], registro['filas_salida'],
+            f", pico {memoria:.1f} MB" if memoria is not None else "",
+            f", error {registro['error']}" if registro['error'] else "",
+        )
+
+
+class SumideroJSONL:
+    """Añade cada registro como una línea JSON al fichero indicado."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def __call__(self, registro):
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+class Colector:
+    """Guarda los registros en memoria (útil en notebooks y tests)."""
+
+    def __init__(self):
+        self.registros = []
+
+    def __call__(self, registro):
+        self.registros.append(registro)
+
+    def tabla(self):
+        return pd.DataFrame(self.registros)
+
+
+def activar(*sumideros, memoria=False):
+    """
+    Activa la instrumentación con los sumideros indicados (funciones que reciben un dict).
+    memoria=True mide el pico con tracemalloc, que ralentiza bastante la ejecución.
+    Solo se miden las etapas del hilo que llama a activar.
+    """
+    _SUMIDEROS[:] = sumideros
+    _CONFIG['memoria'] = memoria
+    _CONFIG['hilo'] = threading.get_ident() if sumideros else None
+
+
+def desactivar():
+    _SUMIDEROS.clear()
+    _CONFIG['memoria'] = False
+    _CONFIG['hilo'] = None
+
+
+@contextmanager
+def instrumentacion(*sumideros, memoria=False):
+    """Activa la instrumentación dentro del bloque y restaura la configuración anterior al salir."""
+    anteriores, config_anterior = list(_SUMIDEROS), dict(_CONFIG)
+    activar(*sumideros, memoria=memoria)
+    try:
+        yield
+    finally:
+        _SUMIDEROS[:] = anteriores
+        _CONFIG.update(config_anterior)
+
+
+def _activa():
+    # Hay sumideros y la llamada viene del hilo instrumentado
+    return bool(_SUMIDEROS) and threading.get_ident() == _CONFIG['hilo']
+
+
+def _filas(objeto):
+    # Suma de filas de los DataFrame / Series de un valor, tupla o lista
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        return len(objeto)
+    if isinstance(objeto, (tuple, list)):
+        filas = [_filas(o) for o in objeto]
+        filas = [f for f in filas if f is not None]
+        return sum(filas) if filas else None
+    return None
+
+
+def _abrir_memoria():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        propio = True
+    else:
+        propio = False
+    actual, pico = tracemalloc.get_traced_memory()
+    if _PILA:
+        # El pico de la etapa exterior se guarda antes de reiniciarlo para la interior
+        _PILA[-1]['pico'] = max(_PILA[-1]['pico'], pico)
+    tracemalloc.reset_peak()
+    _PILA.append({'base': actual, 'pico': 0, 'propio': propio})
+
+
+def _cerrar_memoria():
+    marco = _PILA.pop()
+    pico = max(marco['pico'], tracemalloc.get_traced_memory()[1])
+    if _PILA:
+        _PILA[-1]['pico'] = max(_PILA[-1]['pico'], pico)
+    if marco['propio']:
+        tracemalloc.stop()
+    return (pico - marco['base']) / 1024 ** 2
+
+
+def _emitir(etapa, inicio, duracion, filas_entrada, filas_salida, pico, error):
+    registro = {
+        'etapa': etapa,
+        'inicio': datetime.datetime.fromtimestamp(inicio).isoformat(timespec='milliseconds'),
+        'duracion_s': duracion,
+        'filas_entrada': filas_entrada,
+        'filas_salida': filas_salida,
+        'pico_memoria_mb': pico,
+        'error': error,
+    }
+    for sumidero in _SUMIDEROS:
+        sumidero(registro)
+
+
+@contextmanager
+def medir(etapa, filas_entrada=None):
+    """
+    Mide un bloque de código como una etapa. El dict devuelto admite 'filas_salida'
+    para informar del tamaño del resultado.
+
+        with medir('carga', filas_entrada=len(df)) as m:
+            df_limpio = ...
+            m['filas_salida'] = len(df_limpio)
+    """
+    datos = {'filas_salida': None}
+    if not _activa():
+        yield datos
+        return
+    memoria = _CONFIG['memoria']
+    if memoria:
+        _abrir_memoria()
+    inicio, t0, error = time.time(), time.perf_counter(), None
+    try:
+        yield datos
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duracion = time.perf_counter() - t0
+        pico = _cerrar_memoria() if memoria else None
+        _emitir(etapa, inicio, duracion, filas_entrada, datos['filas_salida'], pico, error)
+
+
+def instrumentar(funcion):
+    """Decorador: con la instrumentación activa, cada llamada se registra como una etapa."""
+    etapa = f"{funcion.__module__}.{funcion.__name__}"
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not _activa():
+            return funcion(*args, **kwargs)
+        with medir(etapa, _filas(list(args) + list(kwargs.values()))) as m:
+            resultado = funcion(*args, **kwargs)
+            m['filas_salida'] = _filas(resultado)
+        return resultado
+
+    return envoltura
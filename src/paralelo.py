@@ -0,0 +1,226 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from funnel import ORDEN_PASOS, _mascara_errores, codificar_pasos, expandir_mascara_errores, inicio_sesion
+
+NAT = np.iinfo(np.int64).min
+
+
+def _crear_compartido(array):
+    memoria = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    destino = np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)
+    destino[:] = array
+    return memoria, (memoria.name, array.shape, array.dtype.str)
+
+
+def _abrir_compartido(descriptor):
+    nombre, forma, tipo = descriptor
+    memoria = shared_memory.SharedMemory(name=nombre)
+    return memoria, np.ndarray(forma, dtype=np.dtype(tipo), buffer=memoria.buf)
+
+
+def _procesar_particion(tarea):
+    """
+    Ordena, calcula time_diff_sec, la máscara de errores y los agregados de un rango
+    contiguo de clientes. Escribe los resultados por fila en la memoria compartida y
+    devuelve solo los agregados (pequeños).
+    """
+    inicio, fin, entradas, salidas, n_variaciones, n_textos, cod_objetivo = tarea
+    memorias = []
+    try:
+        arrays = {}
+        for nombre, descriptor in {**entradas, **salidas}.items():
+            memoria, array = _abrir_compartido(descriptor)
+            memorias.append(memoria)
+            arrays[nombre] = array
+
+        cliente = arrays['cliente'][inicio:fin]
+        visita = arrays['visita'][inicio:fin]
+        tiempo = arrays['tiempo'][inicio:fin]
+        paso = arrays['paso'][inicio:fin]
+        texto = arrays['texto'][inicio:fin]
+        variacion = arrays['variacion'][inicio:fin]
+
+        # Mismo orden que calcular_diferencia_tiempo; los NaT van al final de su visita y
+        # las visitas nulas (código -1) al final de su cliente
+        tiempo_orden = np.where(tiempo == NAT, np.iinfo(np.int64).max, tiempo)
+        visita_orden = np.where(visita < 0, np.iinfo(np.int64).max, visita)
+        orden = np.lexsort((tiempo_orden, visita_orden, cliente))
+        cliente, visita, tiempo, paso, texto, variacion = (
+            a[orden] for a in (cliente, visita, tiempo, paso, texto, variacion))
+
+        # Cada evento sin visita es una sesión propia: sin paso anterior ni time_diff, como
+        # en el groupby, que deja fuera las claves nulas
+        sin_visita = visita < 0
+        inicio_visita = inicio_sesion(cliente, visita) | sin_visita
+        ultimo = np.append(inicio_visita[1:], True)
+        time_diff = np.full(len(tiempo), np.nan)
+        time_diff[:-1] = (tiempo[1:] - tiempo[:-1]) / 1e9
+        time_diff[ultimo | sin_visita | (tiempo == NAT) | np.append(tiempo[1:] == NAT, True)] = np.nan
+
+        # Paso repetido comparando el texto, como detectar_errores_funnel (también para
+        # pasos fuera de ORDEN_PASOS; los nulos nunca coinciden)
+        mismo_paso = np.zeros(len(texto), dtype=bool)
+        mismo_paso[1:] = (texto[1:] == texto[:-1]) & (texto[1:] >= 0)
+        mismo_paso &= ~inicio_visita
+        mascara = _mascara_errores(paso, inicio_visita, time_diff, mismo_paso)
+
+        arrays['posicion'][inicio:fin] = arrays['fila'][inicio:fin][orden]
+        arrays['time_diff_sec'][inicio:fin] = time_diff
+        arrays['mascara'][inicio:fin] = mascara
+
+        # Agregados por cliente (el rango contiene clientes completos)
+        ids, cod_cliente = np.unique(cliente, return_inverse=True)
+        completado = np.bincount(cod_cliente, weights=paso == cod_objetivo, minlength=len(ids)) > 0
+        tiempo_total = np.bincount(cod_cliente, weights=np.nan_to_num(time_diff), minlength=len(ids))
+        variacion_cliente = np.zeros(len(ids), dtype=variacion.dtype)
+        variacion_cliente[cod_cliente[::-1]] = variacion[::-1]
+
+        # Registros y errores por (Variation, process_step); los pasos nulos no cuentan, como en groupby
+        con_paso = texto >= 0
+        celda = variacion[con_paso].astype(np.int64) * n_textos + texto[con_paso]
+        registros = np.bincount(celda, minlength=n_variaciones * n_textos)
+        errores = np.bincount(celda, weights=mascara[con_paso] != 0, minlength=n_variaciones * n_textos)
+        return ids, variacion_cliente, completado, tiempo_total, registros, errores
+    finally:
+        for memoria in memorias:
+            memoria.close()
+
+
+def ejecutar_funnel_paralelo(df_web_v, n_procesos=None, n_particiones=None, step_objetivo='confirm', devolver_eventos=True):
+    """
+    Ejecuta en paralelo calcular_diferencia_tiempo, detectar_errores_funnel y los
+    agregados por cliente, repartiendo los eventos por rangos de client_id entre
+    procesos. Las columnas de entrada se codifican como arrays numéricos y se copian
+    una vez a memoria compartida, de donde las leen los procesos sin serializarlas.
+
+    Parámetros:
+    - df_web_v: eventos con Variation (salida de preparar_datos_web).
+    - n_procesos: procesos del pool (por defecto, todos los núcleos).
+    - n_particiones: rangos de clientes (por defecto, 4 por proceso).
+    - step_objetivo: paso que cuenta como finalización.
+    - devolver_eventos: si es True, devuelve también los eventos ordenados con
+      time_diff_sec y las columnas de error.
+
+    Devuelve:
+    - Diccionario con 'tasa_finalizacion', 'tiempo_total' y 'tasa_errores' en el mismo
+      formato que calcular_tasa_finalizacion, calcular_tiempo_total_por_cliente y
+      calcular_tasa(df, 'es_error', 'Variation', 'process_step'), y 'eventos' si se pide.
+    """
+    n_procesos = n_procesos or os.cpu_count() or 1
+    n_particiones = n_particiones or 4 * n_procesos
+
+    # Codificación a enteros en el proceso principal
+    cliente = df_web_v['client_id'].to_numpy(dtype=np.int64)
+    visita = pd.factorize(df_web_v['visit_id'], sort=True)[0].astype(np.int64)
+    tiempo = df_web_v['date_time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    paso = codificar_pasos(df_web_v['process_step'])
+    texto, textos = pd.factorize(df_web_v['process_step'].astype(object), sort=True)
+    cod_variacion, variaciones = pd.factorize(df_web_v['Variation'], sort=True)
+    cod_objetivo = ORDEN_PASOS.index(step_objetivo)
+
+    # Rangos contiguos de clientes con un número parecido de clientes cada uno
+    clientes_unicos = np.unique(cliente)
+    if len(clientes_unicos):
+        cortes = clientes_unicos[np.linspace(0, len(clientes_unicos), n_particiones + 1, dtype=int)[1:-1]]
+    else:
+        cortes = clientes_unicos
+    particion = np.searchsorted(cortes, cliente, side='right')
+    fila = np.argsort(particion, kind='stable')
+    limites = np.concatenate(([0], np.cumsum(np.bincount(particion, minlength=n_particiones))))
+
+    entradas_locales = {
+        'cliente': cliente[fila],
+        'visita': visita[fila],
+        'tiempo': tiempo[fila],
+        'paso': paso[fila],
+        'texto': texto[fila].astype(np.int64),
+        'variacion': cod_variacion[fila].astype(np.int8),
+        'fila': fila.astype(np.int64),
+    }
+    n = len(df_web_v)
+    salidas_locales = {
+        'posicion': np.zeros(n, dtype=np.int64),
+        'time_diff_sec': np.zeros(n, dtype=np.float64),
+        'mascara': np.zeros(n, dtype=np.uint8),
+    }
+
+    memorias = {}
+    try:
+        descriptores = {}
+        for nombre, array in {**entradas_locales, **salidas_locales}.items():
+            memorias[nombre], descriptores[nombre] = _crear_compartido(array)
+        entradas = {k: descriptores[k] for k in entradas_locales}
+        salidas = {k: descriptores[k] for k in salidas_locales}
+
+        tareas = [
+            (limites[p], limites[p + 1], entradas, salidas, len(variaciones), len(textos), cod_objetivo)
+            for p in range(n_particiones) if limites[p + 1] > limites[p]
+        ]
+        if n_procesos == 1:
+            parciales = [_procesar_particion(t) for t in tareas]
+        else:
+            with ProcessPoolExecutor(max_workers=n_procesos) as pool:
+                parciales = list(pool.map(_procesar_particion, tareas))
+
+        resultados = {}
+        if devolver_eventos:
+            vistas = {
+                k: np.ndarray(array.shape, dtype=array.dtype, buffer=memorias[k].buf).copy()
+                for k, array in salidas_locales.items()
+            }
+            eventos = df_web_v.take(vistas['posicion']).reset_index(drop=True)
+            eventos['time_diff_sec'] = vistas['time_diff_sec']
+            errores = expandir_mascara_errores(vistas['mascara'], eventos.index)
+            resultados['eventos'] = pd.concat([eventos, errores], axis=1)
+    finally:
+        for memoria in memorias.values():
+            memoria.close()
+            memoria.unlink()
+
+    # Reducción de los agregados parciales (las particiones no comparten clientes)
+    if parciales:
+        ids, var_cliente, completado, tiempo_total, registros, errores = (
+            np.concatenate(partes) for partes in zip(*parciales))
+    else:
+        # Sin eventos: mismos formatos, sin filas
+        ids, var_cliente = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+        completado, tiempo_total = np.empty(0, dtype=bool), np.empty(0, dtype=np.float64)
+        registros, errores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    por_cliente = pd.DataFrame({
+        'client_id': ids,
+        'Variation': np.asarray(variaciones)[var_cliente.astype(int)],
+        'completado': completado,
+        'total_time_sec': tiempo_total,
+    })
+    resultados['tiempo_total'] = por_cliente[['client_id', 'Variation', 'total_time_sec']]
+
+    resumen = por_cliente.groupby('Variation').agg(
+        clientes_completados=('completado', 'sum'),
+        total_clientes=('completado', 'size'),
+    )
+    # Grupos sin clientes completados: NaN y al final, como calcular_tasa_finalizacion
+    completados = resumen['clientes_completados']
+    if (completados == 0).any():
+        resumen['clientes_completados'] = completados.where(completados > 0)
+        resumen = pd.concat([resumen[completados > 0], resumen[completados == 0]])
+    resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
+    resultados['tasa_finalizacion'] = resumen.round(2).reset_index()
+
+    forma = (len(parciales), len(variaciones) * len(textos))
+    registros = np.asarray(registros).reshape(forma).sum(axis=0)
+    errores = np.asarray(errores).reshape(forma).sum(axis=0)
+    tasa = pd.DataFrame({
+        'Variation': np.repeat(np.asarray(variaciones), len(textos)),
+        'process_step': np.tile(np.asarray(textos), len(variaciones)),
+        'total_registros': registros,
+        'n_eventos': errores,
+    })
+    tasa = tasa[tasa['total_registros'] > 0].copy()
+    tasa['tasa_%'] = (tasa['n_eventos'] / tasa['total_registros']) * 100
+    resultados['tasa_errores'] = tasa.sort_values(['Variation', 'process_step']).reset_index(drop=True)
+    return resultados
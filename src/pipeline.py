@@ -0,0 +1,489 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from funnel import BITS_ERROR, ORDEN_PASOS, coincide_ruta, detectar_errores_mascara, diferencia_siguiente, ordenar_claves
+from indice_clientes import IndiceClientes
+from ingesta import RUTA_PARQUET, cargar_web
+
+# Pipeline perezoso sobre los eventos web: los pasos (unión, orden, diferencia de
+# tiempo, marcas de error, filtros y agregados) solo se registran y, al ejecutar, se
+# optimiza el plan antes de tocar los datos:
+#   - los filtros se mueven hacia el origen mientras no cambien el resultado (los que
+#     conservan clientes o visitas enteros pasan por delante de las ventanas por visita)
+#     y, desde Parquet, se evalúan durante la lectura;
+#   - solo se leen y conservan las columnas que usa algún paso posterior;
+#   - los filtros consecutivos se funden en una máscara que se aplica una sola vez, al
+#     llegar a un paso que necesita las filas (o se pasa tal cual a los agregados).
+#
+# Ejemplo (primer intento desde los logs unidos, sin tablas intermedias):
+#   p = Pipeline.desde_df(df_web_v).diferencia_tiempo().errores()
+#   primer_intento(p).ejecutar()
+#   print(primer_intento(p).explicar())
+
+OPERADORES = {
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(v),
+    'not in': lambda s, v: ~s.isin(v),
+    'notna': lambda s, v: s.notna(),
+    'isna': lambda s, v: s.isna(),
+}
+
+# Operadores que se pueden evaluar en la lectura de Parquet con la misma semántica de
+# nulos que pandas (los nulos no pasan el filtro)
+OPERADORES_ARROW = {
+    '==': lambda c, v: ds.field(c) == v,
+    '<': lambda c, v: ds.field(c) < v,
+    '<=': lambda c, v: ds.field(c) <= v,
+    '>': lambda c, v: ds.field(c) > v,
+    '>=': lambda c, v: ds.field(c) >= v,
+    'in': lambda c, v: ds.field(c).isin(list(v)),
+    'notna': lambda c, v: ds.field(c).is_valid(),
+    'isna': lambda c, v: ds.field(c).is_null(),
+}
+
+# Columnas constantes dentro de una visita (además de las de cliente)
+COLUMNAS_VISITA = ('visit_id', 'visitor_id')
+
+# Pasos que reciben la máscara pendiente en lugar de las filas ya filtradas
+TERMINALES = ('agregar', 'coincide_ruta')
+
+
+def _evaluar(df, filtro, mascara=None):
+    """Máscara booleana de un filtro (los nulos no pasan, como en pandas)."""
+    serie = df[filtro.columna]
+    if filtro.tipo == 'filtro_clientes':
+        cumple = OPERADORES[filtro.operador](serie, filtro.valor).to_numpy(dtype=bool, na_value=False)
+        if mascara is not None:
+            cumple &= mascara
+        clientes = df[filtro.cliente_col]
+        return clientes.isin(clientes[cumple].unique()).to_numpy()
+    return OPERADORES[filtro.operador](serie, filtro.valor).to_numpy(dtype=bool, na_value=False)
+
+
+def _tomar(df, mascara, columnas=None):
+    """Filas de la máscara y, si se indican, solo esas columnas, en una única copia."""
+    filas = np.flatnonzero(mascara)
+    if columnas is None or set(df.columns) <= columnas:
+        return df.take(filas)
+    return df.iloc[filas, [i for i, c in enumerate(df.columns) if c in columnas]]
+
+
+class Paso:
+    """
+    Paso registrado en el plan.
+
+    Parámetros:
+    - tipo: 'unir', 'ordenar', 'diferencia_tiempo', 'errores', 'filtro', 'filtro_clientes',
+      'seleccionar', 'agregar' o 'coincide_ruta' ('mascara' tras fundir filtros).
+    - usa: columnas que lee.
+    - produce: columnas que añade.
+    - opciones: argumentos del paso (se exponen como atributos).
+    """
+
+    def __init__(self, tipo, usa=(), produce=(), **opciones):
+        self.tipo = tipo
+        self.usa = set(usa)
+        self.produce = set(produce)
+        self.nivel = 'fila'
+        self.__dict__.update(opciones)
+
+    def __repr__(self):
+        if self.tipo in ('filtro', 'filtro_clientes'):
+            valor = '' if self.operador in ('notna', 'isna') else f' {self.valor!r}'
+            texto = f"{self.columna} {self.operador}{valor}"
+            return f"{self.tipo}({texto}, nivel={self.nivel})"
+        if self.tipo == 'mascara':
+            return 'mascara[' + ' & '.join(repr(f) for f in self.filtros) + ']'
+        return f"{self.tipo}({', '.join(sorted(self.usa))})"
+
+
+class Pipeline:
+    """
+    Plan perezoso de pasos sobre los eventos web. Cada método devuelve un Pipeline
+    nuevo con el paso añadido; nada se calcula hasta ejecutar().
+
+    Se construye con Pipeline.desde_df o Pipeline.desde_parquet.
+    """
+
+    def __init__(self, origen, columnas_origen, pasos=()):
+        self.origen = origen
+        self.columnas_origen = list(columnas_origen)
+        self.pasos = list(pasos)
+
+    @classmethod
+    def desde_df(cls, df):
+        return cls({'tipo': 'df', 'df': df}, df.columns)
+
+    @classmethod
+    def desde_parquet(cls, ruta_parquet=RUTA_PARQUET, fechas=None):
+        """Logs web desde el dataset de convertir_raw_a_parquet; solo se leen las columnas y filas necesarias."""
+        esquema = ds.dataset(os.path.join(ruta_parquet, 'web'), format='parquet', partitioning='hive').schema
+        columnas = [c for c in esquema.names if c != 'fecha']
+        return cls({'tipo': 'parquet', 'ruta': ruta_parquet, 'fechas': fechas}, columnas)
+
+    def _con(self, paso):
+        return Pipeline(self.origen, self.columnas_origen, self.pasos + [paso])
+
+    # Registro de pasos
+
+    def unir(self, tabla, columnas=None, cliente_col='client_id', dedup=None):
+        """
+        Unión interna con una tabla de un cliente por fila (IndiceClientes.unir).
+        dedup: columnas que identifican un evento para eliminar duplicados tras la unión.
+        """
+        columnas = [c for c in tabla.columns if c != cliente_col] if columnas is None else list(columnas)
+        return self._con(Paso('unir', usa=[cliente_col] + list(dedup or []), produce=columnas,
+                              tabla=tabla, cliente_col=cliente_col, dedup=dedup, filtros_tabla=[]))
+
+    def ordenar(self, *claves):
+        """Orden estable por las claves, como sort_values."""
+        return self._con(Paso('ordenar', usa=claves, claves=list(claves)))
+
+    def diferencia_tiempo(self, client_col='client_id', visit_col='visit_id', time_col='date_time'):
+        """Ordena y añade time_diff y time_diff_sec, como calcular_diferencia_tiempo."""
+        return self._con(Paso('diferencia_tiempo', usa=[client_col, visit_col, time_col],
+                              produce=['time_diff', 'time_diff_sec'],
+                              client_col=client_col, visit_col=visit_col, time_col=time_col))
+
+    def errores(self, step_col='process_step', client_col='client_id', visit_col='visit_id',
+                time_diff_col='time_diff_sec'):
+        """
+        Añade las marcas de error de detectar_errores_funnel (las cuatro y es_error) que se
+        usen después. Requiere los datos ordenados como tras diferencia_tiempo.
+        """
+        return self._con(Paso('errores', usa=[step_col, client_col, visit_col, time_diff_col],
+                              produce=list(BITS_ERROR) + ['es_error'], step_col=step_col,
+                              client_col=client_col, visit_col=visit_col, time_diff_col=time_diff_col))
+
+    def filtrar(self, columna, operador, valor=None, nivel=None):
+        """
+        Conserva las filas que cumplen 'columna operador valor' (operadores de OPERADORES).
+
+        nivel indica si el filtro conserva filas sueltas ('fila'), visitas enteras
+        ('visita') o clientes enteros ('cliente'); por defecto se deduce de la columna.
+        """
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador desconocido: {operador!r}")
+        paso = Paso('filtro', usa=[columna], columna=columna, operador=operador, valor=valor)
+        paso.nivel = nivel or self._nivel(columna)
+        return self._con(paso)
+
+    def filtrar_clientes(self, columna, operador, valor=None, cliente_col='client_id'):
+        """Conserva los clientes con al menos una fila que cumple 'columna operador valor'."""
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador desconocido: {operador!r}")
+        paso = Paso('filtro_clientes', usa=[columna, cliente_col], columna=columna, operador=operador,
+                    valor=valor, cliente_col=cliente_col)
+        paso.nivel = 'cliente'
+        return self._con(paso)
+
+    def seleccionar(self, *columnas):
+        return self._con(Paso('seleccionar', usa=columnas, columnas=list(columnas)))
+
+    def agregar(self, por, **medidas):
+        """
+        Agregados por grupo (grupos observados y sin nulos, ordenados como en groupby).
+
+        Cada medida es (columna, funcion) o (columna, funcion, (columna, operador, valor)),
+        donde el filtro solo afecta a esa medida. Funciones: 'size', 'count', 'nunique',
+        'distintos' (como nunique pero contando el nulo como un valor más, igual que
+        drop_duplicates) y cualquier agregación de groupby ('sum', 'mean', 'max'...).
+
+        Ejemplo: agregar('Variation', completados=('client_id', 'nunique', ('process_step', '==', 'confirm')))
+        """
+        por = [por] if isinstance(por, str) else list(por)
+        usa = set(por)
+        for medida in medidas.values():
+            usa.add(medida[0])
+            if len(medida) > 2:
+                usa.add(medida[2][0])
+        return self._con(Paso('agregar', usa=usa, produce=list(medidas), por=por, medidas=medidas))
+
+    def coincide_ruta(self, ruta, step_col='process_step', client_col='client_id', nombre='coincide'):
+        """Por cliente, si su secuencia de pasos es exactamente 'ruta' (funnel.coincide_ruta)."""
+        return self._con(Paso('coincide_ruta', usa=[step_col, client_col], produce=[client_col, nombre],
+                              ruta=list(ruta), step_col=step_col, client_col=client_col, nombre=nombre))
+
+    def _nivel(self, columna):
+        # Columnas constantes por cliente: el id y las que llegan de una unión por cliente
+        de_cliente = {'client_id'}
+        for paso in self.pasos:
+            if paso.tipo == 'unir':
+                de_cliente |= paso.produce | {paso.cliente_col}
+        if columna in de_cliente:
+            return 'cliente'
+        if columna in COLUMNAS_VISITA:
+            return 'visita'
+        return 'fila'
+
+    # Optimización
+
+    @staticmethod
+    def _conmutan(anterior, filtro):
+        """Si 'filtro' puede ejecutarse antes que 'anterior' sin cambiar el resultado."""
+        if anterior.tipo in ('filtro', 'filtro_clientes'):
+            # Un filtro de clientes depende de las filas presentes: solo conmuta con filtros
+            # que quitan clientes enteros
+            if 'filtro_clientes' in (anterior.tipo, filtro.tipo):
+                return anterior.nivel == 'cliente' and filtro.nivel == 'cliente'
+            return True
+        if filtro.usa & anterior.produce:
+            return False
+        if anterior.tipo in ('ordenar', 'seleccionar'):
+            return True
+        if anterior.tipo in ('diferencia_tiempo', 'errores'):
+            # Las ventanas por visita no cambian si se quitan visitas o clientes enteros
+            return filtro.nivel in ('visita', 'cliente')
+        if anterior.tipo == 'unir':
+            # Con dedup, el filtro debe valer lo mismo en las filas duplicadas
+            return (anterior.dedup is None or filtro.tipo == 'filtro_clientes'
+                    or filtro.usa <= set(anterior.dedup))
+        return False
+
+    def _optimizar(self):
+        """Plan optimizado: (filtros evaluados en la lectura, lista de pasos)."""
+        pasos = list(self.pasos)
+        # Copias de las uniones para no modificar el plan registrado
+        for i, p in enumerate(pasos):
+            if p.tipo == 'unir':
+                pasos[i] = Paso('unir', usa=p.usa, produce=p.produce, tabla=p.tabla, cliente_col=p.cliente_col,
+                                dedup=p.dedup, filtros_tabla=list(p.filtros_tabla))
+        en_lectura = []
+
+        # 1. Filtros hacia el origen, de uno en uno en el orden registrado
+        i = 0
+        while i < len(pasos):
+            paso = pasos[i]
+            if paso.tipo not in ('filtro', 'filtro_clientes'):
+                i += 1
+                continue
+            j = i
+            while j > 0 and self._conmutan(pasos[j - 1], paso):
+                pasos[j - 1], pasos[j] = pasos[j], pasos[j - 1]
+                j -= 1
+            anterior = pasos[j - 1] if j > 0 else None
+            if (anterior is not None and anterior.tipo == 'unir' and paso.tipo == 'filtro'
+                    and paso.usa <= anterior.produce):
+                # Filtro sobre columnas de la tabla unida: se aplica a la tabla antes de unir
+                anterior.filtros_tabla.append(paso)
+                del pasos[j]
+                continue
+            if (anterior is None and self.origen['tipo'] == 'parquet' and paso.tipo == 'filtro'
+                    and paso.operador in OPERADORES_ARROW):
+                en_lectura.append(paso)
+                del pasos[j]
+                continue
+            # Entre filtros seguidos se conserva el orden registrado
+            k = j
+            while k < i and pasos[k + 1].tipo in ('filtro', 'filtro_clientes'):
+                k += 1
+            pasos.insert(k, pasos.pop(j))
+            i += 1
+
+        # 2. Filtros consecutivos fundidos en una sola máscara
+        fundidos = []
+        for paso in pasos:
+            if paso.tipo in ('filtro', 'filtro_clientes'):
+                if fundidos and fundidos[-1].tipo == 'mascara':
+                    fundidos[-1].filtros.append(paso)
+                    fundidos[-1].usa |= paso.usa
+                else:
+                    fundidos.append(Paso('mascara', usa=paso.usa, filtros=[paso]))
+            else:
+                fundidos.append(paso)
+        return en_lectura, fundidos
+
+    @staticmethod
+    def _necesarias(pasos):
+        """
+        Columnas necesarias después de cada paso (None = todas), de atrás hacia delante;
+        el primer elemento son las que hay que leer del origen.
+        """
+        necesarias = [None] * (len(pasos) + 1)
+        despues = None
+        for i in range(len(pasos) - 1, -1, -1):
+            paso = pasos[i]
+            necesarias[i + 1] = despues
+            if paso.tipo in TERMINALES:
+                despues = set(paso.usa)
+            elif paso.tipo == 'seleccionar':
+                despues = set(paso.columnas) if despues is None else despues & set(paso.columnas)
+            elif despues is not None:
+                despues = (despues - paso.produce) | paso.usa
+        necesarias[0] = despues
+        return necesarias
+
+    def explicar(self):
+        """Plan optimizado como texto: columnas leídas, filtros en la lectura y pasos."""
+        en_lectura, pasos = self._optimizar()
+        necesarias = self._necesarias(pasos)
+        leidas = self.columnas_origen if necesarias[0] is None else [c for c in self.columnas_origen if c in necesarias[0]]
+        lineas = [f"origen {self.origen['tipo']}: columnas {leidas}"]
+        if en_lectura:
+            lineas.append(f"  filtro en lectura: {en_lectura}")
+        for paso in pasos:
+            lineas.append(f"{paso!r}")
+            if paso.tipo == 'unir' and paso.filtros_tabla:
+                lineas.append(f"  filtro en tabla unida: {paso.filtros_tabla}")
+        return '\n'.join(lineas)
+
+    # Ejecución
+
+    def ejecutar(self):
+        """Ejecuta el plan optimizado y devuelve el DataFrame resultante."""
+        en_lectura, pasos = self._optimizar()
+        necesarias = self._necesarias(pasos)
+        df = self._leer(en_lectura, necesarias[0])
+
+        # Máscara pendiente: se aplica cuando un paso necesita las filas. Las columnas se
+        # podan en la lectura y, después, solo en la copia que ya hace la máscara (los
+        # pasos únicamente añaden las columnas que se usan más adelante)
+        mascara = None
+        for i, paso in enumerate(pasos):
+            if paso.tipo == 'mascara':
+                for filtro in paso.filtros:
+                    cumple = _evaluar(df, filtro, mascara)
+                    mascara = cumple if mascara is None else mascara & cumple
+                continue
+            if paso.tipo in TERMINALES:
+                return self._terminal(paso, df, mascara)
+            if mascara is not None:
+                df = _tomar(df, mascara, necesarias[i])
+                mascara = None
+            df = self._aplicar(paso, df, necesarias[i + 1])
+        if mascara is not None:
+            df = _tomar(df, mascara, necesarias[-1])
+        return df
+
+    def _leer(self, en_lectura, columnas):
+        columnas = self.columnas_origen if columnas is None else [c for c in self.columnas_origen if c in columnas]
+        if self.origen['tipo'] == 'df':
+            df = self.origen['df']
+            return df if len(columnas) == len(df.columns) else df[columnas]
+        filtro = None
+        for f in en_lectura:
+            expresion = OPERADORES_ARROW[f.operador](f.columna, f.valor)
+            filtro = expresion if filtro is None else filtro & expresion
+        return cargar_web(self.origen['ruta'], columnas=columnas, fechas=self.origen['fechas'], filtro=filtro)
+
+    @staticmethod
+    def _aplicar(paso, df, despues):
+        if paso.tipo == 'unir':
+            tabla = paso.tabla
+            if paso.filtros_tabla:
+                cumple = np.logical_and.reduce([_evaluar(tabla, f) for f in paso.filtros_tabla])
+                tabla = tabla[cumple]
+            columnas = [c for c in tabla.columns if c in paso.produce and (despues is None or c in despues)]
+            try:
+                return IndiceClientes(tabla, paso.cliente_col).unir(df, columnas=columnas, dedup=paso.dedup)
+            except ValueError:
+                # ids no enteros o repetidos: merge
+                unido = pd.merge(df, tabla[[paso.cliente_col] + columnas], on=paso.cliente_col, how='inner')
+                return unido.drop_duplicates(subset=paso.dedup) if paso.dedup else unido
+        if paso.tipo == 'ordenar':
+            orden, _ = ordenar_claves(*(df[c] for c in paso.claves))
+            return df if orden is None else df.take(orden)
+        if paso.tipo == 'diferencia_tiempo':
+            df, diferencia = diferencia_siguiente(df, paso.client_col, paso.visit_col, paso.time_col)
+            if despues is None or 'time_diff' in despues:
+                df['time_diff'] = diferencia
+            df['time_diff_sec'] = diferencia / np.timedelta64(1, 's')
+            return df
+        if paso.tipo == 'errores':
+            bits = detectar_errores_mascara(df, paso.step_col, paso.client_col, paso.visit_col, paso.time_diff_col)
+            df = df.copy(deep=False)
+            for nombre, bit in BITS_ERROR.items():
+                if despues is None or nombre in despues:
+                    df[nombre] = (bits & bit) != 0
+            if despues is None or 'es_error' in despues:
+                df['es_error'] = bits != 0
+            return df
+        if paso.tipo == 'seleccionar':
+            return df[paso.columnas]
+        raise ValueError(f"Paso desconocido: {paso.tipo}")
+
+    @staticmethod
+    def _terminal(paso, df, mascara):
+        filas = None if mascara is None else np.flatnonzero(mascara)
+
+        def columna(nombre):
+            return df[nombre] if filas is None else df[nombre].take(filas)
+
+        if paso.tipo == 'coincide_ruta':
+            eventos = {c: columna(c) for c in (paso.client_col, paso.step_col)}
+            ids, coincide = coincide_ruta(eventos, paso.ruta, paso.step_col, paso.client_col)
+            return pd.DataFrame({paso.client_col: ids, paso.nombre: coincide})
+        return _agregar({c: columna(c) for c in paso.usa}, paso.por, paso.medidas)
+
+
+def primer_intento(pipeline, ruta=ORDEN_PASOS, cliente_col='client_id', step_col='process_step'):
+    """
+    Añade a un pipeline con las marcas de error los pasos de obtener_primera: clientes que
+    llegan a ruta[-1], sin eventos con error, y si su secuencia de pasos es exactamente 'ruta'.
+
+    Devuelve:
+    - Pipeline que al ejecutarse da [cliente_col, first_attempt_success].
+    """
+    return (
+        pipeline
+        .filtrar_clientes(step_col, '==', ruta[-1], cliente_col=cliente_col)
+        .filtrar('es_error', '==', False)
+        .filtrar('repetido_mismo_paso', '==', False)
+        .filtrar('retroceso_cero', '==', False)
+        .filtrar('salto_grande_atras', '==', False)
+        .coincide_ruta(ruta, step_col, cliente_col, nombre='first_attempt_success')
+    )
+
+
+def _agregar(columnas, por, medidas):
+    # Códigos de grupo ordenados (solo grupos observados); las filas con alguna clave
+    # nula no cuentan
+    codigos, valores = zip(*(pd.factorize(columnas[c], sort=True) for c in por))
+    validos = np.logical_and.reduce([c >= 0 for c in codigos])
+    if len(por) == 1:
+        grupo = codigos[0]
+        indice = pd.Index(valores[0], name=por[0])
+    else:
+        formas = [len(v) for v in valores]
+        unicos, inversa = np.unique(np.ravel_multi_index([c[validos] for c in codigos], formas), return_inverse=True)
+        grupo = np.full(len(validos), -1, dtype=np.int64)
+        grupo[validos] = inversa
+        posiciones = np.unravel_index(unicos, formas)
+        indice = pd.MultiIndex.from_arrays([v.take(p) for v, p in zip(valores, posiciones)], names=por)
+    n_grupos = len(indice)
+
+    resultado, factorizadas = {}, {}
+    for nombre, medida in medidas.items():
+        col, funcion = medida[0], medida[1]
+        incluir = grupo >= 0
+        if len(medida) > 2:
+            filtro = Paso('filtro', columna=medida[2][0], operador=medida[2][1], valor=medida[2][2])
+            incluir &= _evaluar(columnas, filtro)
+        serie = columnas[col]
+        if funcion == 'size':
+            resultado[nombre] = np.bincount(grupo[incluir], minlength=n_grupos)
+        elif funcion == 'count':
+            incluir &= serie.notna().to_numpy()
+            resultado[nombre] = np.bincount(grupo[incluir], minlength=n_grupos)
+        elif funcion in ('nunique', 'distintos'):
+            if col not in factorizadas:
+                factorizadas[col] = pd.factorize(serie)
+            cod, unicos_col = factorizadas[col]
+            base = len(unicos_col) + 1
+            if funcion == 'nunique':
+                incluir &= cod >= 0
+            pares = pd.unique(grupo[incluir].astype(np.int64) * base + (cod[incluir] + 1))
+            resultado[nombre] = np.bincount(pares // base, minlength=n_grupos)
+        else:
+            valores_medida = serie.to_numpy()[incluir]
+            agregado = pd.Series(valores_medida).groupby(grupo[incluir]).agg(funcion)
+            resultado[nombre] = agregado.reindex(np.arange(n_grupos)).to_numpy()
+    return pd.DataFrame(resultado, index=indice)
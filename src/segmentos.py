@@ -0,0 +1,117 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Índice de segmentación de clientes: cada columna numérica se ordena una vez y los
+# filtros por rango se resuelven con búsqueda binaria; cada filtro se guarda como
+# bitmap empaquetado (1 bit por cliente) y las intersecciones se cachean.
+
+COLUMNAS_RANGO = ['clnt_age', 'clnt_tenure_mnth', 'bal']
+COLUMNAS_CATEGORIA = ['gendr', 'Variation']
+
+
+class IndiceSegmentos:
+    """
+    Índice en memoria sobre la tabla de clientes (df_final_demo, limpia o no, con o sin
+    Variation) para filtrar segmentos sin recorrer todo el DataFrame en cada consulta.
+
+    Parámetros:
+    - df: DataFrame de clientes, una fila por cliente.
+    - columnas_rango: columnas numéricas filtrables por [mínimo, máximo].
+    - columnas_categoria: columnas filtrables por lista de valores.
+    - tam_cache: número de bitmaps e intersecciones que se guardan en cada caché.
+    """
+
+    def __init__(self, df, columnas_rango=COLUMNAS_RANGO, columnas_categoria=COLUMNAS_CATEGORIA, tam_cache=512):
+        self.df = df
+        self.n = len(df)
+        self._ordenados = {}
+        for col in columnas_rango:
+            if col not in df.columns:
+                continue
+            valores = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            orden = np.argsort(valores, kind='stable')
+            # Los NaN quedan al final y nunca cumplen un filtro de rango (como en pandas)
+            n_validos = int(np.count_nonzero(~np.isnan(valores)))
+            self._ordenados[col] = (valores[orden[:n_validos]], orden[:n_validos])
+
+        self._categorias = {}
+        for col in columnas_categoria:
+            if col not in df.columns:
+                continue
+            codigos, valores = pd.factorize(df[col])
+            self._categorias[col] = {v: np.packbits(codigos == i) for i, v in enumerate(valores)}
+
+        self._bitmap_rango = functools.lru_cache(maxsize=tam_cache)(self._calcular_rango)
+        self._interseccion = functools.lru_cache(maxsize=tam_cache)(self._calcular_interseccion)
+
+    def limites(self, col):
+        """Mínimo y máximo de una columna de rango (para configurar sliders), sin contar los NaN."""
+        valores, _ = self._ordenados[col]
+        if len(valores) == 0:
+            raise ValueError(f"La columna '{col}' no tiene valores (está vacía o es toda NaN).")
+        return float(valores[0]), float(valores[-1])
+
+    def valores(self, col):
+        """Valores distintos de una columna de categoría."""
+        return list(self._categorias[col])
+
+    def _calcular_rango(self, col, minimo, maximo):
+        valores, orden = self._ordenados[col]
+        inicio = np.searchsorted(valores, minimo, side='left')
+        fin = np.searchsorted(valores, maximo, side='right')
+        mascara = np.zeros(self.n, dtype=bool)
+        mascara[orden[inicio:fin]] = True
+        return np.packbits(mascara)
+
+    def _bitmap_categoria(self, col, valores):
+        bitmaps = self._categorias[col]
+        resultado = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        for v in valores:
+            if v in bitmaps:
+                resultado |= bitmaps[v]
+        return resultado
+
+    def _calcular_interseccion(self, claves):
+        resultado = None
+        for clave in claves:
+            if clave[0] == 'rango':
+                bitmap = self._bitmap_rango(*clave[1:])
+            else:
+                bitmap = self._bitmap_categoria(*clave[1:])
+            resultado = bitmap if resultado is None else resultado & bitmap
+        if resultado is None:
+            resultado = np.packbits(np.ones(self.n, dtype=bool))
+        resultado.flags.writeable = False
+        return resultado
+
+    def _claves(self, rangos, categorias):
+        claves = [('rango', col, float(lo), float(hi)) for col, (lo, hi) in (rangos or {}).items()]
+        claves += [('categoria', col, tuple(sorted(v))) for col, v in (categorias or {}).items()]
+        # Orden canónico: la misma combinación de filtros reutiliza la caché
+        return tuple(sorted(claves))
+
+    def mascara(self, rangos=None, categorias=None):
+        """
+        Máscara booleana de los clientes que cumplen todos los filtros.
+
+        Parámetros:
+        - rangos: dict {columna: (mínimo, máximo)}, ambos incluidos.
+        - categorias: dict {columna: lista de valores admitidos}.
+        """
+        bitmap = self._interseccion(self._claves(rangos, categorias))
+        return np.unpackbits(bitmap, count=self.n).astype(bool)
+
+    def contar(self, rangos=None, categorias=None):
+        """Número de clientes del segmento sin materializar la selección."""
+        bitmap = self._interseccion(self._claves(rangos, categorias))
+        return int(np.unpackbits(bitmap, count=self.n).sum())
+
+    def filtrar(self, rangos=None, categorias=None):
+        """Filas del DataFrame original que cumplen todos los filtros."""
+        return self.df[self.mascara(rangos, categorias)]
+
+    def limpiar_cache(self):
+        self._bitmap_rango.cache_clear()
+        self._interseccion.cache_clear()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+CUBETA_CERO = np.iinfo(np.int32).min
+
+
+def cubeta_log(valores, gamma):
+    """
+    Asigna cada valor a una cubeta logarítmica de razón gamma (estilo DDSketch).
+    Los ceros van a la cubeta especial CUBETA_CERO; los valores negativos no se admiten.
+    """
+    valores = np.asarray(valores, dtype=float)
+    if (valores < 0).any():
+        raise ValueError("El sketch solo admite valores no negativos (duraciones, conteos...).")
+    cubetas = np.full(len(valores), CUBETA_CERO, dtype=np.int32)
+    positivos = valores > 0
+    cubetas[positivos] = np.ceil(np.log(valores[positivos]) / np.log(gamma)).astype(np.int32)
+    return cubetas
+
+
+def valor_cubeta(cubetas, gamma):
+    """Valor representativo de cada cubeta: su error relativo es como mucho (gamma - 1) / (gamma + 1)."""
+    cubetas = np.asarray(cubetas)
+    valores = 2 * gamma ** cubetas.astype(float) / (gamma + 1)
+    return np.where(cubetas == CUBETA_CERO, 0.0, valores)
+
+
+class SketchCuantiles:
+    """
+    Cuantiles aproximados por grupo con error relativo acotado.
+
+    El sketch es una tabla larga [group_cols..., cubeta, conteo]: se construye en una
+    sola pasada para todos los grupos y dos sketches se fusionan sumando conteos, así
+    que se puede calcular por bloques o en varios procesos y combinar al final.
+
+    Con error_relativo=0.005, un cuantil de 60 s se estima con menos de 0.3 s de error.
+    """
+
+    def __init__(self, tabla, group_cols=None, error_relativo=0.01):
+        self.tabla = tabla
+        self.group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols or [])
+        self.error_relativo = error_relativo
+        self.gamma = (1 + error_relativo) / (1 - error_relativo)
+
+    @classmethod
+    def desde_datos(cls, df, group_cols, target_col, error_relativo=0.01):
+        group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols or [])
+        gamma = (1 + error_relativo) / (1 - error_relativo)
+        valores = df[target_col]
+        validos = valores.notna().to_numpy()
+        claves = df.loc[validos, group_cols].copy()
+        claves['cubeta'] = cubeta_log(valores[validos], gamma)
+        tabla = claves.groupby(group_cols + ['cubeta'], as_index=False, observed=True).size()
+        return cls(tabla.rename(columns={'size': 'conteo'}), group_cols, error_relativo)
+
+    def fusionar(self, *otros):
+        """Devuelve un sketch nuevo con los conteos de este y de los otros sumados."""
+        for otro in otros:
+            if otro.group_cols != self.group_cols or otro.error_relativo != self.error_relativo:
+                raise ValueError("Solo se pueden fusionar sketches con los mismos grupos y error relativo.")
+        tabla = pd.concat([self.tabla] + [otro.tabla for otro in otros], ignore_index=True)
+        tabla = tabla.groupby(self.group_cols + ['cubeta'], as_index=False, observed=True)['conteo'].sum()
+        return SketchCuantiles(tabla, self.group_cols, self.error_relativo)
+
+    def _histograma(self):
+        claves = self.group_cols or [lambda _: 0]
+        hist = self.tabla.sort_values(self.group_cols + ['cubeta']).reset_index(drop=True)
+        grupos = hist.groupby(claves, observed=True)['conteo']
+        hist['acumulado'] = grupos.cumsum()
+        hist['total'] = grupos.transform('sum')
+        hist['valor'] = valor_cubeta(hist['cubeta'], self.gamma)
+        return hist, claves
+
+    def cuantiles(self, qs=(0.25, 0.5, 0.75)):
+        """
+        DataFrame con una columna por cuantil y una fila por grupo. Como la interpolación
+        lineal de pandas: se interpola entre los valores de las posiciones floor y ceil de
+        q * (n - 1), cada uno aproximado por el valor de su cubeta.
+        """
+        hist, claves = self._histograma()
+        resultado = {}
+        for q in qs:
+            posicion = q * (hist['total'] - 1)
+            bajo = np.floor(posicion)
+            alto = np.minimum(bajo + 1, hist['total'] - 1)
+            # El valor en la posición k es el de la primera cubeta cuyo acumulado supera k
+            v_bajo = hist[hist['acumulado'] > bajo].groupby(claves, observed=True)['valor'].first()
+            v_alto = hist[hist['acumulado'] > alto].groupby(claves, observed=True)['valor'].first()
+            fraccion = hist.assign(f=posicion - bajo).groupby(claves, observed=True)['f'].first()
+            resultado[q] = v_bajo + fraccion * (v_alto - v_bajo)
+        return pd.DataFrame(resultado)
+
+    def moda(self):
+        """Valor representativo de la cubeta con más observaciones de cada grupo."""
+        hist, claves = self._histograma()
+        hist = hist.sort_values('conteo', ascending=False, kind='stable')
+        return hist.groupby(claves, observed=True)['valor'].first()
+
+    def cuartiles(self):
+        """(Q1, Q3) de un sketch sin grupos, listo para filter_outliers_iqr(..., cuartiles=...)."""
+        if self.group_cols:
+            raise ValueError("cuartiles() solo aplica a sketches sin grupos; usa cuantiles().")
+        q = self.cuantiles((0.25, 0.75)).iloc[0]
+        return q[0.25], q[0.75]
@@ -0,0 +1,93 @@
+import datetime
+import json
+import os
+
+import pandas as pd
+
+from eda_insights import (
+    calcular_diferencia_tiempo,
+    calcular_kpis_iqr,
+    calcular_tasa,
+    calcular_tasa_finalizacion,
+    calcular_tiempo_total_por_cliente,
+    detectar_errores_funnel,
+    filter_outliers_iqr,
+    obtener_primera,
+    preparar_datos_web,
+)
+from stats import resumen_pruebas, tabla_clientes, tabla_eventos
+
+RUTA_RAW = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw')
+RUTA_SNAPSHOT = os.path.join(os.path.dirname(__file__), '..', 'streamlit_app', 'data', 'kpi_snapshot.json')
+
+
+def _registros(df):
+    return json.loads(df.to_json(orient='records'))
+
+
+def _sin_progreso(fraccion, mensaje):
+    pass
+
+
+def generar_snapshot(df_web_v, df_exp_cli, ruta_salida=RUTA_SNAPSHOT, progreso=None):
+    """
+    Calcula con las funciones de eda_insights los KPIs y pruebas de la página
+    "Statistics" y los guarda en un JSON compacto que la app lee sin tocar eventos.
+
+    Sigue los mismos pasos que el notebook: outliers de tiempo por paso filtrados
+    solo por arriba y outliers de tiempo total filtrados por ambos lados.
+
+    Parámetros:
+    - df_web_v: eventos web con Variation (salida de preparar_datos_web).
+    - df_exp_cli: clientes del experimento.
+    - ruta_salida: ruta del JSON (None para no guardarlo).
+    - progreso: función opcional progreso(fraccion, mensaje) llamada entre etapas (mensajes
+      en inglés, se muestran tal cual en la app).
+
+    Devuelve:
+    - Diccionario con el snapshot.
+    """
+    progreso = progreso or _sin_progreso
+    progreso(0.0, 'Computing times and errors')
+    df_web_sorted = detectar_errores_funnel(calcular_diferencia_tiempo(df_web_v))
+    df_time_clean = filter_outliers_iqr(df_web_sorted, 'time_diff_sec', lower=False, upper=True)
+    progreso(0.3, 'First-attempt success and total time')
+    _, df_merged = obtener_primera(df_web_sorted, df_exp_cli)
+    tiempo_total = filter_outliers_iqr(calcular_tiempo_total_por_cliente(df_web_sorted), 'total_time_sec')
+
+    primer_intento = df_merged.groupby('Variation')['first_attempt_success'].agg(['sum', 'size'])
+    primer_intento['tasa_%'] = primer_intento['sum'] / primer_intento['size'] * 100
+
+    progreso(0.5, 'Hypothesis tests')
+    eventos = tabla_eventos(df_web_sorted, df_tiempo=df_time_clean)
+    clientes = tabla_clientes(df_web_v, df_merged, tiempo_total)
+
+    snapshot = {
+        'generado': datetime.datetime.now().isoformat(timespec='seconds'),
+        'n_eventos': int(len(df_web_v)),
+        'tasa_finalizacion': _registros(calcular_tasa_finalizacion(df_web_v)),
+        'primer_intento': _registros(primer_intento.rename(
+            columns={'sum': 'exitos', 'size': 'clientes'}).reset_index()),
+        'tiempo_total': _registros(tiempo_total.groupby('Variation')['total_time_sec'].describe().reset_index()),
+        'kpis_tiempo_paso': _registros(calcular_kpis_iqr(df_time_clean, ['Variation', 'process_step'], 'time_diff_sec')),
+        'tasa_error': _registros(calcular_tasa(df_web_sorted, 'es_error', grupo_col='Variation', step_col='process_step')),
+        'pruebas': _registros(resumen_pruebas(eventos, clientes)),
+    }
+
+    if ruta_salida is not None:
+        progreso(0.9, 'Saving results')
+        os.makedirs(os.path.dirname(ruta_salida), exist_ok=True)
+        with open(ruta_salida, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=1)
+    progreso(1.0, 'Done')
+    return snapshot
+
+
+if __name__ == '__main__':
+    df_final_demo = pd.read_csv(os.path.join(RUTA_RAW, 'df_final_demo.txt'))
+    df_exp_cli = pd.read_csv(os.path.join(RUTA_RAW, 'df_final_experiment_clients.txt'))
+    df_web_1 = pd.read_csv(os.path.join(RUTA_RAW, 'df_final_web_data_pt_1.txt'))
+    df_web_2 = pd.read_csv(os.path.join(RUTA_RAW, 'df_final_web_data_pt_2.txt'))
+    df_web_v, _ = preparar_datos_web(df_web_1, df_web_2, df_exp_cli, df_final_demo)
+    generar_snapshot(df_web_v, df_exp_cli)
+    print(f"Snapshot guardado en {RUTA_SNAPSHOT}")
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, norm, ttest_ind_from_stats
+
+# Criterio de éxito de Vanguard: +5 puntos en la tasa de finalización
+UMBRAL_NEGOCIO = 0.05
+# Reducción mínima de la tasa de error que justifica el coste del rediseño
+DELTA_ERROR = 0.005
+
+
+def tabla_eventos(df, grupo_col='Variation', step_col='process_step', tiempo_col='time_diff_sec', df_tiempo=None):
+    """
+    Estadísticos suficientes por grupo y paso agrupando una sola vez los eventos
+    (salida de detectar_errores_funnel): registros, errores, retrocesos cero y
+    n / media / varianza de time_diff_sec.
+
+    Si se indica df_tiempo (p. ej. los eventos sin outliers de tiempo), los momentos
+    de tiempo se calculan sobre él y los conteos de error sobre df.
+    """
+    sumas = pd.DataFrame({
+        grupo_col: df[grupo_col],
+        step_col: df[step_col],
+        'n_registros': 1,
+        'n_errores': df['es_error'].astype(int),
+        'n_retroceso_cero': df['retroceso_cero'].astype(int),
+    }).groupby([grupo_col, step_col], observed=True).sum()
+
+    df_tiempo = df if df_tiempo is None else df_tiempo
+    tiempo = df_tiempo[tiempo_col]
+    momentos = pd.DataFrame({
+        grupo_col: df_tiempo[grupo_col],
+        step_col: df_tiempo[step_col],
+        'n_tiempo': tiempo.notna().astype(int),
+        'suma': tiempo.fillna(0),
+        'suma_cuadrados': tiempo.fillna(0) ** 2,
+    }).groupby([grupo_col, step_col], observed=True).sum()
+    return sumas.join(_momentos(momentos, 'n_tiempo')).reset_index()
+
+
+def tabla_clientes(df_web_v, df_merged=None, tiempo_total=None, step_objetivo='confirm',
+                   cliente_col='client_id', grupo_col='Variation'):
+    """
+    Estadísticos suficientes por grupo a nivel cliente: clientes totales y completados,
+    éxito al primer intento (df_merged de obtener_primera) y n / media / varianza del
+    tiempo total por cliente (salida de calcular_tiempo_total_por_cliente, filtrada o no).
+    """
+    clientes = df_web_v.assign(completado=df_web_v['process_step'] == step_objetivo).groupby(
+        [grupo_col, cliente_col], observed=True)['completado'].max()
+    tabla = clientes.groupby(level=0, observed=True).agg(total_clientes='size', completados='sum')
+
+    if df_merged is not None:
+        primera = df_merged.groupby(grupo_col, observed=True)['first_attempt_success'].agg(
+            evaluados_primera='size', exitos_primera='sum')
+        tabla = tabla.join(primera)
+
+    if tiempo_total is not None:
+        t = tiempo_total['total_time_sec']
+        sumas = pd.DataFrame({
+            grupo_col: tiempo_total[grupo_col],
+            'n_tiempo_total': t.notna().astype(int),
+            'suma': t.fillna(0),
+            'suma_cuadrados': t.fillna(0) ** 2,
+        }).groupby(grupo_col, observed=True).sum()
+        momentos = _momentos(sumas, 'n_tiempo_total').rename(
+            columns={'media': 'media_tiempo_total', 'varianza': 'varianza_tiempo_total'})
+        tabla = tabla.join(momentos)
+    return tabla.reset_index()
+
+
+def _momentos(sumas, col_n):
+    n = sumas[col_n]
+    sumas['media'] = sumas['suma'] / n
+    sumas['varianza'] = ((sumas['suma_cuadrados'] - n * sumas['media'] ** 2) / (n - 1)).clip(lower=0)
+    return sumas.drop(columns=['suma', 'suma_cuadrados'])
+
+
+def ztest_proporciones(e1, n1, e2, n2, alternativa='two-sided', delta=0.0):
+    """
+    Z-test de dos proporciones con varianza combinada (como proportions_ztest).
+    H1 para alternativa='larger': p1 - p2 > delta; 'smaller': p1 - p2 < delta.
+    """
+    p1, p2 = e1 / n1, e2 / n2
+    combinada = (e1 + e2) / (n1 + n2)
+    se = np.sqrt(combinada * (1 - combinada) * (1 / n1 + 1 / n2))
+    z = (p1 - p2 - delta) / se
+    if alternativa == 'larger':
+        p = norm.sf(z)
+    elif alternativa == 'smaller':
+        p = norm.cdf(z)
+    else:
+        p = 2 * norm.sf(abs(z))
+    return z, p
+
+
+def chi2_proporciones(e1, n1, e2, n2, correccion=True):
+    """
+    Chi-cuadrado de independencia sobre la tabla 2x2 [éxitos, fracasos] de dos grupos.
+    Por defecto con la corrección de Yates, como chi2_contingency en el notebook.
+    """
+    tabla = np.array([[e1, n1 - e1], [e2, n2 - e2]])
+    chi2, p, _, _ = chi2_contingency(tabla, correction=correccion)
+    return chi2, p
+
+
+def welch_desde_estadisticos(media1, var1, n1, media2, var2, n2, alternativa='two-sided'):
+    """T-test de Welch a partir de medias, varianzas muestrales y tamaños."""
+    return ttest_ind_from_stats(media1, np.sqrt(var1), n1, media2, np.sqrt(var2), n2,
+                                equal_var=False, alternative=alternativa)
+
+
+def resumen_pruebas(eventos, clientes, control='Control', test='Test', alfa=0.05,
+                    umbral=UMBRAL_NEGOCIO, delta_error=DELTA_ERROR, grupo_col='Variation', step_col='process_step'):
+    """
+    Ejecuta las pruebas del notebook a partir de tabla_eventos y tabla_clientes, sin
+    volver a los eventos.
+
+    Parámetros:
+    - eventos: salida de tabla_eventos.
+    - clientes: salida de tabla_clientes.
+    - control, test: etiquetas de los grupos.
+    - alfa: nivel de significación.
+    - umbral: mejora mínima de la tasa de finalización (criterio de negocio del 5%).
+    - delta_error: reducción mínima de la tasa de error para la prueba de efecto.
+
+    Devuelve:
+    - DataFrame con una fila por prueba: prueba, metrica, paso, valor_control, valor_test,
+      diferencia, estadistico, p_valor, significativo, supera_umbral.
+    """
+    cli = clientes.set_index(grupo_col)
+    ev = eventos.set_index([grupo_col, step_col])
+    filas = []
+
+    def agregar(prueba, metrica, paso, v_control, v_test, estadistico, p, supera=None):
+        filas.append({
+            'prueba': prueba, 'metrica': metrica, 'paso': paso,
+            'valor_control': v_control, 'valor_test': v_test, 'diferencia': v_test - v_control,
+            'estadistico': estadistico, 'p_valor': p, 'significativo': p < alfa, 'supera_umbral': supera,
+        })
+
+    # Tasa de finalización (bilateral) y criterio de negocio
+    c, t = cli.loc[control], cli.loc[test]
+    z, p = ztest_proporciones(t['completados'], t['total_clientes'], c['completados'], c['total_clientes'])
+    tc, tt = c['completados'] / c['total_clientes'], t['completados'] / t['total_clientes']
+    agregar('z-test', 'tasa_finalizacion', None, tc, tt, z, p, bool(p < alfa and tt - tc >= umbral))
+
+    # Éxito al primer intento (chi-cuadrado)
+    if 'evaluados_primera' in cli.columns:
+        chi2, p = chi2_proporciones(c['exitos_primera'], c['evaluados_primera'], t['exitos_primera'], t['evaluados_primera'])
+        agregar('chi2', 'first_attempt_success', None, c['exitos_primera'] / c['evaluados_primera'],
+                t['exitos_primera'] / t['evaluados_primera'], chi2, p)
+
+    # Tiempo total medio por cliente (H1: Control < Test)
+    if 'media_tiempo_total' in cli.columns:
+        stat, p = welch_desde_estadisticos(c['media_tiempo_total'], c['varianza_tiempo_total'], c['n_tiempo_total'],
+                                           t['media_tiempo_total'], t['varianza_tiempo_total'], t['n_tiempo_total'],
+                                           alternativa='less')
+        agregar('welch', 'tiempo_total', None, c['media_tiempo_total'], t['media_tiempo_total'], stat, p)
+
+    # Tiempo medio por paso (H1: Control > Test)
+    pasos = ev.index.get_level_values(step_col).unique()
+    for paso in pasos:
+        if (control, paso) not in ev.index or (test, paso) not in ev.index:
+            continue
+        c, t = ev.loc[(control, paso)], ev.loc[(test, paso)]
+        stat, p = welch_desde_estadisticos(c['media'], c['varianza'], c['n_tiempo'],
+                                           t['media'], t['varianza'], t['n_tiempo'], alternativa='greater')
+        agregar('welch', 'tiempo_paso', paso, c['media'], t['media'], stat, p)
+
+    # Tasa de error global y por paso (H1: Control > Test)
+    totales = ev.groupby(level=0)[['n_registros', 'n_errores']].sum()
+    c, t = totales.loc[control], totales.loc[test]
+    z, p = ztest_proporciones(c['n_errores'], c['n_registros'], t['n_errores'], t['n_registros'], 'larger')
+    tc, tt = c['n_errores'] / c['n_registros'], t['n_errores'] / t['n_registros']
+    agregar('z-test', 'tasa_error', None, tc, tt, z, p)
+    z, p = ztest_proporciones(c['n_errores'], c['n_registros'], t['n_errores'], t['n_registros'], 'larger', delta_error)
+    agregar('z-test', 'tasa_error_efecto_minimo', None, tc, tt, z, p, bool(p < alfa))
+    for paso in pasos:
+        if (control, paso) not in ev.index or (test, paso) not in ev.index:
+            continue
+        c, t = ev.loc[(control, paso)], ev.loc[(test, paso)]
+        z, p = ztest_proporciones(c['n_errores'], c['n_registros'], t['n_errores'], t['n_registros'], 'larger')
+        agregar('z-test', 'tasa_error_paso', paso, c['n_errores'] / c['n_registros'], t['n_errores'] / t['n_registros'], z, p)
+
+    # Retroceso cero en confirm (bilateral)
+    if (control, 'confirm') in ev.index and (test, 'confirm') in ev.index:
+        c, t = ev.loc[(control, 'confirm')], ev.loc[(test, 'confirm')]
+        z, p = ztest_proporciones(c['n_retroceso_cero'], c['n_registros'], t['n_retroceso_cero'], t['n_registros'])
+        agregar('z-test', 'retroceso_cero_confirm', 'confirm', c['n_retroceso_cero'] / c['n_registros'],
+                t['n_retroceso_cero'] / t['n_registros'], z, p)
+
+    return pd.DataFrame(filas)
@@ -0,0 +1,208 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from funnel import BITS_ERROR, detectar_errores_mascara, diferencia_siguiente, inicio_sesion
+from indice_clientes import COLUMNAS_EVENTO
+from ingesta import FORMATO_FECHA, RUTA_PARQUET, TIPOS_WEB
+
+
+def leer_web_en_chunks(rutas, chunksize=200_000):
+    """
+    Lee los logs web en texto por bloques de 'chunksize' filas.
+    Los .txt originales ya vienen agrupados por cliente, que es el orden que necesita
+    AcumuladorFunnel.
+    """
+    for ruta in rutas:
+        for chunk in pd.read_csv(ruta, dtype=TIPOS_WEB, chunksize=chunksize):
+            chunk['date_time'] = pd.to_datetime(chunk['date_time'], format=FORMATO_FECHA, errors='coerce')
+            yield chunk
+
+
+def leer_web_por_clientes(df_exp_cli, ruta_parquet=RUTA_PARQUET, n_bloques=20, columnas=None):
+    """
+    Lee el dataset Parquet de ingesta.convertir_raw_a_parquet en n_bloques rangos de
+    client_id de los clientes del experimento, cada bloque ordenado por cliente
+    (estable), que es el orden que necesita AcumuladorFunnel.
+
+    El dataset está particionado por día, así que filtrar cada rango de clientes
+    abriría todas las particiones una vez por bloque. En su lugar se recorre una sola
+    vez por lotes y cada lote se reparte por rango en un Parquet temporal, que luego
+    se lee de uno en uno. Coste: una lectura del dataset más una escritura y una
+    lectura de los eventos del experimento; en memoria, un lote y un bloque.
+    """
+    dataset = ds.dataset(os.path.join(ruta_parquet, 'web'), format='parquet', partitioning='hive')
+    if columnas is None:
+        columnas = [c for c in dataset.schema.names if c != 'fecha']
+    clientes = np.sort(df_exp_cli.loc[df_exp_cli['Variation'].notna(), 'client_id'].unique())
+    # Último cliente de cada rango: searchsorted da el bloque de cada evento
+    limites = np.array([rango[-1] for rango in np.array_split(clientes, n_bloques) if len(rango)])
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        escritores = {}
+        try:
+            for lote in dataset.to_batches(columns=list(columnas), filter=ds.field('client_id').isin(clientes)):
+                bloque = np.searchsorted(limites, lote.column('client_id').to_numpy())
+                orden = np.argsort(bloque, kind='stable')
+                bloques, inicios = np.unique(bloque[orden], return_index=True)
+                for b, partes in zip(bloques, np.split(orden, inicios[1:])):
+                    if b not in escritores:
+                        escritores[b] = pq.ParquetWriter(os.path.join(carpeta, f'{b}.parquet'), lote.schema)
+                    escritores[b].write_batch(lote.take(partes))
+        finally:
+            for escritor in escritores.values():
+                escritor.close()
+
+        for b in sorted(escritores):
+            bloque = pq.read_table(os.path.join(carpeta, f'{b}.parquet')).to_pandas()
+            yield bloque.sort_values('client_id', kind='stable')
+
+
+class AcumuladorFunnel:
+    """
+    Ejecuta preparar_datos_web -> calcular_diferencia_tiempo -> detectar_errores_funnel
+    -> agregados por bloques, sin tener todos los eventos en memoria.
+
+    Los bloques deben llegar agrupados por cliente: todos los eventos de un cliente
+    seguidos en la secuencia de bloques, con las fechas en cualquier orden (los .txt
+    originales están por cliente y con la fecha descendente). Entre bloques solo se
+    arrastran los eventos del último cliente del bloque, que puede continuar en el
+    siguiente; el resto de clientes se procesa completo, así que los resultados son los
+    mismos que en memoria. Si un cliente vuelve a aparecer después de otro se lanza
+    ValueError.
+
+    El estado por cliente son arrays del tamaño de la tabla de experimentos (visto,
+    completado y tiempo total), así que la memoria no crece con el número de bloques.
+    """
+
+    def __init__(self, df_exp_cli, step_objetivo='confirm'):
+        df_exp_cli = df_exp_cli[df_exp_cli['Variation'].notna()].drop_duplicates('client_id')
+        self.variaciones = df_exp_cli.set_index('client_id')['Variation']
+        self.step_objetivo = step_objetivo
+        self._pendientes = None
+        self._por_paso = None
+        n = len(self.variaciones)
+        self._visto = np.zeros(n, dtype=bool)
+        self._completado = np.zeros(n, dtype=bool)
+        self._tiempo = np.zeros(n)
+
+    def procesar(self, chunk):
+        # Unir con experimentos (inner): posición de cada cliente en la tabla de experimentos
+        cliente = self.variaciones.index.get_indexer(chunk['client_id'])
+        chunk = chunk.loc[cliente >= 0, COLUMNAS_EVENTO].assign(_cliente=cliente[cliente >= 0])
+        if self._pendientes is not None:
+            chunk = pd.concat([self._pendientes, chunk], ignore_index=True)
+        if chunk.empty:
+            self._pendientes = chunk
+            return self
+
+        codigos = chunk['_cliente'].to_numpy()
+        inicios = np.flatnonzero(inicio_sesion(codigos))
+        tramos = codigos[inicios]
+        if len(np.unique(tramos)) < len(tramos) or self._visto[tramos].any():
+            raise ValueError("Los eventos de un cliente no llegan seguidos; los bloques deben venir "
+                             "agrupados por cliente (como los .txt originales o leer_web_por_clientes).")
+
+        # El último cliente puede continuar en el bloque siguiente
+        self._procesar_clientes(chunk.iloc[:inicios[-1]])
+        self._pendientes = chunk.iloc[inicios[-1]:]
+        return self
+
+    def finalizar(self):
+        """Procesa los eventos del último cliente."""
+        if self._pendientes is not None:
+            self._procesar_clientes(self._pendientes)
+            self._pendientes = None
+        return self
+
+    def _procesar_clientes(self, datos):
+        if datos.empty:
+            return
+        datos = datos.drop_duplicates(subset=COLUMNAS_EVENTO)
+        datos, diferencia = diferencia_siguiente(datos)
+        datos['time_diff_sec'] = diferencia / np.timedelta64(1, 's')
+        mascara = detectar_errores_mascara(datos)
+
+        variacion = self.variaciones.to_numpy()[datos['_cliente'].to_numpy()]
+        tiempo = datos['time_diff_sec']
+        eventos = pd.DataFrame({
+            'Variation': pd.Series(variacion, index=datos.index).astype(object),
+            'process_step': datos['process_step'].astype(object),
+            'total_registros': 1,
+            'n_errores': mascara != 0,
+            **{nombre: (mascara & bit) != 0 for nombre, bit in BITS_ERROR.items()},
+            'n_tiempo': tiempo.notna(),
+            'suma_tiempo': tiempo.fillna(0),
+            'suma_cuadrados': tiempo.fillna(0) ** 2,
+        })
+        por_paso = eventos.groupby(['Variation', 'process_step']).sum()
+        self._por_paso = por_paso if self._por_paso is None else self._por_paso.add(por_paso, fill_value=0)
+
+        # Cada cliente llega completo: su fila se escribe una sola vez
+        clientes = pd.DataFrame({
+            'completado': (datos['process_step'] == self.step_objetivo).to_numpy(),
+            'total_time_sec': tiempo,
+        }).groupby(datos['_cliente'].to_numpy()).agg({'completado': 'max', 'total_time_sec': 'sum'})
+        posicion = clientes.index.to_numpy()
+        self._visto[posicion] = True
+        self._completado[posicion] = clientes['completado'].to_numpy()
+        self._tiempo[posicion] = clientes['total_time_sec'].to_numpy()
+
+    def tasa_finalizacion(self):
+        """Mismo formato que calcular_tasa_finalizacion."""
+        visto = self._visto
+        resumen = pd.DataFrame({
+            'Variation': self.variaciones.iloc[visto].reset_index(drop=True),
+            'completado': self._completado[visto],
+        }).groupby('Variation', observed=True).agg(
+            clientes_completados=('completado', 'sum'),
+            total_clientes=('completado', 'size'),
+        )
+        # Grupos sin clientes completados: NaN y al final, como calcular_tasa_finalizacion
+        completados = resumen['clientes_completados']
+        if (completados == 0).any():
+            resumen['clientes_completados'] = completados.where(completados > 0)
+            resumen = pd.concat([resumen[completados > 0], resumen[completados == 0]])
+        resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
+        return resumen.round(2).reset_index()
+
+    def tiempo_total_por_cliente(self):
+        """Mismo formato que calcular_tiempo_total_por_cliente."""
+        visto = self._visto
+        return pd.DataFrame({
+            'client_id': self.variaciones.index[visto],
+            'Variation': self.variaciones.iloc[visto].reset_index(drop=True),
+            'total_time_sec': self._tiempo[visto],
+        }).sort_values(['client_id', 'Variation'], ignore_index=True)
+
+    def tasa_errores(self, evento_col='n_errores'):
+        """Mismo formato que calcular_tasa(df, 'es_error', 'Variation', 'process_step')."""
+        tasa = self._por_paso[['total_registros', evento_col]].rename(columns={evento_col: 'n_eventos'})
+        tasa['tasa_%'] = (tasa['n_eventos'] / tasa['total_registros']) * 100
+        return tasa.reset_index().sort_values(['Variation', 'process_step'])
+
+    def tiempos_por_paso(self):
+        """Número de diferencias, media y desviación típica de time_diff_sec por Variation y paso."""
+        n = self._por_paso['n_tiempo']
+        media = self._por_paso['suma_tiempo'] / n
+        varianza = (self._por_paso['suma_cuadrados'] - n * media ** 2) / (n - 1)
+        return pd.DataFrame({
+            'n': n,
+            'media': media,
+            'desviacion': np.sqrt(varianza.clip(lower=0)),
+        }).reset_index()
+
+
+def procesar_funnel_en_chunks(chunks, df_exp_cli, step_objetivo='confirm'):
+    """
+    Recorre un iterable de bloques de eventos web agrupados por cliente (por ejemplo
+    leer_web_en_chunks o leer_web_por_clientes) y devuelve el AcumuladorFunnel ya finalizado.
+    """
+    acumulador = AcumuladorFunnel(df_exp_cli, step_objetivo=step_objetivo)
+    for chunk in chunks:
+        acumulador.procesar(chunk)
+    return acumulador.finalizar()
@@ -6,18 +6,161 @@ import pydeck as pdk
 import altair as alt
 import numpy as np
 import datetime
-import zipfile
 import base64
-import io
 import os
+import sys
+
+from artefactos import construir_artefacto
+from datos import bytes_fichero, cargar, cargar_snapshot, recurso_derivado
+
+# Funciones de análisis del proyecto (src/), igual que en el notebook
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from eda_insights import limpiar_df_clientes
+from segmentos import IndiceSegmentos
+from trabajos import lanzar_analisis, obtener_trabajo
 
 # Para ejecutar, primero en la terminal: pip install -r requirements.txt
 # Después: streamlit run app.py
 
 
 # Cargar datos necesarios para el apartado de Statistics
+snapshot = cargar_snapshot()
+
+
+# Índice de segmentación sobre la tabla de clientes (se construye una vez por versión de los datos)
+def construir_indice_segmentos():
+    clientes = limpiar_df_clientes(cargar("raw/df_final_demo.txt"))
+    variacion = cargar("raw/df_final_experiment_clients.txt")
+    clientes = clientes.merge(variacion, on="client_id", how="left")
+    # Los clientes fuera del experimento quedan con Variation nula (o "NA" literal en el
+    # CSV): se les da una categoría propia para que se puedan seleccionar y el total sume el 100%
+    clientes["Variation"] = clientes["Variation"].fillna("Unassigned").replace("NA", "Unassigned")
+    return IndiceSegmentos(clientes)
+
+
+def rango_inicial(preferido, minimo, maximo):
+    # Rango por defecto de un slider acotado a los límites reales de la columna
+    return tuple(min(max(v, minimo), maximo) for v in preferido)
+
+
+# Progreso de un análisis en segundo plano: solo este fragmento se vuelve a ejecutar
+# cada medio segundo; al terminar se relanza la página entera para mostrar el resultado
+@st.fragment(run_every=0.5)
+def progreso_analisis(trabajo):
+    if trabajo.terminado():
+        st.rerun()
+    st.progress(trabajo.progreso, text=trabajo.mensaje)
+
+
+# Nombres legibles de las métricas de resumen_pruebas
+NOMBRES_METRICAS = {
+    "tasa_finalizacion": "Completion rate",
+    "first_attempt_success": "First-time completion",
+    "tiempo_total": "Total time per client",
+    "tiempo_paso": "Time per step",
+    "tasa_error": "Error rate",
+    "tasa_error_efecto_minimo": "Error rate (minimum effect)",
+    "tasa_error_paso": "Error rate per step",
+    "retroceso_cero_confirm": "Zero-time backtrack at confirm",
+}
+
+
+# Gráficos y pruebas de un snapshot de KPIs (el precalculado o el de un análisis subido)
+def mostrar_snapshot(snapshot):
+    st.caption(f"Snapshot generated on {snapshot['generado']} from {snapshot['n_eventos']:,} web events.")
+    pruebas = pd.DataFrame(snapshot["pruebas"])
+    colores = alt.Scale(domain=["Control", "Test"], range=["#9ecae1", "#08519c"])
+
+    def tabla_pruebas(metricas):
+        # Resultados de las pruebas de hipótesis de las métricas indicadas
+        # Se conserva la métrica (con nombre legible) para distinguir filas de la misma pestaña
+        tabla = pruebas[pruebas["metrica"].isin(metricas)]
+        tabla = tabla.assign(metrica=tabla["metrica"].map(NOMBRES_METRICAS).fillna(tabla["metrica"]))
+        st.dataframe(
+            tabla.style.format({
+                "valor_control": "{:.4f}", "valor_test": "{:.4f}", "diferencia": "{:+.4f}",
+                "estadistico": "{:.3f}", "p_valor": "{:.4g}",
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
 
-
+    def metricas_grupo(df, columna, formato):
+        # Una st.metric por grupo; Test muestra la diferencia respecto a Control
+        valores = df.set_index("Variation")[columna]
+        col_c, col_t = st.columns(2)
+        col_c.metric("Control", formato.format(valores["Control"]))
+        col_t.metric("Test", formato.format(valores["Test"]),
+                     delta=formato.format(valores["Test"] - valores["Control"]))
+
+    stat_tabs = st.tabs(["Completion Rate", "First-Time Completion", "Time Invested", "Error Rate"])
+
+    with stat_tabs[0]:
+        st.markdown("#### Completion Rate")
+        finalizacion = pd.DataFrame(snapshot["tasa_finalizacion"])
+        metricas_grupo(finalizacion, "tasa_%", "{:.2f}%")
+        st.altair_chart(
+            alt.Chart(finalizacion).mark_bar().encode(
+                x=alt.X("Variation:N", title=None),
+                y=alt.Y("tasa_%:Q", title="Completion rate (%)"),
+                color=alt.Color("Variation:N", scale=colores, legend=None),
+                tooltip=["Variation", "clientes_completados", "total_clientes", "tasa_%"],
+            ),
+            use_container_width=True,
+        )
+        tabla_pruebas(["tasa_finalizacion"])
+
+    with stat_tabs[1]:
+        st.markdown("#### First-Time Completion")
+        primer_intento = pd.DataFrame(snapshot["primer_intento"])
+        metricas_grupo(primer_intento, "tasa_%", "{:.2f}%")
+        st.altair_chart(
+            alt.Chart(primer_intento).mark_bar().encode(
+                x=alt.X("Variation:N", title=None),
+                y=alt.Y("tasa_%:Q", title="First-attempt success (%)"),
+                color=alt.Color("Variation:N", scale=colores, legend=None),
+                tooltip=["Variation", "exitos", "clientes", "tasa_%"],
+            ),
+            use_container_width=True,
+        )
+        tabla_pruebas(["first_attempt_success"])
+
+    with stat_tabs[2]:
+        st.markdown("#### Time Invested")
+        tiempo_total = pd.DataFrame(snapshot["tiempo_total"])
+        metricas_grupo(tiempo_total, "mean", "{:.0f} s")
+        kpis_tiempo = pd.DataFrame(snapshot["kpis_tiempo_paso"])
+        st.altair_chart(
+            alt.Chart(kpis_tiempo).mark_bar().encode(
+                x=alt.X("process_step:N", title="Step"),
+                xOffset="Variation:N",
+                y=alt.Y("median:Q", title="Median time per step (s)"),
+                color=alt.Color("Variation:N", scale=colores),
+                tooltip=["Variation", "process_step", "median", "mode", "IQR"],
+            ),
+            use_container_width=True,
+        )
+        tabla_pruebas(["tiempo_total", "tiempo_paso"])
+
+    with stat_tabs[3]:
+        st.markdown("#### Error Rate")
+        tasa_error = pd.DataFrame(snapshot["tasa_error"])
+        global_error = pruebas[pruebas["metrica"] == "tasa_error"].iloc[0]
+        col_c, col_t = st.columns(2)
+        col_c.metric("Control", f"{global_error['valor_control']:.2%}")
+        col_t.metric("Test", f"{global_error['valor_test']:.2%}",
+                     delta=f"{global_error['diferencia']:+.2%}", delta_color="inverse")
+        st.altair_chart(
+            alt.Chart(tasa_error).mark_bar().encode(
+                x=alt.X("process_step:N", title="Step"),
+                xOffset="Variation:N",
+                y=alt.Y("tasa_%:Q", title="Error rate (%)"),
+                color=alt.Color("Variation:N", scale=colores),
+                tooltip=["Variation", "process_step", "tasa_%"],
+            ),
+            use_container_width=True,
+        )
+        tabla_pruebas(["tasa_error", "tasa_error_efecto_minimo", "tasa_error_paso", "retroceso_cero_confirm"])
 
 
 # Configuración de la Página
@@ -554,6 +697,12 @@ Control had an error rate of **0.19%**, while Test reduced this to **0.07%**, in
 elif st.session_state.current_page_key == "Statistics":
     st.title("Statistics")
 
+    if snapshot is None:
+        st.info("No KPI snapshot found. Generate it with: `python src/snapshot.py`")
+    else:
+        mostrar_snapshot(snapshot)
+
+
 elif st.session_state.current_page_key == "ML/DP":
     st.title("ML / Deep Learning")
     
@@ -631,8 +780,7 @@ elif st.session_state.current_page_key == "Downloads & Resources":
 
     if lang == "English":
         report_path = os.path.join(report_base, "Executive_Summary_EN.pdf")
-        with open(report_path, "rb") as f:
-            pdf_bytes = f.read()
+        pdf_bytes = bytes_fichero(report_path)
         st.download_button(
             label="📥 Download Executive Summary (English)",
             data=pdf_bytes,
@@ -641,8 +789,7 @@ elif st.session_state.current_page_key == "Downloads & Resources":
         )
     else:
         report_path = os.path.join(report_base, "Executive_Summary_ES.pdf")
-        with open(report_path, "rb") as f:
-            pdf_bytes = f.read()
+        pdf_bytes = bytes_fichero(report_path)
         st.download_button(
             label="📥 Descargar Resumen Ejecutivo (Español)",
             data=pdf_bytes,
@@ -662,20 +809,8 @@ elif st.session_state.current_page_key == "Downloads & Resources":
         """
     )
 
-    # Helper para comprimir cualquier carpeta en memoria
-    def zip_folder_to_bytes(folder_path):
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, start=folder_path)
-                    z.write(file_path, arcname=arcname)
-        buffer.seek(0)
-        return buffer.read()
-
-    # Raw data
-    raw_zip = zip_folder_to_bytes(os.path.join("data", "raw"))
+    # Los ZIP se generan una vez por versión de los datos (python artefactos.py) y se sirven desde caché
+    raw_zip = bytes_fichero(construir_artefacto("raw"))
     st.download_button(
         label="📥 Download Raw Data (ZIP)",
         data=raw_zip,
@@ -684,7 +819,7 @@ elif st.session_state.current_page_key == "Downloads & Resources":
     )
 
     # Processed data
-    processed_zip = zip_folder_to_bytes(os.path.join("data", "processed"))
+    processed_zip = bytes_fichero(construir_artefacto("processed"))
     st.download_button(
         label="📥 Download Processed Data (ZIP)",
         data=processed_zip,
@@ -703,6 +838,79 @@ elif st.session_state.current_page_key == "Downloads & Resources":
 elif st.session_state.current_page_key == "Load & Quick EDA":
     st.title("Load & Quick EDA")
 
+    indice = recurso_derivado(
+        "indice_segmentos", construir_indice_segmentos,
+        ["raw/df_final_demo.txt", "raw/df_final_experiment_clients.txt"],
+    )
+
+    st.subheader("Segment drill-down")
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        edad_min, edad_max = indice.limites("clnt_age")
+        edad_min, edad_max = int(edad_min), int(np.ceil(edad_max))
+        edad = st.slider("Age", edad_min, edad_max, rango_inicial((30, 60), edad_min, edad_max))
+        tenure_min, tenure_max = indice.limites("clnt_tenure_mnth")
+        tenure_min, tenure_max = int(tenure_min), int(tenure_max)
+        tenure = st.slider("Tenure (months)", tenure_min, tenure_max,
+                           rango_inicial((50, 200), tenure_min, tenure_max))
+        bal_min, bal_max = indice.limites("bal")
+        bal_min, bal_max = int(bal_min), int(np.ceil(bal_max))
+        bal = st.slider("Balance", bal_min, bal_max, rango_inicial((30000, 110000), bal_min, bal_max), step=1000)
+    with col_f2:
+        generos = st.multiselect("Gender", sorted(indice.valores("gendr")), default=sorted(indice.valores("gendr")))
+        variaciones = st.multiselect("Variation", sorted(indice.valores("Variation")),
+                                     default=sorted(indice.valores("Variation")))
+
+    segmento = indice.filtrar(
+        rangos={"clnt_age": edad, "clnt_tenure_mnth": tenure, "bal": bal},
+        categorias={"gendr": generos, "Variation": variaciones},
+    )
+
+    col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+    col_m1.metric("Clients", f"{len(segmento):,}", delta=f"{len(segmento) / indice.n:.1%} of total", delta_color="off")
+    col_m2.metric("Mean age", f"{segmento['clnt_age'].mean():.1f}" if len(segmento) else "-")
+    col_m3.metric("Mean tenure (months)", f"{segmento['clnt_tenure_mnth'].mean():.0f}" if len(segmento) else "-")
+    col_m4.metric("Median balance", f"{segmento['bal'].median():,.0f}" if len(segmento) else "-")
+
+    if len(segmento):
+        reparto = segmento.groupby(["Variation", "gendr"]).size().rename("clientes").reset_index()
+        st.altair_chart(
+            alt.Chart(reparto).mark_bar().encode(
+                x=alt.X("gendr:N", title="Gender"),
+                xOffset="Variation:N",
+                y=alt.Y("clientes:Q", title="Clients"),
+                color=alt.Color("Variation:N", scale=alt.Scale(domain=["Control", "Test"], range=["#9ecae1", "#08519c"])),
+                tooltip=["Variation", "gendr", "clientes"],
+            ),
+            use_container_width=True,
+        )
+        st.dataframe(segmento.head(1000), hide_index=True, use_container_width=True)
+
+    st.divider()
+    st.subheader("Analyze your own export")
+    st.markdown("Upload web logs, experiment clients and demographics (CSV) to run the full pipeline in the background.")
+    col_u1, col_u2, col_u3 = st.columns(3)
+    subida_web = col_u1.file_uploader("Web logs", type=["csv", "txt"], accept_multiple_files=True)
+    subida_exp = col_u2.file_uploader("Experiment clients", type=["csv", "txt"])
+    subida_demo = col_u3.file_uploader("Demographics", type=["csv", "txt"])
+
+    if st.button("Run analysis", disabled=not (subida_web and subida_exp and subida_demo)):
+        trabajo = lanzar_analisis({
+            "web": [f.getvalue() for f in subida_web],
+            "experimento": [subida_exp.getvalue()],
+            "demo": [subida_demo.getvalue()],
+        })
+        st.session_state.clave_analisis = trabajo.clave
+
+    trabajo = obtener_trabajo(st.session_state.get("clave_analisis"))
+    if trabajo is not None:
+        if not trabajo.terminado():
+            progreso_analisis(trabajo)
+        elif trabajo.estado == "error":
+            st.error(f"The analysis failed: {trabajo.error}")
+        else:
+            mostrar_snapshot(trabajo.resultado)
+
 
 elif st.session_state.current_page_key == "Settings":
     st.title("Settings")
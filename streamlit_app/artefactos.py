@@ -0,0 +1,123 @@
+import functools
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+# Paso de build: genera los ZIP de la página de descargas una sola vez, versionados
+# por el hash de su contenido. Ejecutar con: python artefactos.py
+
+RUTA_DATOS = os.path.join(os.path.dirname(__file__), "data")
+RUTA_ARTEFACTOS = os.path.join(RUTA_DATOS, "artifacts")
+
+CARPETAS = {
+    "raw": (os.path.join(RUTA_DATOS, "raw"), "vanguard_raw_data"),
+    "processed": (os.path.join(RUTA_DATOS, "processed"), "vanguard_processed_data"),
+}
+
+# Las versiones antiguas se conservan este tiempo (segundos) desde que se sustituyen
+# antes de borrarlas: otra sesión puede haber recibido su ruta y estar todavía leyéndola
+GRACIA_BORRADO = 3600
+
+# Marca junto a cada ZIP sustituido; su fecha es el inicio del periodo de gracia
+SUFIJO_RETIRADO = ".retirado"
+
+_cerrojo = threading.Lock()
+
+
+def _ficheros(carpeta):
+    rutas = []
+    for root, _, files in os.walk(carpeta):
+        for file in files:
+            rutas.append(os.path.join(root, file))
+    return sorted(rutas)
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_contenido(carpeta, firma):
+    # firma (ruta, tamaño, fecha de cada fichero) solo sirve de clave de la caché
+    sha = hashlib.sha256()
+    for ruta, _, _ in firma:
+        sha.update(os.path.relpath(ruta, carpeta).encode())
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                sha.update(bloque)
+    return sha.hexdigest()
+
+
+def hash_carpeta(carpeta):
+    """Hash SHA-256 de nombres y contenido de una carpeta; solo relee si algún fichero cambia."""
+    firma = tuple((ruta, os.stat(ruta).st_size, os.stat(ruta).st_mtime_ns) for ruta in _ficheros(carpeta))
+    return _hash_contenido(carpeta, firma)
+
+
+def construir_artefacto(clave):
+    """
+    Devuelve la ruta del ZIP de CARPETAS[clave] para el contenido actual, creándolo
+    solo si no existe. En cada llamada (build o carga de página) se eliminan las
+    versiones anteriores del mismo ZIP que llevan más de GRACIA_BORRADO segundos sustituidas.
+    """
+    carpeta, base = CARPETAS[clave]
+    version = hash_carpeta(carpeta)[:12]
+    ruta_zip = os.path.join(RUTA_ARTEFACTOS, f"{base}-{version}.zip")
+    if not os.path.exists(ruta_zip):
+        with _cerrojo:
+            if not os.path.exists(ruta_zip):
+                os.makedirs(RUTA_ARTEFACTOS, exist_ok=True)
+                # Temporal propio de esta escritura: otro proceso puede estar generando el mismo ZIP
+                descriptor, temporal = tempfile.mkstemp(dir=RUTA_ARTEFACTOS, suffix=".zip.tmp")
+                os.close(descriptor)
+                try:
+                    with zipfile.ZipFile(temporal, "w", zipfile.ZIP_DEFLATED) as z:
+                        for ruta in _ficheros(carpeta):
+                            z.write(ruta, arcname=os.path.relpath(ruta, start=carpeta))
+                    os.replace(temporal, ruta_zip)
+                except BaseException:
+                    os.remove(temporal)
+                    raise
+    _reactivar(ruta_zip)
+    _borrar_antiguos(base, ruta_zip)
+    return ruta_zip
+
+
+def _reactivar(ruta_zip):
+    # Una versión que vuelve a ser la actual (los datos han vuelto a un contenido anterior)
+    # deja de estar sustituida
+    try:
+        os.remove(ruta_zip + SUFIJO_RETIRADO)
+    except FileNotFoundError:
+        pass
+
+
+def _borrar_antiguos(base, ruta_actual):
+    limite = time.time() - GRACIA_BORRADO
+    for antiguo in glob.glob(os.path.join(RUTA_ARTEFACTOS, f"{base}-*.zip")):
+        if antiguo == ruta_actual:
+            continue
+        marca = antiguo + SUFIJO_RETIRADO
+        try:
+            # La primera vez que se ve sustituido se crea la marca (O_EXCL: sin renovar su fecha)
+            os.close(os.open(marca, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            continue
+        except FileExistsError:
+            pass
+        try:
+            if os.path.getmtime(marca) < limite:
+                os.remove(antiguo)
+                os.remove(marca)
+        except FileNotFoundError:
+            # Ya lo ha borrado otro proceso
+            pass
+
+
+def construir_todos():
+    """Genera (o reutiliza) todos los ZIP y poda las versiones caducadas; es el paso de deploy."""
+    return {clave: construir_artefacto(clave) for clave in CARPETAS}
+
+
+if __name__ == "__main__":
+    for clave, ruta in construir_todos().items():
+        print(f"{clave}: {ruta}")
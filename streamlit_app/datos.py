@@ -0,0 +1,152 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import streamlit as st
+
+# Acceso a datos de la app: cada CSV se convierte una vez a Parquet, se lee con
+# memory map una sola vez por proceso y se comparte entre todas las sesiones.
+
+RUTA_DATOS = os.path.join(os.path.dirname(__file__), "data")
+RUTA_CACHE = os.path.join(RUTA_DATOS, "cache")
+# Generado con: python src/snapshot.py
+RUTA_SNAPSHOT = os.path.join(RUTA_DATOS, "kpi_snapshot.json")
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_contenido(ruta, tamano, modificado):
+    # tamano y modificado solo forman parte de la clave: si el fichero cambia, se recalcula
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def huella(ruta):
+    """Hash SHA-256 del contenido del fichero (solo se relee si cambian su tamaño o fecha)."""
+    info = os.stat(ruta)
+    return _hash_contenido(ruta, info.st_size, info.st_mtime_ns)
+
+
+def ruta_dataset(nombre):
+    return os.path.join(RUTA_DATOS, nombre)
+
+
+def _ruta_parquet(ruta_csv, hash_csv):
+    base = os.path.splitext(os.path.basename(ruta_csv))[0]
+    return os.path.join(RUTA_CACHE, f"{base}-{hash_csv[:12]}.parquet")
+
+
+@st.cache_resource(show_spinner=False)
+def _tabla(ruta_csv, hash_csv):
+    ruta_parquet = _ruta_parquet(ruta_csv, hash_csv)
+    if not os.path.exists(ruta_parquet):
+        os.makedirs(RUTA_CACHE, exist_ok=True)
+        # Temporal propio de esta escritura: varias sesiones o procesos pueden convertir
+        # el mismo CSV a la vez; os.replace deja siempre un Parquet completo
+        descriptor, temporal = tempfile.mkstemp(dir=RUTA_CACHE, suffix=".parquet.tmp")
+        os.close(descriptor)
+        try:
+            pq.write_table(pacsv.read_csv(ruta_csv), temporal)
+            os.replace(temporal, ruta_parquet)
+        except BaseException:
+            os.remove(temporal)
+            raise
+    return pq.read_table(ruta_parquet, memory_map=True)
+
+
+@st.cache_resource(show_spinner=False)
+def _dataframe(ruta_csv, hash_csv, columnas):
+    tabla = _tabla(ruta_csv, hash_csv)
+    if columnas is not None:
+        tabla = tabla.select(list(columnas))
+    return tabla.to_pandas()
+
+
+def cargar(nombre, columnas=None):
+    """
+    Devuelve el dataset como DataFrame, cargado una sola vez por proceso y compartido
+    entre sesiones. Es de solo lectura: haz .copy() antes de modificarlo.
+
+    Parámetros:
+    - nombre: ruta del fichero dentro de data/ (p. ej. "raw/df_final_demo.txt").
+    - columnas: lista de columnas a leer; el resto no se convierte a pandas.
+    """
+    ruta = ruta_dataset(nombre)
+    return _dataframe(ruta, huella(ruta), tuple(columnas) if columnas is not None else None)
+
+
+@st.cache_data(show_spinner=False)
+def _derivada(nombre, huellas, _funcion):
+    return _funcion()
+
+
+def tabla_derivada(nombre, funcion, datasets):
+    """
+    Calcula y cachea una tabla de KPIs derivada de uno o varios datasets.
+    La caché se invalida sola cuando cambia el hash de cualquiera de ellos.
+
+    Parámetros:
+    - nombre: identificador único de la tabla.
+    - funcion: función sin argumentos que calcula la tabla (normalmente usando cargar()).
+    - datasets: rutas dentro de data/ de los ficheros de los que depende.
+    """
+    huellas = tuple(huella(ruta_dataset(d)) for d in datasets)
+    return _derivada(nombre, huellas, funcion)
+
+
+@st.cache_resource(show_spinner=False)
+def _recurso(nombre, huellas, _funcion):
+    return _funcion()
+
+
+def recurso_derivado(nombre, funcion, datasets):
+    """
+    Como tabla_derivada, pero para objetos que no se copian entre sesiones (índices,
+    modelos...): se construyen una vez por proceso y versión de los datasets.
+    """
+    huellas = tuple(huella(ruta_dataset(d)) for d in datasets)
+    return _recurso(nombre, huellas, funcion)
+
+
+def invalidar():
+    """Vacía todas las cachés de datos (p. ej. tras sustituir los CSV)."""
+    _hash_contenido.cache_clear()
+    _tabla.clear()
+    _dataframe.clear()
+    _derivada.clear()
+    _recurso.clear()
+    _bytes.clear()
+    _snapshot.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def _bytes(ruta, hash_fichero):
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def bytes_fichero(ruta):
+    """Contenido de un fichero (PDF, ZIP...) leído una vez por proceso y por versión."""
+    return _bytes(ruta, huella(ruta))
+
+
+@st.cache_data(show_spinner=False)
+def _snapshot(ruta, hash_fichero):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cargar_snapshot(ruta=RUTA_SNAPSHOT):
+    """
+    Snapshot de KPIs y pruebas de la página Statistics (salida de src/snapshot.py),
+    o None si todavía no se ha generado.
+    """
+    if not os.path.exists(ruta):
+        return None
+    return _snapshot(ruta, huella(ruta))
@@ -0,0 +1,155 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from eda_insights import preparar_datos_web
+from snapshot import generar_snapshot
+
+# Análisis de ficheros subidos en segundo plano: el script de Streamlit solo lanza el
+# trabajo y consulta su progreso; el pipeline corre en un pool de hilos compartido por
+# todas las sesiones. Los resultados se guardan por hash de los ficheros subidos.
+
+RUTA_ANALISIS = os.path.join(os.path.dirname(__file__), "data", "cache", "analisis")
+MAX_TRABAJOS = 2
+# Trabajos terminados que se mantienen en memoria; los más antiguos se descartan
+# (su resultado sigue en disco y se vuelve a leer si se piden)
+MAX_REGISTRO = 32
+
+
+class Trabajo:
+    """Estado de un análisis: pendiente, en_curso, terminado o error."""
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.estado = "pendiente"
+        self.progreso = 0.0
+        self.mensaje = "Queued"
+        self.resultado = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def actualizar(self, fraccion, mensaje):
+        with self._lock:
+            self.progreso, self.mensaje = fraccion, mensaje
+
+    def terminado(self):
+        return self.estado in ("terminado", "error")
+
+
+@st.cache_resource(show_spinner=False)
+def _pool():
+    return ThreadPoolExecutor(max_workers=MAX_TRABAJOS, thread_name_prefix="analisis")
+
+
+@st.cache_resource(show_spinner=False)
+def _registro():
+    # {clave: Trabajo}, compartido entre sesiones
+    return {}, threading.Lock()
+
+
+def clave_ficheros(ficheros):
+    """Hash SHA-256 del contenido de los ficheros subidos ({rol: [bytes, ...]})."""
+    sha = hashlib.sha256()
+    for rol in sorted(ficheros):
+        for contenido in ficheros[rol]:
+            sha.update(rol.encode())
+            sha.update(hashlib.sha256(contenido).digest())
+    return sha.hexdigest()
+
+
+def _ruta_resultado(clave):
+    return os.path.join(RUTA_ANALISIS, f"{clave[:16]}.json")
+
+
+def _leer_csv(contenidos):
+    return pd.concat([pd.read_csv(io.BytesIO(c)) for c in contenidos], ignore_index=True)
+
+
+def _ejecutar(trabajo, ficheros):
+    trabajo.estado = "en_curso"
+    try:
+        trabajo.actualizar(0.0, "Reading files")
+        df_web = _leer_csv(ficheros["web"])
+        df_exp_cli = _leer_csv(ficheros["experimento"])
+        df_final_demo = _leer_csv(ficheros["demo"])
+
+        trabajo.actualizar(0.1, "Preparing web data")
+        df_web_v, _ = preparar_datos_web(df_web, None, df_exp_cli, df_final_demo)
+
+        # generar_snapshot informa de 0 a 1; se reescala a la parte restante del trabajo
+        trabajo.resultado = generar_snapshot(
+            df_web_v, df_exp_cli, _ruta_resultado(trabajo.clave),
+            progreso=lambda f, m: trabajo.actualizar(0.2 + 0.8 * f, m),
+        )
+        trabajo.estado = "terminado"
+    except Exception as e:
+        trabajo.error = f"{type(e).__name__}: {e}"
+        trabajo.estado = "error"
+
+
+def _desde_disco(clave):
+    # Trabajo terminado a partir de un resultado ya guardado, o None si no existe
+    ruta = _ruta_resultado(clave)
+    if not os.path.exists(ruta):
+        return None
+    trabajo = Trabajo(clave)
+    with open(ruta, encoding="utf-8") as f:
+        trabajo.resultado = json.load(f)
+    trabajo.actualizar(1.0, "Done")
+    trabajo.estado = "terminado"
+    return trabajo
+
+
+def _recortar(trabajos):
+    # Descarta los trabajos terminados menos recientes por encima de MAX_REGISTRO
+    # (el dict mantiene el orden de uso); los que siguen en curso nunca se tocan
+    sobrantes = len(trabajos) - MAX_REGISTRO
+    for clave in [c for c, t in trabajos.items() if t.terminado()]:
+        if sobrantes <= 0:
+            break
+        del trabajos[clave]
+        sobrantes -= 1
+
+
+def lanzar_analisis(ficheros):
+    """
+    Lanza (o reutiliza) el análisis de unos ficheros subidos y devuelve su Trabajo.
+
+    Parámetros:
+    - ficheros: dict con listas de bytes CSV para 'web', 'experimento' y 'demo'.
+
+    Devuelve:
+    - Trabajo; si ya se analizaron los mismos ficheros, llega terminado al instante.
+    """
+    clave = clave_ficheros(ficheros)
+    trabajos, lock = _registro()
+    with lock:
+        if clave in trabajos and trabajos[clave].estado != "error":
+            # Se mueve al final para que sea el último en descartarse
+            trabajos[clave] = trabajo = trabajos.pop(clave)
+            return trabajo
+        trabajos.pop(clave, None)
+
+        trabajo = _desde_disco(clave)
+        if trabajo is None:
+            trabajo = Trabajo(clave)
+            _pool().submit(_ejecutar, trabajo, ficheros)
+        trabajos[clave] = trabajo
+        _recortar(trabajos)
+    return trabajo
+
+
+def obtener_trabajo(clave):
+    """Trabajo de una clave: el del registro o, si ya se descartó, el resultado guardado en disco."""
+    if clave is None:
+        return None
+    trabajos, lock = _registro()
+    with lock:
+        trabajo = trabajos.get(clave)
+    return trabajo if trabajo is not None else _desde_disco(clave)
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [os.path.join(RAIZ, 'src'), os.path.join(RAIZ, 'benchmarks'), os.path.join(RAIZ, 'streamlit_app')]
+
+from generador import generar_logs
+
+
+@pytest.fixture(scope='session')
+def logs():
+    """Logs sintéticos pequeños (df_web con date_time como texto, df_exp_cli, df_final_demo)."""
+    return generar_logs(n_clientes=3000, semilla=7)
+
+
+@pytest.fixture
+def carpeta_raw(tmp_path, logs):
+    """Los logs escritos como los .txt originales (web en dos partes, Variation ausente como 'NA')."""
+    df_web, df_exp_cli, df_final_demo = logs
+    mitad = len(df_web) // 2
+    df_web.iloc[:mitad].to_csv(tmp_path / 'df_final_web_data_pt_1.txt', index=False)
+    df_web.iloc[mitad:].to_csv(tmp_path / 'df_final_web_data_pt_2.txt', index=False)
+    df_exp_cli.to_csv(tmp_path / 'df_final_experiment_clients.txt', index=False, na_rep='NA')
+    df_final_demo.to_csv(tmp_path / 'df_final_demo.txt', index=False)
+    return tmp_path
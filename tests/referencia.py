@@ -0,0 +1,64 @@
+import pandas as pd
+
+# Versiones originales (pandas eager) de las funciones de eda_insights que se han
+# optimizado; los tests comprueban que las nuevas dan los mismos resultados.
+
+
+def preparar_datos_web(df_web_1, df_web_2, df_exp_cli, df_final_demo):
+    df_web = pd.concat([df_web_1, df_web_2], axis=0)
+    df_web['date_time'] = pd.to_datetime(df_web['date_time'], errors='coerce')
+    df_exp_cli = df_exp_cli[df_exp_cli["Variation"].notna()]
+    df_web_v = pd.merge(df_web, df_exp_cli, on='client_id', how='inner')
+    df_web_v = df_web_v.drop_duplicates()
+    df = pd.merge(df_final_demo, df_exp_cli, on='client_id', how='inner')
+    return df_web_v, df
+
+
+def calcular_diferencia_tiempo(df, client_col='client_id', visit_col='visit_id', time_col='date_time'):
+    df = df.sort_values(by=[client_col, visit_col, time_col]).reset_index(drop=True)
+    df['time_diff'] = df.groupby([client_col, visit_col])[time_col].shift(-1) - df[time_col]
+    df['time_diff_sec'] = df['time_diff'].dt.total_seconds()
+    return df
+
+
+def calcular_tasa_finalizacion(df, step_col='process_step', step_objetivo='confirm', cliente_col='client_id',
+                               grupo_col='Variation'):
+    completed = df[df[step_col] == step_objetivo][[cliente_col, grupo_col]].drop_duplicates()
+    total_clients = df[[cliente_col, grupo_col]].drop_duplicates().groupby(grupo_col).size().rename('total_clientes')
+    completed_clients = completed.groupby(grupo_col).size().rename('clientes_completados')
+    resumen = pd.concat([completed_clients, total_clients], axis=1)
+    resumen['tasa_%'] = (resumen['clientes_completados'] / resumen['total_clientes']) * 100
+    resumen = resumen.round(2)
+    return resumen.reset_index()
+
+
+def obtener_primera(df_web_sorted, df_exp_cli):
+    completed = df_web_sorted[df_web_sorted['process_step'] == 'confirm']['client_id'].unique()
+    df_completed_clients = df_web_sorted[df_web_sorted['client_id'].isin(completed)]
+    df_valid = df_completed_clients[
+        (df_completed_clients['es_error'] == False) &
+        (df_completed_clients['repetido_mismo_paso'] == False) &
+        (df_completed_clients['retroceso_cero'] == False) &
+        (df_completed_clients['salto_grande_atras'] == False)
+    ]
+    ruta_ideal = ['start', 'step_1', 'step_2', 'step_3', 'confirm']
+    step_sequences = df_valid.groupby('client_id')['process_step'].apply(list)
+    first_attempt_success = [seq == ruta_ideal for seq in step_sequences]
+    first_attempt_success_df = pd.DataFrame({
+        'client_id': list(step_sequences.index),
+        'first_attempt_success': first_attempt_success
+    })
+    df_merged = first_attempt_success_df.merge(df_exp_cli, on='client_id', how='inner')
+    return first_attempt_success_df, df_merged
+
+
+def calcular_kpis_iqr(df, group_cols, target_col):
+    q1 = df.groupby(group_cols)[target_col].quantile(0.25)
+    q3 = df.groupby(group_cols)[target_col].quantile(0.75)
+    iqr = q3 - q1
+    kpis = pd.DataFrame({
+        'median': df.groupby(group_cols)[target_col].median(),
+        'mode': df.groupby(group_cols)[target_col].agg(lambda x: x.mode().iloc[0]),
+        'IQR': iqr
+    })
+    return kpis.reset_index()
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from agregados import AlmacenAgregados
+
+
+@pytest.fixture
+def web_sorted(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    return E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+
+
+def _por_dias(web_sorted):
+    # Días en dos tandas, como una carga inicial y una actualización posterior
+    fecha = web_sorted['date_time'].dt.strftime('%Y-%m-%d')
+    corte = sorted(fecha.unique())[40]
+    return web_sorted[fecha < corte], web_sorted[fecha >= corte]
+
+
+def test_almacen_incremental_igual_que_en_memoria(tmp_path, web_sorted):
+    almacen = AlmacenAgregados(str(tmp_path / 'agregados'))
+    for tanda in _por_dias(web_sorted):
+        almacen.actualizar(tanda)
+
+    pd.testing.assert_frame_equal(almacen.tasa_finalizacion(), E.calcular_tasa_finalizacion(web_sorted))
+    pd.testing.assert_frame_equal(almacen.tiempo_total_por_cliente(),
+                                  E.calcular_tiempo_total_por_cliente(web_sorted), check_exact=False)
+    errores = E.calcular_tasa(web_sorted, 'es_error', 'Variation', 'process_step')
+    pd.testing.assert_frame_equal(almacen.tasa_errores().reset_index(drop=True), errores.reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_almacen_dias_repetidos(tmp_path, web_sorted):
+    almacen = AlmacenAgregados(str(tmp_path / 'agregados'))
+    primera, _ = _por_dias(web_sorted)
+    dias = almacen.actualizar(primera)
+
+    with pytest.raises(ValueError, match='ya presentes'):
+        almacen.actualizar(primera)
+    # Con sobrescribir se reemplazan los días sin duplicar conteos
+    almacen.actualizar(primera, sobrescribir=True)
+    assert almacen.dias_procesados() == set(dias)
+    errores = E.calcular_tasa(primera, 'es_error', 'Variation', 'process_step')
+    assert almacen.tasa_errores()['total_registros'].sum() == errores['total_registros'].sum()
+
+
+def test_almacen_kpis_tiempo(tmp_path, web_sorted):
+    almacen = AlmacenAgregados(str(tmp_path / 'agregados'), error_relativo=0.01)
+    almacen.actualizar(web_sorted)
+    kpis = almacen.kpis_tiempo().set_index(['Variation', 'process_step'])
+
+    tiempos = web_sorted.groupby(['Variation', 'process_step'])['time_diff_sec']
+    pd.testing.assert_series_equal(kpis['media'], tiempos.mean(), check_names=False)
+    pd.testing.assert_series_equal(kpis['desviacion'], tiempos.std(), check_names=False, rtol=1e-6)
+    # Mediana aproximada con error relativo acotado (más la diferencia entre cuantiles vecinos)
+    mediana = tiempos.median()
+    assert ((kpis['median'] - mediana).abs() <= 0.02 * mediana + 1).all()
+
+
+def test_almacen_tasa_grupo_sin_completados(tmp_path, web_sorted):
+    # Sin confirms en Control: NaN y al final, como calcular_tasa_finalizacion
+    web_sorted = web_sorted[~((web_sorted['Variation'] == 'Control') & (web_sorted['process_step'] == 'confirm'))]
+    almacen = AlmacenAgregados(str(tmp_path / 'agregados'))
+    almacen.actualizar(web_sorted)
+
+    tasa = almacen.tasa_finalizacion()
+    assert list(tasa['Variation']) == ['Test', 'Control']
+    pd.testing.assert_frame_equal(tasa, E.calcular_tasa_finalizacion(web_sorted))
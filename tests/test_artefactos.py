@@ -0,0 +1,23 @@
+import os
+
+import artefactos
+
+
+def test_poda_versiones_sustituidas_en_cada_llamada(tmp_path, monkeypatch):
+    carpeta = tmp_path / 'raw'
+    carpeta.mkdir()
+    (carpeta / 'a.txt').write_text('uno')
+    monkeypatch.setattr(artefactos, 'RUTA_ARTEFACTOS', str(tmp_path / 'artifacts'))
+    monkeypatch.setattr(artefactos, 'CARPETAS', {'raw': (str(carpeta), 'datos')})
+    # Sin periodo de gracia: una versión marcada se borra en la siguiente llamada
+    monkeypatch.setattr(artefactos, 'GRACIA_BORRADO', -1)
+
+    antiguo = artefactos.construir_todos()['raw']
+    (carpeta / 'a.txt').write_text('dos')
+    actual = artefactos.construir_todos()['raw']
+    assert actual != antiguo
+    assert os.path.exists(antiguo + artefactos.SUFIJO_RETIRADO)
+
+    # Sin versión nueva (una carga de página) la antigua se borra igualmente
+    assert artefactos.construir_artefacto('raw') == actual
+    assert os.listdir(tmp_path / 'artifacts') == [os.path.basename(actual)]
@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+
+from backend_duckdb import BackendDuckDB, comparar_con_pandas
+
+
+def test_paridad_raw(carpeta_raw):
+    leer = lambda nombre: pd.read_csv(os.path.join(carpeta_raw, nombre))
+    df_web = pd.concat([leer('df_final_web_data_pt_1.txt'), leer('df_final_web_data_pt_2.txt')])
+    df_exp_cli, df_final_demo = leer('df_final_experiment_clients.txt'), leer('df_final_demo.txt')
+
+    with BackendDuckDB(':memory:') as bd:
+        bd.registrar_raw(str(carpeta_raw))
+        diferencias = comparar_con_pandas(bd, df_web, df_exp_cli, df_final_demo)
+
+    assert set(diferencias) == {'web_v', 'clientes', 'web_diff', 'web_sorted', 'tasa_finalizacion', 'tiempo_total'}
+    assert {paso: d for paso, d in diferencias.items() if d is not None} == {}
+
+
+def test_raw_variation_na_es_nula(carpeta_raw):
+    # El experimento marca los clientes sin asignar con el texto 'NA', como el fichero real
+    assert ',NA\n' in (carpeta_raw / 'df_final_experiment_clients.txt').read_text()
+
+    with BackendDuckDB(':memory:') as bd:
+        bd.registrar_raw(str(carpeta_raw))
+        _, clientes = bd.preparar_datos_web()
+        tasa = bd.calcular_tasa_finalizacion()
+
+    assert set(clientes['Variation']) == {'Control', 'Test'}
+    assert list(tasa['Variation']) == ['Control', 'Test']
+
+
+def test_paridad_parquet(carpeta_raw, tmp_path):
+    import ingesta
+
+    ruta_parquet = tmp_path / 'parquet'
+    ingesta.convertir_raw_a_parquet(str(carpeta_raw), str(ruta_parquet))
+
+    with BackendDuckDB(':memory:') as bd:
+        bd.registrar_parquet(str(ruta_parquet))
+        diferencias = comparar_con_pandas(bd, *ingesta.cargar_datos(str(ruta_parquet)))
+
+    assert {paso: d for paso, d in diferencias.items() if d is not None} == {}
+
+
+def test_tasa_finalizacion_grupo_sin_completados(logs):
+    # Sin confirms en Control: NaN y al final, como calcular_tasa_finalizacion
+    import eda_insights as E
+
+    df_web, df_exp_cli, df_final_demo = logs
+    control = df_exp_cli.loc[df_exp_cli['Variation'] == 'Control', 'client_id']
+    df_web = df_web[~(df_web['client_id'].isin(control) & (df_web['process_step'] == 'confirm'))]
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+
+    with BackendDuckDB(':memory:') as bd:
+        bd.registrar_df('web_v', web_v)
+        tasa = bd.calcular_tasa_finalizacion()
+
+    assert list(tasa['Variation']) == ['Test', 'Control']
+    pd.testing.assert_frame_equal(tasa, E.calcular_tasa_finalizacion(web_v).reset_index(drop=True))
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from bootstrap import bootstrap_cluster, ic_kpis, tabla_clientes_kpi
+
+
+@pytest.fixture
+def clientes(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+    _, df_merged = E.obtener_primera(web_sorted, df_exp_cli)
+    return web_v, web_sorted, tabla_clientes_kpi(web_sorted, df_merged)
+
+
+def test_ic_kpis_estimaciones_igual_que_pandas(clientes):
+    web_v, web_sorted, tabla = clientes
+    ic = ic_kpis(tabla, n_remuestreos=500).set_index(['kpi', 'grupo'])
+
+    tasa = E.calcular_tasa_finalizacion(web_v).set_index('Variation')['tasa_%']
+    tiempo = E.calcular_tiempo_total_por_cliente(web_sorted).groupby('Variation')['total_time_sec'].mean()
+    errores = web_sorted.groupby('Variation')['es_error'].mean()
+    for grupo in ('Control', 'Test'):
+        assert ic.loc[('tasa_finalizacion', grupo), 'estimacion'] * 100 == pytest.approx(tasa[grupo], abs=0.005)
+        assert ic.loc[('tiempo_total_medio', grupo), 'estimacion'] == pytest.approx(tiempo[grupo])
+        assert ic.loc[('tasa_error', grupo), 'estimacion'] == pytest.approx(errores[grupo])
+    assert ((ic['ic_inf'] <= ic['estimacion']) & (ic['estimacion'] <= ic['ic_sup'])).all()
+
+
+@pytest.mark.parametrize('metodo', ['poisson', 'multinomial'])
+def test_bootstrap_cluster_proporcion_como_normal(metodo):
+    # Para una proporción, el intervalo se parece al de la aproximación normal
+    rng = np.random.default_rng(1)
+    exito = rng.random(4000) < 0.3
+    grupos = np.repeat(['Control', 'Test'], 2000)
+    ic = bootstrap_cluster(exito, np.ones(4000), grupos, n_remuestreos=2000, metodo=metodo).set_index('grupo')
+
+    for grupo in ('Control', 'Test'):
+        p = exito[grupos == grupo].mean()
+        semiancho = 1.96 * np.sqrt(p * (1 - p) / 2000)
+        assert (ic.loc[grupo, 'ic_sup'] - ic.loc[grupo, 'ic_inf']) / 2 == pytest.approx(semiancho, rel=0.15)
+
+
+def test_bootstrap_cluster_no_depende_de_procesos():
+    rng = np.random.default_rng(2)
+    numerador, denominador = rng.poisson(3, 1000), rng.poisson(10, 1000) + 1
+    grupos = rng.choice(['Control', 'Test'], 1000)
+
+    pd.testing.assert_frame_equal(
+        bootstrap_cluster(numerador, denominador, grupos, n_remuestreos=600, n_procesos=1),
+        bootstrap_cluster(numerador, denominador, grupos, n_remuestreos=600, n_procesos=2))
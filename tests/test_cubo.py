@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from cubo import CuboKPI
+
+
+@pytest.fixture(scope='module')
+def errores(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, demo = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    return E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v)), demo
+
+
+def test_tasa_igual_que_calcular_tasa(errores):
+    df, _ = errores
+    cubo = CuboKPI.desde_eventos(df, ['Variation', 'process_step'], medidas=['es_error', 'time_diff_sec'])
+
+    assert cubo.tasa('es_error').iloc[0] == pytest.approx(E.calcular_tasa(df, 'es_error'))
+    pd.testing.assert_series_equal(cubo.tasa('es_error', por='Variation'),
+                                   E.calcular_tasa(df, 'es_error', 'Variation'),
+                                   check_names=False, check_index_type=False)
+
+    esperado = E.calcular_tasa(df, 'es_error', 'Variation', 'process_step').set_index(['Variation', 'process_step'])
+    tasa = cubo.tasa('es_error', por=['Variation', 'process_step'])
+    np.testing.assert_allclose(tasa.to_numpy(), esperado['tasa_%'].to_numpy())
+    assert tasa.index.tolist() == esperado.index.tolist()
+
+    # Media de una medida con nulos (último evento de cada visita) y filtro
+    confirm = df[df['process_step'] == 'confirm']
+    np.testing.assert_allclose(cubo.media('time_diff_sec', por='Variation', process_step='confirm'),
+                               confirm.groupby('Variation', observed=True)['time_diff_sec'].mean())
+
+
+def test_tabla_con_demo_igual_que_groupby(errores):
+    df, demo = errores
+    cubo = CuboKPI.desde_eventos(df, ['Variation', 'gendr', 'clnt_age'], demo=demo)
+
+    # Referencia: merge con la demografía, bandas con pd.cut y groupby
+    unido = df.merge(demo[['client_id', 'gendr', 'clnt_age']], on='client_id')
+    unido['banda'] = pd.cut(unido['clnt_age'], [0, 30, 45, 60, 75, 120], include_lowest=True).astype(str)
+    esperado = unido.groupby(['gendr', 'banda'], observed=True)['es_error'].agg(['size', 'sum'])
+
+    tabla = cubo.tabla(por=['gendr', 'clnt_age'])
+    np.testing.assert_array_equal(tabla['n'].to_numpy(), esperado['size'].to_numpy())
+    np.testing.assert_array_equal(tabla['es_error_suma'].to_numpy(), esperado['sum'].to_numpy())
+
+    filtro = cubo.tabla(por='Variation', gendr=['M', 'F'])
+    ref = unido[unido['gendr'].isin(['M', 'F'])].groupby('Variation', observed=True).size()
+    np.testing.assert_array_equal(filtro['n'].to_numpy(), ref.to_numpy())
+
+
+def test_cubo_demasiado_grande(errores):
+    # client_id y visit_id tienen miles de valores: el producto supera el límite
+    df, _ = errores
+    with pytest.raises(ValueError, match='valores'):
+        CuboKPI.desde_eventos(df, ['client_id', 'visit_id', 'process_step'])
+    with pytest.raises(ValueError, match=r'máximo 10\)'):
+        CuboKPI.desde_eventos(df, ['Variation', 'process_step'], max_valores=10)
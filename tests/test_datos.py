@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('streamlit')
+
+import datos
+
+
+@pytest.fixture
+def carpeta_datos(tmp_path, monkeypatch, logs):
+    monkeypatch.setattr(datos, 'RUTA_DATOS', str(tmp_path))
+    monkeypatch.setattr(datos, 'RUTA_CACHE', str(tmp_path / 'cache'))
+    datos.invalidar()
+    logs[2].to_csv(tmp_path / 'df_clientes.csv', index=False)
+    yield tmp_path
+    datos.invalidar()
+
+
+def test_cargar_igual_que_read_csv(carpeta_datos):
+    esperado = pd.read_csv(carpeta_datos / 'df_clientes.csv')
+
+    pd.testing.assert_frame_equal(datos.cargar('df_clientes.csv'), esperado, check_dtype=False)
+    pd.testing.assert_frame_equal(datos.cargar('df_clientes.csv', columnas=['client_id', 'bal']),
+                                  esperado[['client_id', 'bal']], check_dtype=False)
+    # Una sola conversión a Parquet por versión del CSV
+    assert len(list((carpeta_datos / 'cache').glob('df_clientes-*.parquet'))) == 1
+
+
+def test_cargar_detecta_cambios_del_csv(carpeta_datos):
+    ruta = carpeta_datos / 'df_clientes.csv'
+    antes = datos.cargar('df_clientes.csv')
+    pd.read_csv(ruta).head(100).to_csv(ruta, index=False)
+
+    assert len(antes) > 100
+    assert len(datos.cargar('df_clientes.csv')) == 100
+    assert datos.tabla_derivada('n', lambda: len(datos.cargar('df_clientes.csv')), ['df_clientes.csv']) == 100
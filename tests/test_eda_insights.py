@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+import eda_insights as E
+import referencia
+
+
+def _partes(df_web):
+    mitad = len(df_web) // 2
+    return df_web.iloc[:mitad].copy(), df_web.iloc[mitad:].copy()
+
+
+def test_preparar_datos_web_igual_que_merge(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, clientes = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    ref_web_v, ref_clientes = referencia.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+
+    pd.testing.assert_frame_equal(web_v, ref_web_v)
+    pd.testing.assert_frame_equal(clientes, ref_clientes)
+
+
+def test_preparar_datos_web_clientes_repetidos(logs):
+    # Con client_id repetidos en el experimento se vuelve a los merge originales
+    df_web, df_exp_cli, df_final_demo = logs
+    df_exp_cli = pd.concat([df_exp_cli, df_exp_cli.head(50)], ignore_index=True)
+    web_v, clientes = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    ref_web_v, ref_clientes = referencia.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+
+    pd.testing.assert_frame_equal(web_v, ref_web_v)
+    pd.testing.assert_frame_equal(clientes, ref_clientes)
+
+
+def test_calcular_diferencia_tiempo_igual_que_groupby(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+
+    pd.testing.assert_frame_equal(E.calcular_diferencia_tiempo(web_v), referencia.calcular_diferencia_tiempo(web_v))
+
+
+def test_calcular_diferencia_tiempo_con_zona_horaria():
+    # Incluye el cambio de hora del 26/03/2017 en Madrid y un evento sin fecha
+    fechas = pd.to_datetime(['2017-03-26 00:59', '2017-03-26 01:01', '2017-03-26 00:58', None,
+                             '2017-04-01 10:00', '2017-04-01 10:05'])
+    df = pd.DataFrame({
+        'client_id': [1, 1, 1, 1, 2, 2],
+        'visit_id': ['a', 'a', 'a', 'a', 'b', 'b'],
+        'date_time': fechas.tz_localize('UTC').tz_convert('Europe/Madrid'),
+    })
+
+    pd.testing.assert_frame_equal(E.calcular_diferencia_tiempo(df), referencia.calcular_diferencia_tiempo(df))
+
+
+def test_calcular_diferencia_tiempo_compacto_quita_time_diff(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    compacto = E.calcular_diferencia_tiempo(E.calcular_diferencia_tiempo(web_v), compacto=True)
+    ref = referencia.calcular_diferencia_tiempo(web_v)
+
+    assert 'time_diff' not in compacto.columns
+    pd.testing.assert_series_equal(compacto['time_diff_sec'], ref['time_diff_sec'].astype('float32'))
+
+
+def _web_sorted(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    return E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+
+
+def test_obtener_primera_igual_que_eager(logs):
+    df_web_sorted = _web_sorted(logs)
+    df_exp_cli = logs[1]
+    resultado = E.obtener_primera(df_web_sorted, df_exp_cli)
+    esperado = referencia.obtener_primera(df_web_sorted, df_exp_cli)
+
+    for obtenido, ref in zip(resultado, esperado):
+        pd.testing.assert_frame_equal(obtenido, ref)
+
+
+def test_calcular_tasa_finalizacion_igual_que_eager(logs):
+    df_web_sorted = _web_sorted(logs)
+
+    pd.testing.assert_frame_equal(E.calcular_tasa_finalizacion(df_web_sorted),
+                                  referencia.calcular_tasa_finalizacion(df_web_sorted))
+
+
+def test_calcular_tasa_finalizacion_grupo_sin_completados(logs):
+    # Un grupo sin ningún confirm queda con NaN y al final, como en el concat original
+    df_web_sorted = _web_sorted(logs)
+    df = df_web_sorted[~((df_web_sorted['Variation'] == 'Control') & (df_web_sorted['process_step'] == 'confirm'))]
+
+    pd.testing.assert_frame_equal(E.calcular_tasa_finalizacion(df), referencia.calcular_tasa_finalizacion(df))
+
+
+def test_calcular_kpis_iqr_igual_que_lambda(logs):
+    df_web_sorted = _web_sorted(logs)
+
+    for grupos in ('Variation', ['Variation', 'process_step']):
+        pd.testing.assert_frame_equal(E.calcular_kpis_iqr(df_web_sorted, grupos, 'time_diff_sec'),
+                                      referencia.calcular_kpis_iqr(df_web_sorted, grupos, 'time_diff_sec'))
+
+
+def test_calcular_kpis_iqr_vacio(logs):
+    # Sin filas la tabla sale vacía como en el original; sin ningún tiempo, en NaN por grupo
+    df_web_sorted = _web_sorted(logs)
+    vacio = df_web_sorted.iloc[:0]
+    pd.testing.assert_frame_equal(E.calcular_kpis_iqr(vacio, 'Variation', 'time_diff_sec'),
+                                  referencia.calcular_kpis_iqr(vacio, 'Variation', 'time_diff_sec'))
+
+    sin_tiempos = E.calcular_kpis_iqr(df_web_sorted.assign(time_diff_sec=np.nan), 'Variation', 'time_diff_sec')
+    assert list(sin_tiempos['Variation']) == ['Control', 'Test']
+    assert sin_tiempos[['median', 'mode', 'IQR']].isna().all().all()
+
+
+def _mismos_valores(compacto, original):
+    assert list(compacto.columns) == list(original.columns)
+    for col in original.columns:
+        pd.testing.assert_series_equal(compacto[col].astype(original[col].dtype), original[col], check_exact=False,
+                                       rtol=0, atol=0.005)
+
+
+def test_preparar_datos_web_compactar_conserva_valores(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, clientes = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    web_c, clientes_c = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo, compactar=True)
+
+    _mismos_valores(web_c, web_v)
+    _mismos_valores(clientes_c, clientes)
+    assert web_c['process_step'].dtype == 'category'
+    assert web_c.memory_usage(deep=True).sum() < web_v.memory_usage(deep=True).sum()
+
+
+def test_limpiar_df_clientes_compactar_conserva_valores(logs):
+    df_final_demo = logs[2].copy()
+    df_final_demo.loc[:9, 'num_accts'] = np.nan
+    df_final_demo.loc[10:19, 'gendr'] = None
+    limpio = E.limpiar_df_clientes(df_final_demo)
+    compacto, informe = E.compactar_tipos(limpio, E.ESQUEMA_CLIENTES, devolver_informe=True)
+
+    _mismos_valores(E.limpiar_df_clientes(df_final_demo, compactar=True), limpio)
+    _mismos_valores(compacto, limpio)
+    assert compacto['num_accts'].dtype == 'int8'
+    assert informe.loc['TOTAL', 'MB_despues'] < informe.loc['TOTAL', 'MB_antes']
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+import funnel
+from funnel import (BITS_ERROR, ORDEN_PASOS, coincide_ruta, detectar_errores_mascara, expandir_mascara_errores,
+                    frecuencia_rutas)
+
+
+def _web_diff(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    return E.calcular_diferencia_tiempo(web_v)
+
+
+def test_detectar_errores_mascara_igual_que_funnel(logs):
+    web_diff = _web_diff(logs)
+    esperado = E.detectar_errores_funnel(web_diff)
+
+    columnas = list(BITS_ERROR) + ['es_error']
+    pd.testing.assert_frame_equal(expandir_mascara_errores(detectar_errores_mascara(web_diff), web_diff.index),
+                                  esperado[columnas])
+
+
+def test_detectar_errores_mascara_pasos_desconocidos(logs):
+    # Pasos fuera del funnel, repetidos en el mismo segundo, y pasos nulos
+    web_diff = _web_diff(logs)
+    pasos = web_diff['process_step'].astype(object).copy()
+    pasos.iloc[::37] = 'ayuda'
+    pasos.iloc[1::37] = 'ayuda'
+    pasos.iloc[5::53] = None
+    web_diff['process_step'] = pasos
+    esperado = E.detectar_errores_funnel(web_diff)
+
+    mascara = detectar_errores_mascara(web_diff)
+    assert esperado['repetido_mismo_paso'][pasos == 'ayuda'].any()
+    pd.testing.assert_frame_equal(expandir_mascara_errores(mascara, web_diff.index),
+                                  esperado[list(BITS_ERROR) + ['es_error']])
+
+
+def _coincide_con_listas(df, ruta, claves):
+    # Referencia: la secuencia de cada grupo como lista, como hacía obtener_primera
+    secuencias = df.groupby(claves)['process_step'].apply(list)
+    return secuencias.index, np.array([seq == ruta for seq in secuencias])
+
+
+@pytest.mark.parametrize('ruta', [
+    ['start', 'step_1', 'step_2', 'step_3', 'confirm'],
+    ['start', 'confirm'],
+    ['start', 'step_1', 'start', 'step_1', 'step_2'],
+    ['ayuda'],
+])
+def test_coincide_ruta_igual_que_listas(logs, ruta):
+    web_diff = _web_diff(logs)
+    pasos = web_diff['process_step'].astype(object).copy()
+    pasos.iloc[::41] = 'ayuda'
+    df = web_diff.assign(process_step=pasos)
+
+    ids, coincide = coincide_ruta(df, ruta)
+    esperado_ids, esperado = _coincide_con_listas(df, ruta, 'client_id')
+    np.testing.assert_array_equal(ids, esperado_ids)
+    np.testing.assert_array_equal(coincide, esperado)
+
+    ids, coincide = coincide_ruta(df, ruta, visit_col='visit_id')
+    esperado_ids, esperado = _coincide_con_listas(df, ruta, ['client_id', 'visit_id'])
+    assert list(ids) == list(esperado_ids)
+    np.testing.assert_array_equal(coincide, esperado)
+
+
+def _rutas_con_texto(df):
+    # Referencia: ruta de cada visita como texto unido, contada con groupby
+    df = df[df['process_step'].isin(ORDEN_PASOS)]
+    df = df.sort_values(['client_id', 'visit_id', 'date_time'], kind='stable')
+    rutas = df.groupby(['Variation', 'client_id', 'visit_id'], observed=True)['process_step'].agg(' > '.join).rename('ruta')
+    return rutas.groupby(level='Variation').value_counts().rename('n_visitas').reset_index()
+
+
+def _ordenar(tabla):
+    return tabla[['Variation', 'ruta', 'n_visitas']].sort_values(['Variation', 'ruta']).reset_index(drop=True)
+
+
+def _web_v(logs):
+    df_web, df_exp_cli, _ = logs
+    df = df_web.merge(df_exp_cli.dropna(subset=['Variation']), on='client_id')
+    return df.assign(date_time=pd.to_datetime(df['date_time']))
+
+
+def test_frecuencia_rutas_igual_que_texto(logs):
+    df = _web_v(logs)
+
+    pd.testing.assert_frame_equal(_ordenar(frecuencia_rutas(df)), _ordenar(_rutas_con_texto(df)))
+
+
+def test_frecuencia_rutas_largas_sin_colisiones():
+    # Dos rutas de 70 pasos iguales salvo a partir del paso 66
+    comun = [ORDEN_PASOS[i % 4] for i in range(66)]
+    pasos = comun + ['step_1'] * 4 + comun + ['step_2'] * 4
+    df = pd.DataFrame({
+        'client_id': 1,
+        'visit_id': ['a'] * 70 + ['b'] * 70,
+        'process_step': pasos,
+        'date_time': pd.Timestamp('2017-04-01') + pd.to_timedelta(np.tile(np.arange(70), 2), unit='s'),
+        'Variation': 'Test',
+    })
+
+    tabla = frecuencia_rutas(df)
+    assert list(tabla['n_visitas']) == [1, 1]
+    assert tabla['ruta'].nunique() == 2
+
+
+def test_frecuencia_rutas_separa_colisiones(logs, monkeypatch):
+    # Con base 0 el hash solo depende del primer paso: todas las rutas colisionan
+    df = _web_v(logs)
+    monkeypatch.setattr(funnel, 'BASE_HASH_RUTAS', np.uint64(0))
+
+    pd.testing.assert_frame_equal(_ordenar(frecuencia_rutas(df)), _ordenar(_rutas_con_texto(df)))
+
+
+def _sesiones_con_groupby(df, inactividad):
+    # Referencia: corte por cliente o por hueco con diff dentro de cada cliente
+    df = df.dropna(subset=['date_time']).sort_values(['client_id', 'date_time'], kind='stable')
+    hueco = df.groupby('client_id')['date_time'].diff()
+    sesion = (hueco.isna() | (hueco > pd.Timedelta(inactividad))).cumsum() - 1
+    return df.assign(es_confirm=df['process_step'] == 'confirm').groupby(sesion.to_numpy()).agg(
+        client_id=('client_id', 'first'),
+        inicio=('date_time', 'min'),
+        fin=('date_time', 'max'),
+        n_eventos=('client_id', 'size'),
+        completado=('es_confirm', 'any'),
+    )
+
+
+def test_sesionizar_igual_que_groupby(logs):
+    df = _web_v(logs)
+    resumen = funnel.sesionizar(df, inactividad='10min')
+    esperado = _sesiones_con_groupby(df, '10min')
+
+    assert len(resumen) == len(esperado)
+    for col in ['client_id', 'inicio', 'fin', 'n_eventos', 'completado']:
+        np.testing.assert_array_equal(resumen[col].to_numpy(), esperado[col].to_numpy())
+    np.testing.assert_allclose(resumen['tiempo_total_sec'], (esperado['fin'] - esperado['inicio']).dt.total_seconds())
+
+
+def test_sesiones_por_visita_igual_que_funnel(logs):
+    # Con una inactividad enorme y visit_col, las sesiones son las visitas: errores y
+    # finalización deben coincidir con las funciones de eda_insights
+    web_diff = _web_diff(logs)
+    resumen = funnel.sesionizar(web_diff, inactividad='3650D', visit_col='visit_id')
+    errores = E.detectar_errores_funnel(web_diff)
+
+    assert len(resumen) == web_diff[['client_id', 'visit_id']].drop_duplicates().shape[0]
+    pd.testing.assert_series_equal(resumen.groupby('Variation', observed=True)['n_errores'].sum(),
+                                   errores.groupby('Variation', observed=True)['es_error'].sum().astype(np.int32),
+                                   check_names=False)
+    for nombre in BITS_ERROR:
+        assert resumen[f'n_{nombre}'].sum() == errores[nombre].sum()
+
+    tasa = funnel.calcular_tasa_finalizacion_sesiones(resumen)
+    esperado = E.calcular_tasa_finalizacion(web_diff)
+    pd.testing.assert_frame_equal(tasa.astype({'Variation': object}), esperado.astype({'Variation': object}),
+                                  check_dtype=False)
+
+    kpis = funnel.kpis_sesiones(resumen).set_index('Variation')
+    np.testing.assert_allclose(kpis['tasa_error_%'],
+                               E.calcular_tasa(errores, 'es_error', 'Variation').reindex(kpis.index))
+
+
+def test_sesionizar_ruta_propia():
+    # Funnel propio: los pasos se codifican con 'orden', no con ORDEN_PASOS
+    orden = ['home', 'login', 'pay']
+    df = pd.DataFrame({
+        'client_id': [1, 1, 1, 2, 2],
+        'process_step': ['home', 'login', 'pay', 'home', 'ayuda'],
+        'date_time': pd.Timestamp('2017-04-01') + pd.to_timedelta([0, 10, 20, 0, 10], unit='s'),
+        'Variation': ['Test'] * 3 + ['Control'] * 2,
+    })
+    resumen = funnel.sesionizar(df, orden=orden, step_objetivo='pay')
+
+    assert list(resumen['n_home']) == [1, 1]
+    assert list(resumen['n_pay']) == [1, 0]
+    assert list(resumen['paso_max']) == ['pay', 'home']
+    assert list(resumen['completado']) == [True, False]
+    assert list(resumen['ruta_exacta']) == [True, False]
+
+
+def test_sesionizar_eventos_sin_visita():
+    # Los eventos sin visita no se juntan en una sesión: cada uno va aparte
+    df = pd.DataFrame({
+        'client_id': [1, 1, 1, 1],
+        'visit_id': [None, None, 'a', 'a'],
+        'process_step': ['start', 'step_1', 'start', 'step_1'],
+        'date_time': pd.Timestamp('2017-04-01') + pd.to_timedelta([0, 10, 20, 30], unit='s'),
+    })
+    resumen = funnel.sesionizar(df, visit_col='visit_id')
+
+    assert list(resumen['n_eventos']) == [1, 1, 2]
+
+
+def test_tasa_finalizacion_sesiones_grupo_sin_completados(logs):
+    # Sin confirms en Control: NaN y al final, como calcular_tasa_finalizacion
+    web_diff = _web_diff(logs)
+    web_diff = web_diff[~((web_diff['Variation'] == 'Control') & (web_diff['process_step'] == 'confirm'))]
+    resumen = funnel.sesionizar(web_diff, inactividad='3650D', visit_col='visit_id')
+
+    tasa = funnel.calcular_tasa_finalizacion_sesiones(resumen)
+    esperado = E.calcular_tasa_finalizacion(web_diff)
+    assert tasa['Variation'].iloc[-1] == 'Control' and np.isnan(tasa['tasa_%'].iloc[-1])
+    pd.testing.assert_frame_equal(tasa.astype({'Variation': object}), esperado.astype({'Variation': object}),
+                                  check_dtype=False)
@@ -0,0 +1,67 @@
+import pandas as pd
+import pyarrow.dataset as ds
+
+import ingesta
+
+CLAVES = ['client_id', 'visit_id', 'date_time', 'process_step']
+
+
+def _web_csv(carpeta):
+    # Referencia: los .txt leídos directamente con pd.read_csv
+    partes = [pd.read_csv(carpeta / f'df_final_web_data_pt_{i}.txt') for i in (1, 2)]
+    df = pd.concat(partes, ignore_index=True)
+    df['date_time'] = pd.to_datetime(df['date_time'])
+    return df
+
+
+def _ordenar(df):
+    texto = [c for c in ('visitor_id', 'visit_id', 'process_step') if c in df.columns]
+    return df.astype(dict.fromkeys(texto, object)).sort_values(CLAVES, kind='stable').reset_index(drop=True)
+
+
+def test_convertir_y_cargar_igual_que_read_csv(carpeta_raw, tmp_path):
+    ruta = tmp_path / 'parquet'
+    ingesta.convertir_raw_a_parquet(carpeta_raw, ruta)
+    df_web, df_exp_cli, df_final_demo = ingesta.cargar_datos(ruta)
+
+    assert df_web['client_id'].dtype == 'int64'
+    assert df_web['process_step'].dtype == 'category'
+    assert df_web['date_time'].dtype.kind == 'M'
+    assert df_exp_cli['Variation'].dtype == 'category'
+    assert df_final_demo['gendr'].dtype == 'category'
+
+    ref = _web_csv(carpeta_raw)
+    pd.testing.assert_frame_equal(_ordenar(df_web), _ordenar(ref[df_web.columns]), check_dtype=False)
+
+    # 'NA' en Variation se lee como nulo, igual que en pandas
+    ref_exp = pd.read_csv(carpeta_raw / 'df_final_experiment_clients.txt')
+    pd.testing.assert_frame_equal(df_exp_cli.astype({'Variation': object}), ref_exp, check_dtype=False)
+    pd.testing.assert_frame_equal(df_final_demo.astype({'gendr': object}),
+                                  pd.read_csv(carpeta_raw / 'df_final_demo.txt'), check_dtype=False)
+
+
+def test_cargar_web_columnas_y_fechas(carpeta_raw, tmp_path):
+    ruta = tmp_path / 'parquet'
+    ingesta.convertir_raw_a_parquet(carpeta_raw, ruta)
+    ref = _web_csv(carpeta_raw)
+    dias = ref['date_time'].dt.strftime('%Y-%m-%d')
+    fechas = sorted(dias.unique())[10:13]
+
+    df = ingesta.cargar_web(ruta, columnas=CLAVES, fechas=fechas)
+    assert list(df.columns) == CLAVES
+    pd.testing.assert_frame_equal(_ordenar(df), _ordenar(ref.loc[dias.isin(fechas), CLAVES]), check_dtype=False)
+
+
+def test_cargar_web_filtro(carpeta_raw, tmp_path):
+    ruta = tmp_path / 'parquet'
+    ingesta.convertir_raw_a_parquet(carpeta_raw, ruta)
+    ref = _web_csv(carpeta_raw)
+    dias = ref['date_time'].dt.strftime('%Y-%m-%d')
+    fechas = sorted(dias.unique())[:20]
+    corte = int(ref['client_id'].median())
+
+    filtro = (ds.field('process_step') == 'confirm') & (ds.field('client_id') < corte)
+    df = ingesta.cargar_web(ruta, columnas=CLAVES, fechas=fechas, filtro=filtro)
+    esperado = ref[dias.isin(fechas) & (ref['process_step'] == 'confirm') & (ref['client_id'] < corte)]
+    assert len(df) > 0
+    pd.testing.assert_frame_equal(_ordenar(df), _ordenar(esperado[CLAVES]), check_dtype=False)
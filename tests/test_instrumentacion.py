@@ -0,0 +1,47 @@
+import threading
+
+import pandas as pd
+
+import eda_insights as E
+from instrumentacion import Colector, instrumentacion, medir
+
+
+def _partes(df_web):
+    mitad = len(df_web) // 2
+    return df_web.iloc[:mitad].copy(), df_web.iloc[mitad:].copy()
+
+
+def test_etapas_registradas_sin_cambiar_resultados(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+    esperado = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+
+    colector = Colector()
+    with instrumentacion(colector, memoria=True):
+        web_v_medido, _ = E.preparar_datos_web(*_partes(df_web), df_exp_cli, df_final_demo)
+        obtenido = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v_medido))
+
+    pd.testing.assert_frame_equal(obtenido, esperado)
+    tabla = colector.tabla().set_index('etapa')
+    assert list(tabla.index) == ['eda_insights.preparar_datos_web', 'eda_insights.calcular_diferencia_tiempo',
+                                 'eda_insights.detectar_errores_funnel']
+    assert tabla.loc['eda_insights.calcular_diferencia_tiempo', 'filas_entrada'] == len(web_v)
+    assert tabla.loc['eda_insights.detectar_errores_funnel', 'filas_salida'] == len(esperado)
+    assert (tabla['pico_memoria_mb'] > 0).all()
+    assert tabla['error'].isna().all()
+
+
+def test_sin_sumideros_ni_otros_hilos(logs):
+    colector = Colector()
+    df = logs[2]
+    E.filtrar_principales_clientes(df)
+    with instrumentacion(colector):
+        hilo = threading.Thread(target=E.filtrar_principales_clientes, args=(df,))
+        hilo.start()
+        hilo.join()
+        with medir('bloque', filas_entrada=len(df)) as m:
+            m['filas_salida'] = len(E.filtrar_principales_clientes(df))
+
+    # Ni la llamada anterior ni la del otro hilo se registran; la etapa anidada va antes que el bloque
+    assert [r['etapa'] for r in colector.registros] == ['eda_insights.filtrar_principales_clientes', 'bloque']
+    assert colector.registros[1]['filas_salida'] == colector.registros[0]['filas_salida']
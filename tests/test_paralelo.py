@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from paralelo import ejecutar_funnel_paralelo
+
+
+@pytest.fixture
+def web_v(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    # Orden de los .txt originales: por cliente y con la fecha descendente
+    df_web = df_web.sort_values(['client_id', 'date_time'], ascending=[True, False], kind='stable')
+    web_v, _ = E.preparar_datos_web(df_web, None, df_exp_cli, df_final_demo)
+    return web_v
+
+
+def _con_datos_sucios(web_v):
+    # Pasos fuera del funnel (algunos repetidos en el mismo segundo) y eventos sin visita
+    web_v = web_v.copy()
+    rng = np.random.default_rng(3)
+    desconocidos = rng.choice(len(web_v), 300, replace=False)
+    web_v.iloc[desconocidos, web_v.columns.get_loc('process_step')] = 'ayuda'
+    repetidos = web_v.iloc[desconocidos[:100]].copy()
+    repetidos['visitor_id'] = repetidos['visitor_id'] + '_bis'
+    web_v = pd.concat([web_v, repetidos], ignore_index=True)
+    sin_visita = rng.choice(len(web_v), 200, replace=False)
+    web_v.iloc[sin_visita, web_v.columns.get_loc('visit_id')] = np.nan
+    return web_v
+
+
+def _comparar(resultados, web_v):
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+
+    pd.testing.assert_frame_equal(resultados['tasa_finalizacion'], E.calcular_tasa_finalizacion(web_v))
+    pd.testing.assert_frame_equal(resultados['tiempo_total'], E.calcular_tiempo_total_por_cliente(web_sorted))
+    errores = E.calcular_tasa(web_sorted, 'es_error', 'Variation', 'process_step')
+    pd.testing.assert_frame_equal(resultados['tasa_errores'], errores.reset_index(drop=True), check_dtype=False)
+    columnas = ['client_id', 'visit_id', 'process_step', 'date_time', 'time_diff_sec', 'repetido_mismo_paso',
+                'retroceso_cero', 'salto_grande_atras', 'salto_grande_adelante', 'es_error']
+    pd.testing.assert_frame_equal(resultados['eventos'][columnas], web_sorted[columnas])
+
+
+@pytest.mark.parametrize('n_procesos', [1, 2])
+def test_paralelo_igual_que_serie(web_v, n_procesos):
+    _comparar(ejecutar_funnel_paralelo(web_v, n_procesos=n_procesos, n_particiones=5), web_v)
+
+
+def test_paralelo_pasos_desconocidos_y_visitas_nulas(web_v):
+    web_v = _con_datos_sucios(web_v)
+
+    _comparar(ejecutar_funnel_paralelo(web_v, n_procesos=1, n_particiones=5), web_v)
@@ -0,0 +1,23 @@
+import pandas as pd
+
+import eda_insights as E
+from pipeline import Pipeline
+
+
+def test_pipeline_filtros_y_seleccion_igual_que_eager(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+
+    obtenido = (
+        Pipeline.desde_df(web_v)
+        .diferencia_tiempo()
+        .errores()
+        .filtrar('Variation', '==', 'Test')
+        .filtrar('es_error', '==', False)
+        .seleccionar('client_id', 'process_step', 'time_diff_sec')
+        .ejecutar()
+    )
+    eager = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+    esperado = eager[(eager['Variation'] == 'Test') & ~eager['es_error']][['client_id', 'process_step', 'time_diff_sec']]
+
+    pd.testing.assert_frame_equal(obtenido.reset_index(drop=True), esperado.reset_index(drop=True))
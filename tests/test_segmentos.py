@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from segmentos import IndiceSegmentos
+
+
+@pytest.fixture
+def clientes(logs):
+    _, df_exp_cli, df_final_demo = logs
+    df = df_final_demo.merge(df_exp_cli, on='client_id', how='left')
+    # Algunos nulos, que no cumplen ningún filtro de rango (como en pandas)
+    df.loc[::97, 'clnt_age'] = np.nan
+    df.loc[::89, 'bal'] = np.nan
+    return df
+
+
+def test_filtrar_igual_que_principales_clientes(clientes):
+    indice = IndiceSegmentos(clientes)
+    rangos = {'clnt_age': (30, 60), 'clnt_tenure_mnth': (50, 200), 'bal': (30000, 110000)}
+
+    pd.testing.assert_frame_equal(indice.filtrar(rangos), E.filtrar_principales_clientes(clientes))
+    assert indice.contar(rangos) == len(E.filtrar_principales_clientes(clientes))
+
+
+def test_filtrar_rangos_y_categorias_igual_que_pandas(clientes):
+    indice = IndiceSegmentos(clientes)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        lo, hi = np.sort(rng.uniform(18, 95, 2))
+        bal_lo, bal_hi = np.sort(rng.uniform(0, 300_000, 2))
+        generos = list(rng.choice(['M', 'F', 'U', 'X'], 2, replace=False))
+        rangos = {'clnt_age': (lo, hi), 'bal': (bal_lo, bal_hi)}
+        categorias = {'gendr': generos, 'Variation': ['Test']}
+
+        esperado = clientes[clientes['clnt_age'].between(lo, hi) & clientes['bal'].between(bal_lo, bal_hi)
+                            & clientes['gendr'].isin(generos) & (clientes['Variation'] == 'Test')]
+        pd.testing.assert_frame_equal(indice.filtrar(rangos, categorias), esperado)
+        # La segunda consulta sale de la caché con el mismo resultado
+        assert indice.contar(rangos, categorias) == len(esperado)
+
+
+def test_sin_filtros_devuelve_todo(clientes):
+    indice = IndiceSegmentos(clientes)
+
+    assert indice.contar() == len(clientes)
+    assert indice.limites('clnt_age') == (clientes['clnt_age'].min(), clientes['clnt_age'].max())
+
+
+def test_limites_columna_sin_valores(clientes):
+    indice = IndiceSegmentos(clientes.assign(bal=np.nan))
+
+    with pytest.raises(ValueError, match='bal'):
+        indice.limites('bal')
+    with pytest.raises(ValueError, match='clnt_age'):
+        IndiceSegmentos(clientes.iloc[:0]).limites('clnt_age')
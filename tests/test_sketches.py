@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from sketches import SketchCuantiles
+
+
+def _tiempos(n=20_000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'Variation': rng.choice(['Control', 'Test'], n),
+        'process_step': rng.choice(['start', 'step_1', 'confirm'], n),
+        'time_diff_sec': np.round(rng.lognormal(4.5, 1.0, n)),
+    })
+
+
+def test_sketch_cuantiles_error_relativo_acotado():
+    df = _tiempos()
+    claves = ['Variation', 'process_step']
+    qs = (0.1, 0.25, 0.5, 0.75, 0.9)
+    aproximados = SketchCuantiles.desde_datos(df, claves, 'time_diff_sec', error_relativo=0.01).cuantiles(qs)
+
+    exactos = pd.DataFrame({q: df.groupby(claves)['time_diff_sec'].quantile(q) for q in qs})
+    error = (aproximados - exactos).abs() / exactos
+    assert (error <= 0.01 + 1e-12).all().all()
+
+
+def test_sketch_fusionar_igual_que_todo():
+    df = _tiempos()
+    todo = SketchCuantiles.desde_datos(df, 'Variation', 'time_diff_sec')
+    partes = [SketchCuantiles.desde_datos(parte, 'Variation', 'time_diff_sec') for parte in (df.iloc[:7000], df.iloc[7000:12000], df.iloc[12000:])]
+    fusionado = partes[0].fusionar(*partes[1:])
+
+    pd.testing.assert_frame_equal(fusionado.cuantiles(), todo.cuantiles())
+    pd.testing.assert_series_equal(fusionado.moda(), todo.moda())
+
+
+def test_calcular_kpis_iqr_aproximado_y_filtro():
+    df = _tiempos()
+    exacto = E.calcular_kpis_iqr(df, 'Variation', 'time_diff_sec')
+    aproximado = E.calcular_kpis_iqr(df, 'Variation', 'time_diff_sec', aproximado=True, error_relativo=0.005)
+
+    pd.testing.assert_series_equal(aproximado['Variation'], exacto['Variation'])
+    assert ((aproximado['median'] - exacto['median']).abs() <= 0.005 * exacto['median'] + 1).all()
+
+    q1, q3 = SketchCuantiles.desde_datos(df, None, 'time_diff_sec', error_relativo=0.005).cuartiles()
+    filtrado = E.filter_outliers_iqr(df, 'time_diff_sec', cuartiles=(q1, q3))
+    referencia = E.filter_outliers_iqr(df, 'time_diff_sec')
+    assert abs(len(filtrado) - len(referencia)) <= 0.01 * len(referencia)
+
+
+def test_sketch_cuantiles_interpola_como_pandas():
+    df = pd.DataFrame({'time_diff_sec': [0.0, 100.0]})
+    cuantiles = SketchCuantiles.desde_datos(df, None, 'time_diff_sec').cuantiles((0, 0.25, 0.5, 1)).iloc[0]
+
+    np.testing.assert_allclose(cuantiles, [0, 25, 50, 100], rtol=0.01)
+
+
+def test_sketch_rechaza_negativos():
+    with pytest.raises(ValueError):
+        SketchCuantiles.desde_datos(pd.DataFrame({'time_diff_sec': [1.0, -2.0]}), None, 'time_diff_sec')
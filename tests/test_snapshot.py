@@ -0,0 +1,29 @@
+import json
+
+import pandas as pd
+
+import eda_insights as E
+from snapshot import generar_snapshot
+
+
+def test_snapshot_igual_que_eda_insights(tmp_path, logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    ruta = tmp_path / 'kpi_snapshot.json'
+    progreso = []
+    generar_snapshot(web_v, df_exp_cli, ruta_salida=str(ruta), progreso=lambda f, m: progreso.append(f))
+    snapshot = json.loads(ruta.read_text(encoding='utf-8'))
+
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+    time_clean = E.filter_outliers_iqr(web_sorted, 'time_diff_sec', lower=False, upper=True)
+    esperados = {
+        'tasa_finalizacion': E.calcular_tasa_finalizacion(web_v),
+        'kpis_tiempo_paso': E.calcular_kpis_iqr(time_clean, ['Variation', 'process_step'], 'time_diff_sec'),
+        'tasa_error': E.calcular_tasa(web_sorted, 'es_error', grupo_col='Variation', step_col='process_step'),
+    }
+    for clave, esperado in esperados.items():
+        pd.testing.assert_frame_equal(pd.DataFrame(snapshot[clave]), esperado.reset_index(drop=True),
+                                      check_dtype=False)
+    assert snapshot['n_eventos'] == len(web_v)
+    assert {p['metrica'] for p in snapshot['pruebas']} >= {'tasa_finalizacion', 'first_attempt_success', 'tiempo_total'}
+    assert progreso[0] == 0.0 and progreso[-1] == 1.0
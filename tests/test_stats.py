@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency, ttest_ind
+
+import eda_insights as E
+from stats import resumen_pruebas, tabla_clientes, tabla_eventos, ztest_proporciones
+
+
+@pytest.fixture
+def tablas(logs):
+    df_web, df_exp_cli, df_final_demo = logs
+    web_v, _ = E.preparar_datos_web(df_web.copy(), None, df_exp_cli, df_final_demo)
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+    _, df_merged = E.obtener_primera(web_sorted, df_exp_cli)
+    tiempo_total = E.calcular_tiempo_total_por_cliente(web_sorted)
+    resumen = resumen_pruebas(tabla_eventos(web_sorted), tabla_clientes(web_v, df_merged, tiempo_total))
+    return web_v, web_sorted, df_merged, tiempo_total, resumen.set_index(['metrica', 'paso'], drop=False)
+
+
+def test_welch_igual_que_ttest_ind(tablas):
+    _, web_sorted, _, tiempo_total, resumen = tablas
+
+    # Tiempo total por cliente (H1: Control < Test), como en el notebook
+    por_grupo = tiempo_total.groupby('Variation')['total_time_sec']
+    esperado = ttest_ind(por_grupo.get_group('Control'), por_grupo.get_group('Test'), equal_var=False, alternative='less')
+    fila = resumen.loc[('tiempo_total', None)]
+    assert fila['estadistico'] == pytest.approx(esperado.statistic)
+    assert fila['p_valor'] == pytest.approx(esperado.pvalue)
+
+    # Tiempo por paso (H1: Control > Test)
+    for paso in ('start', 'step_2', 'confirm'):
+        tiempos = web_sorted[web_sorted['process_step'] == paso].dropna(subset=['time_diff_sec'])
+        tiempos = tiempos.groupby('Variation')['time_diff_sec']
+        esperado = ttest_ind(tiempos.get_group('Control'), tiempos.get_group('Test'), equal_var=False,
+                             alternative='greater')
+        fila = resumen.loc[('tiempo_paso', paso)]
+        assert fila['estadistico'] == pytest.approx(esperado.statistic, rel=1e-6)
+        assert fila['p_valor'] == pytest.approx(esperado.pvalue, rel=1e-6, abs=1e-12)
+
+
+def test_chi2_igual_que_contingency(tablas):
+    _, _, df_merged, _, resumen = tablas
+    contingencia = pd.crosstab(df_merged['Variation'], df_merged['first_attempt_success'])
+    chi2, p, _, _ = chi2_contingency(contingencia)
+
+    fila = resumen.loc[('first_attempt_success', None)]
+    assert fila['estadistico'] == pytest.approx(chi2)
+    assert fila['p_valor'] == pytest.approx(p)
+
+
+def test_ztest_finalizacion_igual_que_eventos(tablas):
+    web_v, _, _, _, resumen = tablas
+    tasa = E.calcular_tasa_finalizacion(web_v).set_index('Variation')
+    t, c = tasa.loc['Test'], tasa.loc['Control']
+    z, p = ztest_proporciones(t['clientes_completados'], t['total_clientes'], c['clientes_completados'], c['total_clientes'])
+
+    fila = resumen.loc[('tasa_finalizacion', None)]
+    assert fila['valor_test'] * 100 == pytest.approx(t['tasa_%'], abs=0.005)
+    assert fila['estadistico'] == pytest.approx(z)
+    assert fila['p_valor'] == pytest.approx(p)
+
+
+def test_ztest_proporciones_igual_que_chi2_sin_correccion():
+    # Bilateral, z^2 es el chi-cuadrado de la tabla 2x2 sin corrección
+    z, p = ztest_proporciones(420, 1000, 380, 1000)
+    chi2, p_chi2, _, _ = chi2_contingency(np.array([[420, 580], [380, 620]]), correction=False)
+
+    assert z ** 2 == pytest.approx(chi2)
+    assert p == pytest.approx(p_chi2)
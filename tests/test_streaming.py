@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import eda_insights as E
+from ingesta import cargar_datos, convertir_raw_a_parquet
+from streaming import leer_web_en_chunks, leer_web_por_clientes, procesar_funnel_en_chunks
+
+
+def _como_raw(df_web):
+    # Mismo orden que los .txt originales: por cliente y con la fecha descendente
+    return df_web.sort_values(['client_id', 'date_time'], ascending=[True, False], kind='stable')
+
+
+@pytest.fixture
+def ficheros_web(tmp_path, logs):
+    df_web = _como_raw(logs[0])
+    mitad = len(df_web) // 2
+    rutas = [tmp_path / 'df_final_web_data_pt_1.txt', tmp_path / 'df_final_web_data_pt_2.txt']
+    df_web.iloc[:mitad].to_csv(rutas[0], index=False)
+    df_web.iloc[mitad:].to_csv(rutas[1], index=False)
+    return rutas
+
+
+def _en_memoria(rutas, df_exp_cli, df_final_demo):
+    df_web = pd.concat(leer_web_en_chunks(rutas))
+    web_v, _ = E.preparar_datos_web(df_web, None, df_exp_cli, df_final_demo)
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+    return web_v, web_sorted
+
+
+def test_streaming_igual_que_en_memoria(ficheros_web, logs):
+    _, df_exp_cli, df_final_demo = logs
+    web_v, web_sorted = _en_memoria(ficheros_web, df_exp_cli, df_final_demo)
+    # Bloques pequeños: muchas visitas quedan partidas entre bloques y entre ficheros
+    acumulador = procesar_funnel_en_chunks(leer_web_en_chunks(ficheros_web, chunksize=997), df_exp_cli)
+
+    pd.testing.assert_frame_equal(acumulador.tasa_finalizacion(), E.calcular_tasa_finalizacion(web_v))
+    pd.testing.assert_frame_equal(acumulador.tiempo_total_por_cliente(),
+                                  E.calcular_tiempo_total_por_cliente(web_sorted))
+    errores = E.calcular_tasa(web_sorted, 'es_error', 'Variation', 'process_step')
+    pd.testing.assert_frame_equal(acumulador.tasa_errores().reset_index(drop=True),
+                                  errores.astype({'process_step': object}).reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_streaming_sin_agrupar_por_cliente(logs):
+    # Bloques cronológicos: un cliente reaparece después de otros
+    df_web = logs[0].assign(date_time=pd.to_datetime(logs[0]['date_time'])).sort_values('date_time')
+    bloques = (df_web.iloc[i:i + 1000] for i in range(0, len(df_web), 1000))
+
+    with pytest.raises(ValueError, match='agrupados por cliente'):
+        procesar_funnel_en_chunks(bloques, logs[1])
+
+
+def test_streaming_parquet_por_clientes(carpeta_raw, tmp_path):
+    ruta_parquet = tmp_path / 'parquet'
+    convertir_raw_a_parquet(str(carpeta_raw), str(ruta_parquet))
+    df_web, df_exp_cli, df_final_demo = cargar_datos(str(ruta_parquet))
+    web_v, _ = E.preparar_datos_web(df_web, None, df_exp_cli, df_final_demo)
+    web_sorted = E.detectar_errores_funnel(E.calcular_diferencia_tiempo(web_v))
+
+    bloques = leer_web_por_clientes(df_exp_cli, str(ruta_parquet), n_bloques=7)
+    acumulador = procesar_funnel_en_chunks(bloques, df_exp_cli)
+
+    pd.testing.assert_frame_equal(acumulador.tasa_finalizacion(), E.calcular_tasa_finalizacion(web_v))
+    pd.testing.assert_frame_equal(acumulador.tiempo_total_por_cliente(),
+                                  E.calcular_tiempo_total_por_cliente(web_sorted))